@@ -0,0 +1,49 @@
+"""Compare per-image caption generation with batched generation on the card deck.
+
+Run from the repository root:
+
+    python benchmarks/caption_throughput.py --batch-size 8
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from deck_loader import load_images_from_directory
+from image_captioning.generate_image_caption import ImageCaptionGenerator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", default=os.path.join(ROOT, "data", "cards"))
+    parser.add_argument("--limit", type=int, default=None, help="only caption the first N cards")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--model", default="coca_ViT-L-14")
+    parser.add_argument("--pretrained", default="mscoco_finetuned_laion2B-s13B-b90k")
+    args = parser.parse_args()
+
+    paths = load_images_from_directory(args.cards)[:args.limit]
+    caption_generator = ImageCaptionGenerator(model_name=args.model, pretrained=args.pretrained)
+    # warm up allocator and kernels so neither side pays first-call costs
+    caption_generator.generate_captions(paths[:2], batch_size=2)
+
+    start = time.perf_counter()
+    looped = [caption_generator.generate_caption(path) for path in paths]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = caption_generator.generate_captions(paths, batch_size=args.batch_size)
+    batch_seconds = time.perf_counter() - start
+
+    matching = sum(a == b for a, b in zip(looped, batched))
+    print(f"cards: {len(paths)}, device: {caption_generator.device}")
+    print(f"per-image loop: {loop_seconds:.2f}s ({len(paths) / loop_seconds:.2f} images/s)")
+    print(f"batched (batch_size={args.batch_size}): {batch_seconds:.2f}s ({len(paths) / batch_seconds:.2f} images/s)")
+    print(f"speedup: {loop_seconds / batch_seconds:.2f}x, identical captions: {matching}/{len(paths)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Accuracy and latency of the CPU similarity backends against fp32 eager mode.
+
+Every backend scores a fixed set of clues against the card deck; its card rankings are
+compared with the fp32 eager rankings (top-1 agreement and mean Spearman correlation),
+and encoder latency is measured at a few batch sizes. Exits non-zero when a backend's
+mean Spearman correlation falls below --min-spearman.
+
+    python benchmarks/cpu_backend.py --threads 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import torch
+
+from deck_loader import Deck
+from similarity.similarity import ImageTextSimilarity
+
+CLUES = [
+    "a pair of ballet shoes", "stormy sea", "lonely", "childhood", "a secret door",
+    "the moon", "music", "falling", "a long journey", "hidden in plain sight",
+    "fire", "dreams", "balance", "a king", "waiting",
+]
+
+
+def spearman(a, b):
+    """Spearman rank correlation of two 1-D tensors (no ties expected for float scores)."""
+    rank_a = a.argsort().argsort().float()
+    rank_b = b.argsort().argsort().float()
+    return torch.corrcoef(torch.stack([rank_a, rank_b]))[0, 1].item()
+
+
+def time_call(function, repeats):
+    function()  # warmup
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", default=os.path.join(ROOT, "data", "cards"))
+    parser.add_argument("--model", default="ViT-B-32")
+    parser.add_argument("--pretrained", default="laion2b_e16")
+    parser.add_argument("--backends", nargs="+", default=["int8", "torchscript"])
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--min-spearman", type=float, default=0.95)
+    args = parser.parse_args()
+
+    deck = Deck(args.cards)
+    device = torch.device("cpu")
+    failed = False
+    reference = None
+    for backend in ["eager"] + args.backends:
+        similarity_checker = ImageTextSimilarity(args.model, args.pretrained, device=device, backend=backend,
+                                                 num_threads=args.threads)
+        images = torch.cat([batch for _, batch in deck.batches(similarity_checker.preprocess)])
+        image_features = similarity_checker.encode_image_tensors(images)
+        text_features = similarity_checker.encode_texts(CLUES)
+        scores = text_features @ image_features.T
+
+        line = f"{backend:>12}:"
+        if reference is None:
+            reference = scores
+        else:
+            top1 = (scores.argmax(dim=1) == reference.argmax(dim=1)).float().mean().item()
+            rho = statistics.mean(spearman(scores[i], reference[i]) for i in range(len(CLUES)))
+            line += f" top-1 agreement {top1:.2f}, mean spearman {rho:.4f},"
+            if rho < args.min_spearman:
+                failed = True
+                line += " REGRESSION,"
+
+        for batch_size in args.batch_sizes:
+            batch = images[:batch_size]
+            ms = time_call(lambda: similarity_checker.encode_image_tensors(batch), args.repeats)
+            line += f" image@{batch_size} {ms:.1f}ms,"
+        ms = time_call(lambda: similarity_checker.encode_texts(CLUES[:1]), args.repeats)
+        line += f" text@1 {ms:.1f}ms"
+        print(line)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Encode latency and peak memory of the CPU execution policies.
+
+Each policy runs in its own subprocess so its peak RSS is not inflated by the weights
+of the others. Cards are encoded in batches through ImageTextSimilarity and clues
+through the text tower, after a warmup.
+
+    python benchmarks/execution_policies.py --threads 4
+    python benchmarks/execution_policies.py --pretrained none --policies fp32 inference_mode
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import measure, pin_threads
+
+# name -> ExecutionPolicy keyword arguments
+POLICIES = {
+    "fp32": {"inference_mode": False},
+    "inference_mode": {},
+    "channels_last": {"channels_last": True},
+    "amp_bf16": {"amp": "bf16"},
+    "bf16": {"precision": "bf16"},
+    "int8": {"precision": "int8"},
+}
+
+CLUES = ["a pair of ballet shoes", "stormy sea", "lonely", "childhood", "a secret door",
+         "the moon", "music", "falling"]
+
+
+def run_policy(name, args):
+    """Measure one policy in this process and return its results."""
+    pin_threads(args.threads)
+    from deck_loader import Deck
+    from execution_policy import ExecutionPolicy
+    from similarity.similarity import ImageTextSimilarity
+
+    deck = Deck(args.cards)
+    policy = ExecutionPolicy(**POLICIES[name])
+    similarity = ImageTextSimilarity(model_name=args.model, pretrained=None if args.pretrained == "none" else args.pretrained,
+                                     text_cache_size=0, policy=policy)
+    images = next(deck.batches(similarity.preprocess, batch_size=args.batch_size))[1]
+    image = measure(lambda: similarity.encode_image_tensors(images), repeats=args.repeats, items=len(images))
+    text = measure(lambda: similarity.encode_texts(CLUES), repeats=args.repeats, items=len(CLUES))
+    return {
+        "policy": repr(policy),
+        "image_p50_ms": image["p50_ms"],
+        "images_per_s": image["items_per_s"],
+        "text_p50_ms": text["p50_ms"],
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", default=os.path.join(ROOT, "data", "cards"))
+    parser.add_argument("--model", default="ViT-B-32")
+    parser.add_argument("--pretrained", default="laion2b_e16", help="'none' for random weights")
+    parser.add_argument("--policies", nargs="+", choices=list(POLICIES), default=list(POLICIES))
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--single", choices=list(POLICIES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_policy(args.single, args)))
+        return
+
+    from execution_policy import cpu_supports_bf16
+
+    # without native bf16 units, bf16 weights and autocast fall back to slow conversions
+    print(f"native CPU bf16: {cpu_supports_bf16()}")
+    forwarded = sys.argv[1:]
+    print(f"{'policy':<16}{'image p50':>12}{'images/s':>10}{'text p50':>11}{'peak RSS':>11}")
+    for name in args.policies:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), *forwarded, "--single", name],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{name:<16}{result['image_p50_ms']:>10.1f}ms{result['images_per_s']:>10.1f}"
+              f"{result['text_p50_ms']:>9.1f}ms{result['peak_rss_mb']:>8.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
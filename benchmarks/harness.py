@@ -0,0 +1,98 @@
+"""Timing, environment and baseline-comparison helpers shared by the benchmark suite."""
+import json
+import os
+import platform
+import statistics
+import time
+
+
+def pin_threads(num_threads):
+    """Pin intra-op thread pools so runs on the same machine are comparable.
+
+    Must be called before torch is imported for the OpenMP/MKL variables to take effect.
+    """
+    if num_threads is None:
+        return
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(num_threads)
+    import torch
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # interop threads can only be set before the first parallel op
+        pass
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def measure(function, warmup=2, repeats=10, items=1):
+    """Time ``function`` after ``warmup`` untimed calls.
+
+    ``items`` is the amount of work per call (images, clues, rounds) and gives the
+    throughput. ``function`` may return a number to override ``items`` for that call.
+    """
+    for _ in range(warmup):
+        function()
+    timings = []
+    total_items = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        done = function()
+        timings.append(time.perf_counter() - start)
+        total_items += done if isinstance(done, (int, float)) and not isinstance(done, bool) else items
+    ordered = sorted(timings)
+    return {
+        "repeats": repeats,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "min_ms": ordered[0] * 1000,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p90_ms": percentile(ordered, 0.90) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "items_per_s": total_items / sum(timings),
+    }
+
+
+def environment(num_threads=None):
+    """Describe the machine and library versions, stored with every result file."""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "threads": num_threads,
+    }
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+        info["cuda"] = torch.cuda.get_device_name(0) if torch.cuda.is_available() else None
+    except ImportError:
+        pass
+    return info
+
+
+def save_results(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, threshold=0.10, metric="p50_ms"):
+    """Return (case, baseline, current, change) for every case slower than baseline by more than ``threshold``."""
+    regressions = []
+    for case, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(case)
+        if not previous or metric not in previous or metric not in current:
+            continue
+        change = current[metric] / previous[metric] - 1 if previous[metric] else 0.0
+        if change > threshold:
+            regressions.append((case, previous[metric], current[metric], change))
+    return regressions
@@ -0,0 +1,112 @@
+"""Peak memory of the ways a bot host can hold its models.
+
+Each configuration runs in its own subprocess, captions a few cards and scores clues
+against them, then reports the weights it held and its peak RSS:
+
+    separate       CoCa for captions plus a ViT-B-32 CLIP for similarity (the default setup)
+    shared_towers  similarity served by CoCa's own towers (ImageTextSimilarity.from_captioner)
+    lru_one_model  the separate setup under a one-model budget, reloading on every switch
+    forked         shared_towers loaded once, then --workers forked workers scoring clues;
+                   workers report their proportional set size (Linux), which counts the
+                   copy-on-write pages shared with the parent only fractionally
+
+    python benchmarks/memory_budget.py
+    python benchmarks/memory_budget.py --caption-model coca_ViT-B-32 --pretrained none
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+CONFIGURATIONS = ["separate", "shared_towers", "lru_one_model", "forked"]
+CLUES = ["a long journey", "the moon", "hidden in plain sight", "music"]
+
+
+def proportional_set_size():
+    """This process's PSS in bytes from /proc, or None off Linux."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+
+def play(captioner, similarity, cards):
+    captioner.generate_captions(cards[:2], batch_size=2)
+    similarity.score_cards(CLUES, cards)
+
+
+def _worker(index, similarity, cards, results):
+    similarity.score_cards(CLUES, cards)
+    results.put(proportional_set_size())
+
+
+def run_configuration(name, args):
+    import model_manager
+    from image_captioning.generate_image_caption import ImageCaptionGenerator
+    from similarity.similarity import ImageTextSimilarity
+
+    cards = [os.path.join(args.cards, card) for card in sorted(os.listdir(args.cards))[:args.cards_limit]]
+    random_weights = args.pretrained == "none"
+    pretrained = None if random_weights else args.pretrained
+    captioner = ImageCaptionGenerator(args.caption_model, None if random_weights else args.caption_pretrained)
+    if name == "lru_one_model":
+        model_manager.set_memory_budget(max_models=1)
+    if name in ("shared_towers", "forked"):
+        similarity = ImageTextSimilarity.from_captioner(captioner, text_cache_size=0)
+    else:
+        similarity = ImageTextSimilarity(args.similarity_model, pretrained, text_cache_size=0)
+    for _ in range(2):
+        play(captioner, similarity, cards)
+    report = model_manager.memory_report()
+
+    if name == "forked":
+        import multiprocessing
+        results = multiprocessing.get_context("fork").Queue()
+        workers = model_manager.fork_workers(args.workers, _worker, similarity, cards, results)
+        worker_pss = [results.get(timeout=600) for _ in workers]
+        for worker in workers:
+            worker.join()
+        report["workers_pss_bytes"] = None if None in worker_pss else sum(worker_pss)
+    report["pss_bytes"] = proportional_set_size()
+    return report
+
+
+def megabytes(value):
+    return "-" if value is None else f"{value / 2**20:.0f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", default=os.path.join(ROOT, "data", "cards"))
+    parser.add_argument("--cards-limit", type=int, default=8)
+    parser.add_argument("--caption-model", default="coca_ViT-L-14")
+    parser.add_argument("--caption-pretrained", default="mscoco_finetuned_laion2B-s13B-b90k")
+    parser.add_argument("--similarity-model", default="ViT-B-32")
+    parser.add_argument("--pretrained", default="laion2b_e16", help="similarity weights, 'none' for random weights everywhere")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--configurations", nargs="+", choices=CONFIGURATIONS, default=CONFIGURATIONS)
+    parser.add_argument("--single", choices=CONFIGURATIONS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_configuration(args.single, args)))
+        return
+
+    print(f"{'configuration':<16}{'weights':>10}{'peak RSS':>11}{'PSS':>10}{'workers PSS':>14}")
+    for name in args.configurations:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--single", name],
+                                check=True, capture_output=True, text=True).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        print(f"{name:<16}{megabytes(report['model_bytes']):>10}{megabytes(report['peak_rss_bytes']):>11}"
+              f"{megabytes(report['pss_bytes']):>10}{megabytes(report.get('workers_pss_bytes')):>14}")
+
+
+if __name__ == "__main__":
+    main()
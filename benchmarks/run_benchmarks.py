@@ -0,0 +1,206 @@
+"""Reproducible benchmark suite for captioning, similarity, clue generation and game simulation.
+
+Every case runs warmup calls, then timed repeats with pinned thread counts, and reports
+p50/p90/p99 latency plus throughput. Results can be saved as JSON and compared with a
+saved baseline; the run exits non-zero when any case's p50 regresses past --threshold.
+
+    python benchmarks/run_benchmarks.py --threads 4 --output baseline.json
+    python benchmarks/run_benchmarks.py --threads 4 --compare baseline.json
+    python benchmarks/run_benchmarks.py --only preprocess play_game
+"""
+import argparse
+import asyncio
+import functools
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import compare, environment, load_results, measure, pin_threads, save_results
+
+CLUES = [
+    "a pair of ballet shoes", "stormy sea", "lonely", "childhood", "a secret door",
+    "the moon", "music", "falling", "a long journey", "hidden in plain sight",
+    "fire", "dreams", "balance", "a king", "waiting", "between two worlds",
+]
+
+
+def _pretrained(name):
+    return None if name.lower() == "none" else name
+
+
+def bench_preprocess(args, paths):
+    """JPEG decode + open_clip transform throughput, threaded as in the bot pipeline."""
+    import open_clip
+    from deck_loader import preprocess_images
+
+    transform = open_clip.image_transform(224, is_train=False)
+    batch = paths[:args.batch_sizes[-1]]
+    return {
+        f"preprocess@{len(batch)}": measure(lambda: preprocess_images(batch, transform, workers=args.workers),
+                                            args.warmup, args.repeats, items=len(batch)),
+    }
+
+
+def bench_similarity(args, paths):
+    """Image and text tower latency at each batch size, with caches and indexes disabled."""
+    import torch
+    from deck_loader import preprocess_images
+    from similarity.similarity import ImageTextSimilarity
+
+    similarity_checker = ImageTextSimilarity(args.clip_model, _pretrained(args.clip_pretrained),
+                                             device=torch.device(args.device), text_cache_size=0)
+    images = preprocess_images(paths[:max(args.batch_sizes)], similarity_checker.preprocess, args.workers)
+    results = {
+        "encode_image@path": measure(lambda: similarity_checker.encode_image(paths[0]), args.warmup, args.repeats),
+    }
+    for batch_size in args.batch_sizes:
+        batch = images[:batch_size]
+        clues = (CLUES * (batch_size // len(CLUES) + 1))[:batch_size]
+        results[f"encode_image@{batch_size}"] = measure(lambda: similarity_checker.encode_image_tensors(batch),
+                                                        args.warmup, args.repeats, items=len(batch))
+        # encode_texts dedupes, so suffix repeated clues to keep the batch the requested size
+        clues = [f"{clue} {i}" for i, clue in enumerate(clues)]
+        results[f"encode_text@{batch_size}"] = measure(lambda: similarity_checker.encode_texts(clues),
+                                                       args.warmup, args.repeats, items=len(clues))
+    return results
+
+
+def bench_caption(args, paths):
+    """Per-image generate_caption time (decode, transform and CoCa beam search)."""
+    import torch
+    from image_captioning.generate_image_caption import ImageCaptionGenerator
+
+    caption_generator = ImageCaptionGenerator(args.caption_model, _pretrained(args.caption_pretrained),
+                                              device=torch.device(args.device))
+    cards = iter(paths * (args.caption_repeats + args.warmup))
+    return {
+        "generate_caption": measure(lambda: caption_generator.generate_caption(next(cards)),
+                                    min(args.warmup, 1), args.caption_repeats),
+    }
+
+
+def bench_abstractor(args, paths):
+    """Clue generation round trips against a local stub of the chat completions API."""
+    from text_processing.async_abstractor import AsyncAbstractor
+    from text_processing.stub_llm_server import StubLLMServer
+
+    descriptions = [f"card {os.path.basename(path)} on a wooden table" for path in paths]
+    results = {}
+    with StubLLMServer(latency=args.llm_latency) as server:
+        loop = asyncio.new_event_loop()
+        abstractor = AsyncAbstractor(api_key="benchmark", base_url=server.base_url)
+        try:
+            results["abstractor"] = measure(
+                lambda: loop.run_until_complete(abstractor.generate_creative_abstract(descriptions[0])),
+                args.warmup, args.repeats)
+            batch = descriptions[:16]
+            results[f"abstractor_many@{len(batch)}"] = measure(
+                lambda: loop.run_until_complete(abstractor.generate_many(batch)),
+                args.warmup, args.repeats, items=len(batch))
+        finally:
+            loop.run_until_complete(abstractor.aclose())
+            loop.close()
+
+        # the synchronous Abstractor needs the pre-1.0 openai client, which can be pointed at the stub
+        try:
+            import openai
+        except ImportError:
+            openai = None
+        if openai is not None and hasattr(openai, "ChatCompletion"):
+            from text_processing.abstractor import Abstractor
+            openai.api_base = server.base_url
+            sync_abstractor = Abstractor(api_key="benchmark")
+            results["abstractor_sync"] = measure(
+                lambda: sync_abstractor.generate_creative_abstract(descriptions[0]), args.warmup, args.repeats)
+    return results
+
+
+def bench_play_game(args, paths):
+    """Full headless games with random agents, reported in rounds per second."""
+    from game_logic.randomAgent import random_agents
+    from game_logic.simulation import run_game
+
+    seeds = iter(range(10 ** 9))
+    factory = functools.partial(random_agents, args.players)
+
+    def play():
+        return len(run_game(factory, paths, next(seeds)).rounds)
+
+    return {"play_game": measure(play, args.warmup, args.repeats)}
+
+
+CASES = {
+    "preprocess": bench_preprocess,
+    "similarity": bench_similarity,
+    "caption": bench_caption,
+    "abstractor": bench_abstractor,
+    "play_game": bench_play_game,
+}
+
+
+def print_results(results):
+    print(f"{'case':<24}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'items/s':>12}")
+    for case, result in results["cases"].items():
+        print(f"{case:<24}{result['p50_ms']:>10.2f}{result['p90_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+              f"{result['items_per_s']:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", default=os.path.join(ROOT, "data", "cards"))
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES), default=None)
+    parser.add_argument("--threads", type=int, default=1, help="intra-op threads (0 leaves the default)")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--caption-repeats", type=int, default=3)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clip-model", default="ViT-B-32")
+    parser.add_argument("--clip-pretrained", default="laion2b_e16", help="'none' for random weights")
+    parser.add_argument("--caption-model", default="coca_ViT-L-14")
+    parser.add_argument("--caption-pretrained", default="mscoco_finetuned_laion2B-s13B-b90k")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated server latency in seconds")
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file from an earlier --output run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed p50 slowdown, e.g. 0.10 for 10%%")
+    args = parser.parse_args()
+
+    threads = args.threads or None
+    pin_threads(threads)
+    random.seed(args.seed)
+    try:
+        import torch
+        torch.manual_seed(args.seed)
+    except ImportError:
+        pass
+
+    from deck_loader import load_images_from_directory
+    paths = load_images_from_directory(args.cards)
+
+    results = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(threads), "cases": {}}
+    for name in args.only or list(CASES):
+        print(f"running {name}...", file=sys.stderr)
+        results["cases"].update(CASES[name](args, paths))
+    print_results(results)
+
+    if args.output:
+        save_results(args.output, results)
+    if args.compare:
+        regressions = compare(results, load_results(args.compare), args.threshold)
+        for case, previous, current, change in regressions:
+            print(f"REGRESSION {case}: p50 {previous:.2f}ms -> {current:.2f}ms (+{change:.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure time-to-first-prompt of a human-only game and where its import time goes.
+
+Run from the repository root:
+
+    python benchmarks/startup.py --budget 1.0
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+
+GAME_MODULE = "game_logic.dixit"
+FIRST_PROMPT = "Enter number of players:"
+
+
+def time_to_first_prompt(module=GAME_MODULE, prompt=FIRST_PROMPT):
+    """Start a game process and return the seconds until its first input prompt appears."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-u", "-m", module], cwd=SRC, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    output = ""
+    try:
+        while prompt not in output:
+            char = process.stdout.read(1)
+            if not char:
+                raise RuntimeError(f"{module} exited before prompting, output was: {output!r}")
+            output += char
+        return time.perf_counter() - start
+    finally:
+        process.kill()
+        process.wait()
+
+
+def import_times(module=GAME_MODULE):
+    """Return (cumulative_us, module_name) for every import made by ``module``, slowest first."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=SRC,
+                            capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times.append((int(cumulative), name.strip()))
+    return sorted(times, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=1.0, help="maximum seconds to the first prompt")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest imports to show")
+    args = parser.parse_args()
+
+    timings = sorted(time_to_first_prompt() for _ in range(args.runs))
+    median = timings[len(timings) // 2]
+    print(f"time to first prompt: median {median:.3f}s, min {timings[0]:.3f}s, max {timings[-1]:.3f}s")
+
+    print(f"slowest imports of {GAME_MODULE}:")
+    for cumulative, name in import_times()[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    if median > args.budget:
+        print(f"over budget: {median:.3f}s > {args.budget:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
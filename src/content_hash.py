@@ -0,0 +1,29 @@
+import hashlib
+import os
+
+_CHUNK_SIZE = 1 << 20
+
+
+def hash_file(path):
+    """Return the sha256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashCache:
+    """Memoizes file hashes by (path, size, mtime) so unchanged files are only read once."""
+
+    def __init__(self):
+        self._hashes = {}
+
+    def get(self, path):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._hashes.get(key)
+        if digest is None:
+            digest = hash_file(path)
+            self._hashes[key] = digest
+        return digest
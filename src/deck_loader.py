@@ -0,0 +1,187 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# PIL, torch and numpy are imported where they are used so that the game modules, which only
+# need the card list, can import this module without paying for them.
+
+
+# makes the images (deck) array, sorted so card ids are stable across runs
+def load_images_from_directory(directory):
+    return sorted(
+        os.path.join(directory, filename)
+        for filename in os.listdir(directory)
+        if filename.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def load_image(path, transform):
+    """Decode an image as RGB and run it through an open_clip transform."""
+    from PIL import Image
+    with instrumentation.span("image.decode"), Image.open(path) as image:
+        image = image.convert("RGB")
+    with instrumentation.span("image.transform"):
+        return transform(image)
+
+
+def preprocess_images(paths, transform, workers=4):
+    """Decode and preprocess images on a thread pool, returning an N x C x H x W tensor in input order."""
+    import torch
+    instrumentation.observe("image.preprocess.batch_size", len(paths))
+    if workers <= 1 or len(paths) <= 1:
+        return torch.stack([load_image(path, transform) for path in paths])
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return torch.stack(list(executor.map(lambda path: load_image(path, transform), paths)))
+
+
+def transform_fingerprint(transform):
+    """Short digest of a transform's configuration (resize, crop, normalization), e.g. for cache file names."""
+    return hashlib.sha1(repr(transform).encode()).hexdigest()[:12]
+
+
+class TensorCache:
+    """Bounded LRU of preprocessed card tensors for one transform.
+
+    With ``mmap_path`` (and ``num_cards``) tensors are also written to a float16 memory-mapped
+    file with one slot per card id, so later processes can reuse them without decoding. Pass
+    the ``transform`` the tensors come from and the ``deck`` their card ids refer to: both
+    fingerprints go into the file name, so a model with a different preprocess, or a deck
+    whose files changed, never reads another one's tensors.
+    """
+
+    def __init__(self, maxsize=256, mmap_path=None, num_cards=None, shape=(3, 224, 224), transform=None, deck=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._tensors = OrderedDict()
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._present = None
+        self.mmap_path = None
+        if mmap_path is not None:
+            import numpy as np
+            if num_cards is None and deck is not None:
+                num_cards = len(deck)
+            if num_cards is None:
+                raise ValueError("num_cards is required for a memory-mapped tensor cache")
+            fingerprints = [transform_fingerprint(transform)] if transform is not None else []
+            if deck is not None:
+                fingerprints.append(deck.fingerprint())
+            if fingerprints:
+                base, extension = os.path.splitext(mmap_path)
+                mmap_path = f"{base}.{'.'.join(fingerprints)}{extension}"
+            self.mmap_path = mmap_path
+            present_path = mmap_path + ".present"
+            size = num_cards * int(np.prod(shape)) * 2
+            # reuse the files only if both exist and match the deck; otherwise no slot can be trusted
+            reuse = (os.path.exists(mmap_path) and os.path.getsize(mmap_path) == size
+                     and os.path.exists(present_path) and os.path.getsize(present_path) == num_cards)
+            mode = "r+" if reuse else "w+"
+            self._mmap = np.memmap(mmap_path, dtype=np.float16, mode=mode, shape=(num_cards, *shape))
+            self._present = np.memmap(present_path, dtype=np.uint8, mode=mode, shape=(num_cards,))
+
+    def get(self, card_id):
+        with self._lock:
+            tensor = self._tensors.get(card_id)
+            if tensor is not None:
+                self._tensors.move_to_end(card_id)
+                self.hits += 1
+                instrumentation.incr("tensor_cache.hits")
+                return tensor
+        if self._present is not None and self._present[card_id]:
+            import torch
+            tensor = torch.from_numpy(self._mmap[card_id].astype("float32"))
+            self._remember(card_id, tensor)
+            self.hits += 1
+            instrumentation.incr("tensor_cache.hits")
+            return tensor
+        self.misses += 1
+        instrumentation.incr("tensor_cache.misses")
+        return None
+
+    def put(self, card_id, tensor):
+        self._remember(card_id, tensor)
+        if self._mmap is not None and not self._present[card_id]:
+            self._mmap[card_id] = tensor.numpy()
+            self._present[card_id] = 1
+
+    def _remember(self, card_id, tensor):
+        with self._lock:
+            self._tensors[card_id] = tensor
+            self._tensors.move_to_end(card_id)
+            while len(self._tensors) > self.maxsize:
+                self._tensors.popitem(last=False)
+
+
+class Deck:
+    """The card images of a directory in sorted order; a card's id is its position in that order."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.paths = load_images_from_directory(directory)
+        self._ids = {path: card_id for card_id, path in enumerate(self.paths)}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, card_id):
+        return self.paths[card_id]
+
+    def card_ids(self):
+        return list(range(len(self.paths)))
+
+    def card_id(self, path):
+        return self._ids[path]
+
+    def fingerprint(self):
+        """Short digest of the card files (names, sizes and modification times), which changes with the deck."""
+        digest = hashlib.sha1()
+        for path in self.paths:
+            stat = os.stat(path)
+            digest.update(f"{os.path.basename(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+        return digest.hexdigest()[:12]
+
+    def stream_preprocessed(self, transform, card_ids=None, workers=4, cache=None):
+        """Yield (card_id, tensor) in card id order, decoding ahead on a thread pool.
+
+        At most ``2 * workers`` images are decoded ahead of the consumer. Tensors found in
+        ``cache`` skip decoding, and decoded ones are added to it.
+        """
+        card_ids = self.card_ids() if card_ids is None else list(card_ids)
+
+        def load(card_id):
+            tensor = cache.get(card_id) if cache is not None else None
+            if tensor is None:
+                tensor = load_image(self.paths[card_id], transform)
+                if cache is not None:
+                    cache.put(card_id, tensor)
+            return tensor
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            window = 2 * workers
+            pending = [executor.submit(load, card_id) for card_id in card_ids[:window]]
+            for position, card_id in enumerate(card_ids):
+                tensor = pending[position].result()
+                pending[position] = None
+                if position + window < len(card_ids):
+                    pending.append(executor.submit(load, card_ids[position + window]))
+                yield card_id, tensor
+
+    def batches(self, transform, batch_size=32, card_ids=None, workers=4, cache=None):
+        """Yield (card_ids, N x C x H x W tensor) batches ready for captioning or similarity."""
+        import torch
+        ids, tensors = [], []
+        for card_id, tensor in self.stream_preprocessed(transform, card_ids, workers, cache):
+            ids.append(card_id)
+            tensors.append(tensor)
+            if len(ids) == batch_size:
+                yield ids, torch.stack(tensors)
+                ids, tensors = [], []
+        if ids:
+            yield ids, torch.stack(tensors)
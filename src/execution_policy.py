@@ -0,0 +1,111 @@
+import contextlib
+import logging
+import threading
+
+# torch is imported inside the methods, so game modules can hold a policy before any model loads.
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("fp32", "fp16", "bf16", "int8")
+AMP_DTYPES = (None, "fp16", "bf16")
+
+# torch's thread pools are process-wide: the first policy that asks for thread counts sets them
+_threads = {}
+_threads_lock = threading.Lock()
+
+
+def _configure_threads(num_threads, interop_threads):
+    """Apply thread counts once per process; later policies asking for other counts keep the first ones."""
+    requested = {"num_threads": num_threads, "interop_threads": interop_threads}
+    with _threads_lock:
+        if _threads:
+            if requested != _threads:
+                logger.info("Thread counts already set to %s for this process, ignoring %s", _threads, requested)
+            return
+        from similarity.cpu_backend import configure_threads
+        configure_threads(num_threads, interop_threads)
+        _threads.update(requested)
+
+
+def cpu_supports_bf16():
+    """True when the CPU has native bf16 matmuls (AVX512-BF16 or AMX), where bf16 autocast pays off."""
+    import torch
+    checks = ("_is_avx512_bf16_supported", "_is_amx_tile_supported")
+    return any(getattr(torch.cpu, check, lambda: False)() for check in checks)
+
+
+class ExecutionPolicy:
+    """How a model wrapper runs its model: device, precision, threads, grad mode and memory layout.
+
+    ``precision`` is the weight precision handed to model_manager ("fp32", "fp16", "bf16" or
+    "int8"); None picks bf16 on GPUs that support it, fp16 on other GPUs and fp32 on CPU.
+    ``amp`` optionally autocasts fp32 weights to "bf16"/"fp16"; None never autocasts on CPU
+    (where autocast without native bf16 only adds casts) and follows the weights on GPU.
+    Wrappers move inputs with ``to_device`` and run the model inside ``context()``.
+    Thread counts are process-wide, so only the first policy that sets them takes effect.
+    """
+
+    def __init__(self, device=None, precision=None, amp=None, num_threads=None, interop_threads=None,
+                 inference_mode=True, channels_last=False):
+        import model_manager
+
+        self.device = model_manager._normalize_device(device)
+        if precision is None:
+            precision = self._default_precision()
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+        if amp not in AMP_DTYPES:
+            raise ValueError(f"Unknown amp dtype {amp!r}, expected one of {AMP_DTYPES}")
+        if precision == "int8" and self.device.type != "cpu":
+            raise ValueError("int8 dynamic quantization is only supported on CPU")
+        self.precision = precision
+        self.amp = amp
+        self.num_threads = num_threads
+        self.interop_threads = interop_threads
+        self.inference_mode = inference_mode
+        self.channels_last = channels_last
+        if num_threads is not None or interop_threads is not None:
+            _configure_threads(num_threads, interop_threads)
+
+    def _default_precision(self):
+        import torch
+        if self.device.type == "cuda":
+            return "bf16" if torch.cuda.is_bf16_supported() else "fp16"
+        return "fp32"
+
+    def __repr__(self):
+        return (f"ExecutionPolicy(device={str(self.device)!r}, precision={self.precision!r}, amp={self.amp!r}, "
+                f"num_threads={self.num_threads!r}, inference_mode={self.inference_mode!r}, "
+                f"channels_last={self.channels_last!r})")
+
+    @property
+    def input_dtype(self):
+        """dtype float inputs must have: the weight dtype for fp16/bf16 weights, else float32."""
+        import torch
+        return {"fp16": torch.float16, "bf16": torch.bfloat16}.get(self.precision, torch.float32)
+
+    def get_model(self, model_name, pretrained):
+        """Borrow (model, transform) from model_manager with this policy's device and precision."""
+        import model_manager
+        return model_manager.get_model(model_name, pretrained, self.device, self.precision,
+                                       channels_last=self.channels_last)
+
+    def to_device(self, tensor):
+        """Move an input batch to the device, casting float images to the input dtype (channels-last if enabled)."""
+        import torch
+        non_blocking = self.device.type == "cuda"
+        if not tensor.is_floating_point():
+            return tensor.to(self.device, non_blocking=non_blocking)
+        memory_format = torch.channels_last if self.channels_last and tensor.dim() == 4 else torch.preserve_format
+        return tensor.to(self.device, dtype=self.input_dtype, non_blocking=non_blocking, memory_format=memory_format)
+
+    def context(self):
+        """Context manager for a forward pass: inference_mode (or no_grad) plus autocast when ``amp`` is set."""
+        import torch
+        stack = contextlib.ExitStack()
+        stack.enter_context(torch.inference_mode() if self.inference_mode else torch.no_grad())
+        if self.amp is not None:
+            dtype = torch.bfloat16 if self.amp == "bf16" else torch.float16
+            stack.enter_context(torch.autocast(device_type=self.device.type, dtype=dtype))
+        return stack
+
@@ -1,210 +1,62 @@
-
-class Bot: 
-    _id_counter_ = 0
-    def __init__(self, name):
-        self.id = Player._id_counter
-        Player._id_counter += 1
-        self.name = f'Bot #{self.id}'
-        self.hand = []
-        self.score = 0
-        
-    def choose_card(self):
-        print(f"{self.name}, choose a card from your hand:")
-        for i, card in enumerate(self.hand):
-            print(f"{i + 1}: Card {card}")
-        choice = int(input("Enter the number of the card: ")) - 1
-        return self.hand.pop(choice)
-
-    def vote(self, table):
-        print(f"{self.name}, vote for the card you think is the storyteller's card:")
-        for i, card in enumerate(table):
-            print(f"{i + 1}: Card {card[1]}")
-        vote = int(input("Enter the number of the card: ")) - 1
-        return vote
-
-    # does the choosing card component inside of this function because storyteller and player card choice is different
-    # does not do any obfuscation on hint right now 
-    def storyteller_turn(self):
-        print(f"\n{self.name} is the storyteller!")
-        self.hand = random.shuffle(self.hand)
-        card = self.hand.pop()
-        image = Image.open(card).convert("RGB")
-        image = transform(im).unsqueeze(0)
-        # query openclip with Image itself
-        with torch.no_grad(), torch.cuda.amp.autocast():
-                generated = model.generate(im)
-        clue = (open_clip.decode(generated[0]).split("<end_of_text>")[0].replace("<start_of_text>", ""))
-        return card, clue
-
-# temporary code storage ignore everything beneath this comment for the time being
-import os
+import logging
 import random
-import open_clip
-import torch
-from PIL import Image
 
-class Player:
-    _id_counter = 0
+import instrumentation
+from game_logic.humanAgent import Human
 
-    def __init__(self, name):
-        self.id = Player._id_counter
-        Player._id_counter += 1
-        self.name = name
-        self.hand = []
-        self.score = 0
+logger = logging.getLogger(__name__)
 
-    def choose_card(self):
-        print(f"{self.name}, choose a card from your hand:")
-        for i, card in enumerate(self.hand):
-            print(f"{i + 1}: Card {card}")
-        choice = int(input("Enter the number of the card: ")) - 1
-        return self.hand.pop(choice)
+# clue given by a storyteller that has no pipeline to come up with a real one
+FALLBACK_CLUE = "..."
 
-    def vote(self, table):
-        print(f"{self.name}, vote for the card you think is the storyteller's card:")
-        for i, card in enumerate(table):
-            print(f"{i + 1}: Card {card[1]}")
-        vote = int(input("Enter the number of the card: ")) - 1
-        return vote
 
-    def storyteller_turn(self):
-        print(f"\n{self.name} is the storyteller!")
-        card = self.choose_card()
-        clue = input("Enter a clue for your card: ")
-        return card, clue
-
-class Bot: 
-    _id_counter_ = 0
-    def __init__(self, name):
-        self.id = Player._id_counter
-        Player._id_counter += 1
-        self.name = f'Bot #{self.id}'
+class Bot:
+    def __init__(self, name=None, pipeline=None, profile_path=None, strategy=None, rng=None):
+        # ids come from the same counter as Human so mixed tables never share an id
+        self.id = Human._id_counter
+        Human._id_counter += 1
+        self.name = name or f'Bot #{self.id}'
         self.hand = []
         self.score = 0
-        
-    def choose_card(self):
-        print(f"{self.name}, choose a card from your hand:")
-        for i, card in enumerate(self.hand):
-            print(f"{i + 1}: Card {card}")
-        choice = int(input("Enter the number of the card: ")) - 1
-        return self.hand.pop(choice)
-
-    def vote(self, table):
-        print(f"{self.name}, vote for the card you think is the storyteller's card:")
-        for i, card in enumerate(table):
-            print(f"{i + 1}: Card {card[1]}")
-        vote = int(input("Enter the number of the card: ")) - 1
-        return vote
+        # a StorytellerPipeline, shared between bots so models are loaded once
+        self.pipeline = pipeline
+        # a VoteStrategy, also shared, so every bot reads the same cached clue x card scores
+        self.strategy = strategy
+        self.rng = rng or random.Random()
+        self.last_report = None
+        # when set, the next storyteller turn is profiled into this file (then the hook is cleared)
+        self.profile_path = profile_path
+
+    # without a clue, a strategy or a pipeline the bot falls back to random play
+    def pick_card(self, hand, clue=None):
+        """Index of the hand card to play for the clue; the hand is not changed."""
+        if self.strategy is None or clue is None:
+            return self.rng.randrange(len(hand))
+        return self.strategy.choose_card(clue, hand)
+
+    def choose_card(self, clue=None):
+        return self.hand.pop(self.pick_card(self.hand, clue))
+
+    def vote(self, table, clue=None):
+        if self.strategy is None or clue is None:
+            return self.rng.choice([i for i, (player_id, _) in enumerate(table) if player_id != self.id])
+        return self.strategy.vote(clue, table, self.id)
+
+    # picks the card and the clue together: every hand card is captioned and the best scoring pair wins
+    def pick_story(self, hand):
+        """(card, clue) for a storyteller turn with this hand; the hand is not changed."""
+        if self.pipeline is None:
+            return hand[self.rng.randrange(len(hand))], FALLBACK_CLUE
+        logger.debug("%s is choosing a card and clue from %d cards", self.name, len(hand))
+        if self.profile_path:
+            with instrumentation.profile(self.profile_path):
+                card, clue, self.last_report = self.pipeline.choose(hand)
+            self.profile_path = None
+        else:
+            card, clue, self.last_report = self.pipeline.choose(hand)
+        return card, clue
 
-    # does the choosing card component inside of this function because storyteller and player card choice is different
-    # does not do any obfuscation on hint right now 
     def storyteller_turn(self):
-        print(f"\n{self.name} is the storyteller!")
-        self.hand = random.shuffle(self.hand)
-        card = self.hand.pop()
-        image = Image.open(card).convert("RGB")
-        image = transform(im).unsqueeze(0)
-        # query openclip with Image itself
-        with torch.no_grad(), torch.cuda.amp.autocast():
-                generated = model.generate(im)
-        clue = (open_clip.decode(generated[0]).split("<end_of_text>")[0].replace("<start_of_text>", ""))
+        card, clue = self.pick_story(self.hand)
+        self.hand.remove(card)
         return card, clue
-
-def setup_game(num_players):
-    players = []
-    for i in range(num_players):
-        name = input(f"Enter name for player {i + 1}: ")
-        players.append(Player(name))
-    return players
-
-def deal_cards(players, cur_deck):
-    deck = random.shuffle(cur_deck)
-    for player in players:
-        while player.hand.length < num_cards:
-            player.hand.append(deck.pop())
-    return deck
-
-def storyteller_turn(storyteller):
-    print(f"\n{storyteller.name} is the storyteller!")
-    card = storyteller.choose_card()
-    clue = input("Enter a clue for your card: ")
-    return card, clue
-
-def collect_cards(players, storyteller_card, storyteller):
-    table = [(storyteller.id, storyteller_card)]
-    played_cards = [(storyteller.id, storyteller_card)]
-    for player in players:
-        if player != storyteller:
-            chosen_card = player.choose_card()
-            table.append((player.id, chosen_card))
-            played_cards.append((player.id, chosen_card))
-    random.shuffle(table)
-    return table, played_cards
-
-def score_round(players, storyteller, storyteller_card, table, votes):
-    storyteller_card_index = next(i for i, (player_id, card) in enumerate(table) if card == storyteller_card)
-    correct_votes = votes.count(storyteller_card_index)
-
-    if correct_votes == 0 or correct_votes == len(players) - 1:
-        # If all or none of the players found the storyteller's image
-        for player in players:
-            if player != storyteller:
-                player.score += 2
-    else:
-        # Storyteller and those who found the correct image score 3 points
-        storyteller.score += 3
-        for player, vote in zip(players, votes):
-            if vote == storyteller_card_index and player != storyteller:
-                player.score += 3
-
-    # Each player, except the storyteller, scores 1 point for each vote on their card
-    for i, player in enumerate(players):
-        if player != storyteller:
-            player_votes = sum(1 for vote in votes if table[vote][0] == player.id)
-            player.score += player_votes
-
-def play_game(players):
-    while True:
-        for storyteller in players:
-            storyteller_card, clue = storyteller.storyteller_turn()
-            print(f"\nClue: {clue}\n")
-            table, played_cards = collect_cards(players, storyteller_card, storyteller)
-            votes = []
-            for player in players:
-                if player != storyteller:
-                    votes.append(player.vote(table))
-            score_round(players, storyteller, storyteller_card, table, votes)
-            print("\nScores:")
-            for player in players:
-                print(f"{player.name}: {player.score} points")
-
-            cont = input("\nPlay another round? (y/n): ")
-            if cont.lower() != 'y':
-                print("\nFinal Scores:")
-                for player in players:
-                    print(f"{player.name}: {player.score} points")
-                return
-            
-            deal_cards(players, 1)
-
-# makes the images (deck) array
-def load_images_from_directory(directory):
-    initial_deck = []
-    for filename in os.listdir(directory):
-        if filename.endswith(('.png', '.jpg', '.jpeg')):
-            name = os.path.join(directory, filename)
-            initial_deck.append(name)
-    return initial_deck
-
-
-if __name__ == "__main__":
-    print("Welcome to Dixit!")
-    num_players = int(input("Enter number of players: "))
-    players = setup_game(num_players)
-
-    # deck initialization 
-    all_cards = {}
-    deck = load_images_from_directory("./cards")
-    cur_deck = deal_cards(players, 6)
-    play_game(players)
-
@@ -1,5 +1,5 @@
-import os
 import random
+from deck_loader import load_images_from_directory
 from game_logic.humanAgent import Human
 
 # need to make model variables global so they can be accessed by bot calls and not reinitialized every 
@@ -15,10 +15,10 @@ def setup_game(num_players):
         players.append(Human(name))
     return players
 
-def deal_cards(players, cur_deck):
-    deck = random.shuffle(cur_deck)
+def deal_cards(players, deck, num_cards=6):
+    """Top up every hand to num_cards from the end of an already shuffled deck."""
     for player in players:
-        while player.hand.length < num_cards:
+        while len(player.hand) < num_cards and deck:
             player.hand.append(deck.pop())
     return deck
 
@@ -28,15 +28,16 @@ def storyteller_turn(storyteller):
     clue = input("Enter a clue for your card: ")
     return card, clue
 
-def collect_cards(players, storyteller_card, storyteller):
+# clue is passed on to agents that choose their card based on it, rng lets simulations seed the table order
+def collect_cards(players, storyteller_card, storyteller, clue=None, rng=random):
     table = [(storyteller.id, storyteller_card)]
     played_cards = [(storyteller.id, storyteller_card)]
     for player in players:
         if player != storyteller:
-            chosen_card = player.choose_card()
+            chosen_card = player.choose_card() if clue is None else player.choose_card(clue)
             table.append((player.id, chosen_card))
             played_cards.append((player.id, chosen_card))
-    random.shuffle(table)
+    rng.shuffle(table)
     return table, played_cards
 
 def score_round(players, storyteller, storyteller_card, table, votes):
@@ -50,9 +51,11 @@ def score_round(players, storyteller, storyteller_card, table, votes):
                 player.score += 2
     else:
         # Storyteller and those who found the correct image score 3 points
+        # votes are in player order with the storyteller skipped
         storyteller.score += 3
-        for player, vote in zip(players, votes):
-            if vote == storyteller_card_index and player != storyteller:
+        voters = [player for player in players if player != storyteller]
+        for player, vote in zip(voters, votes):
+            if vote == storyteller_card_index:
                 player.score += 3
 
     # Each player, except the storyteller, scores 1 point for each vote on their card
@@ -61,17 +64,28 @@ def score_round(players, storyteller, storyteller_card, table, votes):
             player_votes = sum(1 for vote in votes if table[vote][0] == player.id)
             player.score += player_votes
 
-def play_game(players):
+# event_log is an optional event_log.EventLogWriter that records every round for later analysis
+def play_game(players, deck, event_log=None):
+    round_index = 0
     while True:
         for storyteller in players:
             storyteller_card, clue = storyteller.storyteller_turn()
             print(f"\nClue: {clue}\n")
-            table, played_cards = collect_cards(players, storyteller_card, storyteller)
+            table, played_cards = collect_cards(players, storyteller_card, storyteller, clue=clue)
             votes = []
             for player in players:
                 if player != storyteller:
-                    votes.append(player.vote(table))
+                    votes.append(player.vote(table, clue))
+            before = {player.id: player.score for player in players}
             score_round(players, storyteller, storyteller_card, table, votes)
+            if event_log is not None:
+                voters = [player for player in players if player != storyteller]
+                report = getattr(storyteller, "last_report", None)
+                event_log.write_round(round_index, storyteller.id, clue, table, played_cards,
+                                      {player.id: vote for player, vote in zip(voters, votes)},
+                                      {player.id: player.score - before[player.id] for player in players},
+                                      report["timings"] if report else None)
+            round_index += 1
             print("\nScores:")
             for player in players:
                 print(f"{player.name}: {player.score} points")
@@ -81,22 +95,14 @@ def play_game(players):
                 print("\nFinal Scores:")
                 for player in players:
                     print(f"{player.name}: {player.score} points")
+                if event_log is not None:
+                    event_log.flush()
                 return
             
-            deal_cards(players, 1)
-
-# makes the images (deck) array
-def load_images_from_directory(directory):
-    initial_deck = []
-    for filename in os.listdir(directory):
-        if filename.endswith(('.png', '.jpg', '.jpeg')):
-            name = os.path.join(directory, filename)
-            initial_deck.append(name)
-    return initial_deck
-
+            deal_cards(players, deck)
 
 if __name__ == "__main__":
-    model, transform, device = initialize_model()
+    # a human-only game needs no models, bots load theirs through model_manager on first use
     print("Welcome to Dixit!")
     num_players = int(input("Enter number of players: "))
     players = setup_game(num_players)
@@ -104,5 +110,6 @@ if __name__ == "__main__":
     # deck initialization 
     all_cards = {}
     deck = load_images_from_directory("./cards")
-    cur_deck = deal_cards(players, 6)
-    play_game(players)
+    random.shuffle(deck)
+    deal_cards(players, deck)
+    play_game(players, deck)
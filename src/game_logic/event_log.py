@@ -0,0 +1,338 @@
+import argparse
+import math
+import numbers
+import os
+import struct
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+# Append-only binary log of played rounds.
+#
+# The file starts with MAGIC, followed by length-prefixed records (uint32 little-endian length,
+# then the payload, whose first byte is the record type):
+#   SEGMENT  a writer session starts here; string references restart from 0
+#   STRING   defines the next string reference: a clue, a card or a timing stage name
+#   ROUND    one round, with cards, clues and stages as references to earlier STRING records
+# Interning keeps repeated card paths and stage names to 4 bytes per use, and a reader never
+# needs more than the current segment's strings in memory. Writers start a new segment once a
+# segment holds ``max_strings`` strings, since clues are rarely repeated. A truncated final
+# record (e.g. after a crash mid-write) is ignored by readers and cut off by the next writer.
+# Counts and table positions inside a ROUND are uint16, so a round holds at most 65535 of each.
+
+MAGIC = b"DIXITLOG\x02"
+SEGMENT, STRING, ROUND = 0, 1, 2
+_STR, _INT = 0, 1
+
+_LENGTH = struct.Struct("<I")
+_ROUND_HEAD = struct.Struct("<BIIiIH")
+_COUNT = struct.Struct("<H")
+_MAX_COUNT = (1 << 16) - 1
+_TABLE_ENTRY = struct.Struct("<iI")
+_VOTE = struct.Struct("<iH")
+_DELTA = struct.Struct("<ih")
+_TIMING = struct.Struct("<If")
+_INT_VALUE = struct.Struct("<q")
+
+
+@dataclass
+class LoggedRound:
+    game_id: int
+    round_index: int
+    storyteller_id: int
+    clue: str
+    table: list
+    played_cards: list
+    votes: dict
+    score_deltas: dict
+    timings: dict = field(default_factory=dict)
+
+
+class EventLogWriter:
+    """Appends rounds to an event log, flushing every ``flush_every`` rounds or ``flush_interval`` seconds.
+
+    Usable directly as a HeadlessGame/GameSession ``on_round`` hook; set ``game_id`` between
+    games or pass it to ``write_result``. An existing log is appended to after cutting off a
+    record left half-written by a crash.
+    """
+
+    def __init__(self, path, flush_every=256, flush_interval=1.0, fsync=False, max_strings=65536):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_strings = max_strings
+        self.game_id = 0
+        self.rounds_written = 0
+        end = _complete_length(path)
+        self._file = open(path, "r+b" if end is not None else "wb")
+        if end is None:
+            self._file.write(MAGIC)
+        else:
+            self._file.truncate(end)
+            self._file.seek(end)
+        self._buffer = bytearray()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._new_segment()
+
+    def _new_segment(self):
+        self._strings = {}
+        self._record(bytes([SEGMENT]))
+
+    def _record(self, payload):
+        self._buffer += _LENGTH.pack(len(payload))
+        self._buffer += payload
+
+    def _ref(self, value):
+        # numpy card ids are Integral but not int, and would otherwise come back as strings
+        key = (_INT, int(value)) if isinstance(value, numbers.Integral) else (_STR, str(value))
+        ref = self._strings.get(key)
+        if ref is None:
+            ref = self._strings[key] = len(self._strings)
+            if key[0] == _INT:
+                self._record(bytes([STRING, _INT]) + _INT_VALUE.pack(key[1]))
+            else:
+                self._record(bytes([STRING, _STR]) + key[1].encode())
+        return ref
+
+    def write_round(self, round_index, storyteller_id, clue, table, played_cards, votes, score_deltas,
+                    timings=None, game_id=None):
+        """Append one round. ``votes`` maps voter id to table index, ``score_deltas`` player id to points."""
+        timings = timings or {}
+        if max(len(table), len(votes), len(score_deltas), len(timings)) > _MAX_COUNT:
+            raise ValueError(f"a logged round holds at most {_MAX_COUNT} table entries, votes, deltas and timings")
+        if len(self._strings) >= self.max_strings:
+            # bounds the string table here and in readers; a round's strings all go in one segment
+            self._new_segment()
+        clue_ref = self._ref(clue)
+        card_refs = [self._ref(card) for _, card in table]
+        position = {entry: i for i, entry in enumerate(map(tuple, table))}
+        stage_refs = [self._ref(stage) for stage in timings]
+
+        parts = [_ROUND_HEAD.pack(ROUND, self.game_id if game_id is None else game_id, round_index,
+                                  storyteller_id, clue_ref, len(table))]
+        parts += [_TABLE_ENTRY.pack(player_id, ref) for (player_id, _), ref in zip(table, card_refs)]
+        parts.append(_COUNT.pack(len(played_cards)))
+        parts += [_COUNT.pack(position[tuple(entry)]) for entry in played_cards]
+        parts.append(_COUNT.pack(len(votes)))
+        parts += [_VOTE.pack(voter, vote) for voter, vote in votes.items()]
+        parts.append(_COUNT.pack(len(score_deltas)))
+        parts += [_DELTA.pack(player_id, delta) for player_id, delta in score_deltas.items()]
+        parts.append(_COUNT.pack(len(timings)))
+        parts += [_TIMING.pack(ref, math.nan if seconds is None else seconds)
+                  for ref, seconds in zip(stage_refs, timings.values())]
+        self._record(b"".join(parts))
+
+        self.rounds_written += 1
+        self._pending += 1
+        if self._pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def write_result(self, result, game_id=None):
+        """Append a simulation.RoundResult."""
+        self.write_round(result.round_index, result.storyteller_id, result.clue, result.table, result.played_cards,
+                         result.votes, result.score_deltas, result.timings, game_id)
+
+    __call__ = write_result
+
+    def flush(self):
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._buffer.clear()
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _complete_length(path):
+    """Byte length of the log up to its last complete record, or None if there is no valid log to extend."""
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return None
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            if size == 0 or MAGIC.startswith(magic):
+                # empty, or the crash happened while writing the header
+                return None
+            _check_magic(path, magic)
+        end = len(MAGIC)
+        while True:
+            header = f.read(_LENGTH.size)
+            if len(header) < _LENGTH.size:
+                return end
+            length, = _LENGTH.unpack(header)
+            if end + _LENGTH.size + length > size:
+                return end
+            end += _LENGTH.size + length
+            f.seek(end)
+
+
+def _check_magic(path, magic):
+    if magic == MAGIC:
+        return
+    if len(magic) == len(MAGIC) and magic[:-1] == MAGIC[:-1]:
+        raise ValueError(f"{path} is a version {magic[-1]} Dixit event log, this reader handles version {MAGIC[-1]}")
+    raise ValueError(f"{path} is not a Dixit event log")
+
+
+def read_rounds(path, chunk_size=1 << 20):
+    """Stream the LoggedRounds of an event log in write order, holding one chunk in memory at a time."""
+    with open(path, "rb") as f:
+        _check_magic(path, f.read(len(MAGIC)))
+        strings = []
+        buffer = b""
+        offset = 0
+        while True:
+            if len(buffer) - offset < _LENGTH.size or len(buffer) - offset < _LENGTH.size + _LENGTH.unpack_from(buffer, offset)[0]:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                buffer = buffer[offset:] + chunk
+                offset = 0
+                continue
+            length, = _LENGTH.unpack_from(buffer, offset)
+            start = offset + _LENGTH.size
+            offset = start + length
+            kind = buffer[start]
+            if kind == ROUND:
+                yield _parse_round(buffer, start, strings)
+            elif kind == STRING:
+                if buffer[start + 1] == _INT:
+                    strings.append(_INT_VALUE.unpack_from(buffer, start + 2)[0])
+                else:
+                    strings.append(buffer[start + 2:offset].decode())
+            elif kind == SEGMENT:
+                strings = []
+
+
+def _parse_round(buffer, offset, strings):
+    _, game_id, round_index, storyteller_id, clue_ref, table_size = _ROUND_HEAD.unpack_from(buffer, offset)
+    offset += _ROUND_HEAD.size
+    table = []
+    for _ in range(table_size):
+        player_id, ref = _TABLE_ENTRY.unpack_from(buffer, offset)
+        table.append((player_id, strings[ref]))
+        offset += _TABLE_ENTRY.size
+    count, = _COUNT.unpack_from(buffer, offset)
+    offset += _COUNT.size
+    played_cards = [table[i] for i, in _COUNT.iter_unpack(buffer[offset:offset + count * _COUNT.size])]
+    offset += count * _COUNT.size
+    votes = {}
+    count, = _COUNT.unpack_from(buffer, offset)
+    offset += _COUNT.size
+    for _ in range(count):
+        voter, vote = _VOTE.unpack_from(buffer, offset)
+        votes[voter] = vote
+        offset += _VOTE.size
+    score_deltas = {}
+    count, = _COUNT.unpack_from(buffer, offset)
+    offset += _COUNT.size
+    for _ in range(count):
+        player_id, delta = _DELTA.unpack_from(buffer, offset)
+        score_deltas[player_id] = delta
+        offset += _DELTA.size
+    timings = {}
+    count, = _COUNT.unpack_from(buffer, offset)
+    offset += _COUNT.size
+    for _ in range(count):
+        ref, seconds = _TIMING.unpack_from(buffer, offset)
+        timings[strings[ref]] = None if math.isnan(seconds) else seconds
+        offset += _TIMING.size
+    return LoggedRound(game_id, round_index, storyteller_id, strings[clue_ref], table, played_cards, votes,
+                       score_deltas, timings)
+
+
+class RoundAnalytics:
+    """Streaming aggregates over logged rounds; memory grows with the deck and players, not the log."""
+
+    def __init__(self):
+        self.rounds = 0
+        # storyteller card -> [times told, voters, voters who found it]
+        self.card_guesses = defaultdict(lambda: [0, 0, 0])
+        # card -> votes it drew while played as a decoy
+        self.decoy_votes = defaultdict(int)
+        # fraction of voters who found the storyteller card, in tenths, plus the scoring buckets
+        self.found_histogram = [0] * 11
+        self.nobody_found = 0
+        self.everybody_found = 0
+        self.stage_seconds = defaultdict(lambda: [0, 0.0])
+
+    def add(self, logged):
+        self.rounds += 1
+        storyteller_card = next(card for player_id, card in logged.table if player_id == logged.storyteller_id)
+        storyteller_index = logged.table.index((logged.storyteller_id, storyteller_card))
+        found = sum(1 for vote in logged.votes.values() if vote == storyteller_index)
+        voters = len(logged.votes)
+
+        stats = self.card_guesses[storyteller_card]
+        stats[0] += 1
+        stats[1] += voters
+        stats[2] += found
+        for vote in logged.votes.values():
+            if vote != storyteller_index:
+                self.decoy_votes[logged.table[vote][1]] += 1
+        if voters:
+            self.found_histogram[round(10 * found / voters)] += 1
+            self.nobody_found += found == 0
+            self.everybody_found += found == voters
+        for stage, seconds in logged.timings.items():
+            if seconds is not None:
+                self.stage_seconds[stage][0] += 1
+                self.stage_seconds[stage][1] += seconds
+
+    def guess_rates(self):
+        """Per storyteller card: the fraction of voters who found it."""
+        return {card: found / voters for card, (_, voters, found) in self.card_guesses.items() if voters}
+
+    def report(self, top=10):
+        rates = self.guess_rates()
+        ranked = sorted(rates, key=rates.get)
+        return {
+            "rounds": self.rounds,
+            "nobody_found": self.nobody_found / self.rounds if self.rounds else 0.0,
+            "everybody_found": self.everybody_found / self.rounds if self.rounds else 0.0,
+            "found_fraction_histogram": {f"{i / 10:.1f}": count for i, count in enumerate(self.found_histogram)},
+            "hardest_cards": [(card, rates[card]) for card in ranked[:top]],
+            "easiest_cards": [(card, rates[card]) for card in reversed(ranked[-top:])],
+            "best_decoys": sorted(self.decoy_votes.items(), key=lambda item: -item[1])[:top],
+            "mean_stage_seconds": {stage: total / count for stage, (count, total) in self.stage_seconds.items()},
+        }
+
+
+def analyze(path):
+    """Stream an event log once and return its RoundAnalytics."""
+    analytics = RoundAnalytics()
+    for logged in read_rounds(path):
+        analytics.add(logged)
+    return analytics
+
+
+if __name__ == "__main__":
+    import json
+
+    parser = argparse.ArgumentParser(description="Summarize a Dixit event log (per-card guess rates, clue ambiguity).")
+    parser.add_argument("path")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    analytics = analyze(args.path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps(analytics.report(args.top), indent=2, default=str))
+    print(f"{analytics.rounds} rounds in {elapsed:.2f}s ({analytics.rounds / max(elapsed, 1e-9):.0f} rounds/s)")
@@ -0,0 +1,145 @@
+import numpy as np
+
+# marks an empty hand slot, an unfilled table slot or the storyteller's (absent) vote
+EMPTY = -1
+
+
+class PlayerRecord:
+    __slots__ = ("id", "name", "score")
+
+    def __init__(self, player_id, name=None, score=0):
+        self.id = player_id
+        self.name = name or f"Player #{player_id}"
+        self.score = score
+
+
+class GameState:
+    """Compact game state for bulk simulation.
+
+    Cards are integer ids (positions in the deck), players are indexed 0..P-1 and every
+    per-round quantity is a NumPy array:
+      hands         P x hand_size card ids, EMPTY for free slots
+      table         P card ids in table order
+      table_owners  P player indices, owner of each table slot
+      votes         P table slots, one per player, EMPTY for the storyteller
+    """
+
+    __slots__ = ("players", "deck", "hands", "table", "table_owners", "votes", "storyteller", "rng")
+
+    def __init__(self, num_players, num_cards, hand_size=6, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.players = [PlayerRecord(i) for i in range(num_players)]
+        self.deck = list(self.rng.permutation(num_cards))
+        self.hands = np.full((num_players, hand_size), EMPTY, dtype=np.int32)
+        self.table = np.full(num_players, EMPTY, dtype=np.int32)
+        self.table_owners = np.full(num_players, EMPTY, dtype=np.int32)
+        self.votes = np.full(num_players, EMPTY, dtype=np.int32)
+        self.storyteller = 0
+        self.deal()
+
+    @property
+    def num_players(self):
+        return len(self.players)
+
+    @property
+    def scores(self):
+        return np.array([player.score for player in self.players])
+
+    def deal(self):
+        """Fill empty hand slots from the deck, player by player. Returns False once the deck runs out."""
+        for player, slot in zip(*np.nonzero(self.hands == EMPTY)):
+            if not self.deck:
+                return False
+            self.hands[player, slot] = self.deck.pop()
+        return True
+
+    def start_round(self, storyteller):
+        self.storyteller = storyteller
+        self.table.fill(EMPTY)
+        self.table_owners.fill(EMPTY)
+        self.votes.fill(EMPTY)
+
+    def play_card(self, player, slot):
+        """Move a card from a player's hand onto the table and return its id."""
+        card = self.hands[player, slot]
+        self.hands[player, slot] = EMPTY
+        # cards sit in player order until shuffle_table
+        self.table[player] = card
+        self.table_owners[player] = player
+        return card
+
+    def shuffle_table(self):
+        order = self.rng.permutation(self.num_players)
+        self.table[:] = self.table[order]
+        self.table_owners[:] = self.table_owners[order]
+
+    def vote(self, player, table_slot):
+        self.votes[player] = table_slot
+
+    def score(self):
+        """Score the current round and return the per-player score deltas."""
+        deltas = score_rounds(np.array([self.storyteller]), self.table_owners[None], self.votes[None])[0]
+        for player, delta in zip(self.players, deltas):
+            player.score += int(delta)
+        return deltas
+
+
+def score_rounds(storytellers, table_owners, votes):
+    """Score a batch of R rounds at once with the same rules as dixit.score_round.
+
+    storytellers  (R,) storyteller player index per round
+    table_owners  (R, P) owning player index of each table slot
+    votes         (R, P) table slot voted by each player, ignored for the storyteller
+    Returns an (R, P) integer array of score deltas.
+    """
+    storytellers = np.asarray(storytellers)
+    table_owners = np.asarray(table_owners)
+    votes = np.asarray(votes)
+    num_rounds, num_players = votes.shape
+    rounds = np.arange(num_rounds)
+
+    is_voter = np.ones((num_rounds, num_players), dtype=bool)
+    is_voter[rounds, storytellers] = False
+
+    storyteller_slot = np.argmax(table_owners == storytellers[:, None], axis=1)
+    correct = is_voter & (votes == storyteller_slot[:, None])
+    num_correct = correct.sum(axis=1)
+    all_or_none = (num_correct == 0) | (num_correct == num_players - 1)
+
+    # all or none found it: everyone but the storyteller scores 2,
+    # otherwise the storyteller and every correct voter score 3
+    deltas = np.where(all_or_none[:, None], 2 * is_voter, 3 * correct)
+    deltas[rounds, storytellers] += np.where(all_or_none, 0, 3)
+
+    # every player but the storyteller scores 1 per vote on their card
+    voted_owner = np.take_along_axis(table_owners, np.where(is_voter, votes, 0), axis=1)
+    voted_owner = np.where(is_voter, voted_owner, EMPTY)
+    received = (voted_owner[:, :, None] == np.arange(num_players)).sum(axis=1)
+    received[rounds, storytellers] = 0
+    return deltas + received
+
+
+if __name__ == "__main__":
+    import time
+    from game_logic.dixit import score_round
+
+    num_rounds, num_players = 100_000, 6
+    rng = np.random.default_rng(0)
+    storytellers = rng.integers(num_players, size=num_rounds)
+    table_owners = np.argsort(rng.random((num_rounds, num_players)), axis=1)
+    votes = rng.integers(num_players, size=(num_rounds, num_players))
+
+    start = time.perf_counter()
+    score_rounds(storytellers, table_owners, votes)
+    vectorized = time.perf_counter() - start
+
+    players = [PlayerRecord(i) for i in range(num_players)]
+    start = time.perf_counter()
+    for storyteller, owners, round_votes in zip(storytellers, table_owners, votes):
+        table = [(int(owner), int(owner)) for owner in owners]
+        voter_votes = [int(vote) for player, vote in enumerate(round_votes) if player != storyteller]
+        score_round(players, players[storyteller], int(storyteller), table, voter_votes)
+    looped = time.perf_counter() - start
+
+    print(f"{num_rounds} rounds: score_round loop {looped:.2f}s, score_rounds {vectorized:.3f}s "
+          f"({looped / vectorized:.0f}x)")
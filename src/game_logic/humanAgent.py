@@ -8,14 +8,15 @@ class Human:
         self.hand = []
         self.score = 0
 
-    def choose_card(self):
+    # the clue is passed by games that deal it out with the turn, a human has already read it
+    def choose_card(self, clue=None):
         print(f"{self.name}, choose a card from your hand:")
         for i, card in enumerate(self.hand):
             print(f"{i + 1}: Card {card}")
         choice = int(input("Enter the number of the card: ")) - 1
         return self.hand.pop(choice)
 
-    def vote(self, table):
+    def vote(self, table, clue=None):
         print(f"{self.name}, vote for the card you think is the storyteller's card:")
         for i, card in enumerate(table):
             print(f"{i + 1}: Card {card[1]}")
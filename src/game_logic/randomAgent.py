@@ -0,0 +1,29 @@
+import random
+
+
+class RandomAgent:
+    """Non-interactive agent that plays uniformly at random, a baseline for simulations."""
+
+    def __init__(self, player_id, rng=None, name=None):
+        self.id = player_id
+        self.name = name or f"Random #{player_id}"
+        self.rng = rng or random.Random()
+        self.hand = []
+        self.score = 0
+
+    def choose_card(self, clue=None):
+        return self.hand.pop(self.rng.randrange(len(self.hand)))
+
+    def vote(self, table, clue=None):
+        # players may not vote for their own card
+        choices = [i for i, (player_id, _) in enumerate(table) if player_id != self.id]
+        return self.rng.choice(choices)
+
+    def storyteller_turn(self):
+        card = self.choose_card()
+        return card, f"clue for {card}"
+
+
+def random_agents(num_players, rng):
+    """Agent factory for the simulation engine: num_players RandomAgents sharing the game's rng."""
+    return [RandomAgent(i, rng) for i in range(num_players)]
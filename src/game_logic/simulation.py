@@ -0,0 +1,163 @@
+import argparse
+import functools
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from multiprocessing import Pool
+
+from game_logic.dixit import collect_cards, deal_cards, score_round
+
+# Headless game engine for bot-vs-bot simulation. Agents follow the same turn protocol as
+# Human, except that choose_card and vote also receive the clue:
+#   storyteller_turn() -> (card, clue)
+#   choose_card(clue) -> card, removed from the agent's hand
+#   vote(table, clue) -> index into table
+# Agents need id, name, hand and score attributes, like Human.
+
+
+def storyteller_timings(storyteller):
+    """Stage timings of the storyteller's last turn, for agents that report them (like Bot)."""
+    report = getattr(storyteller, "last_report", None)
+    return dict(report["timings"]) if report else {}
+
+
+@dataclass
+class RoundResult:
+    round_index: int
+    storyteller_id: int
+    clue: str
+    storyteller_card: object
+    table: list
+    votes: dict
+    score_deltas: dict
+    scores: dict
+    # cards in the order they were submitted (storyteller first), before the table was shuffled
+    played_cards: list = field(default_factory=list)
+    # per-stage seconds reported by the storyteller, e.g. a Bot's pipeline timings
+    timings: dict = field(default_factory=dict)
+
+
+@dataclass
+class GameResult:
+    seed: int
+    rounds: list = field(default_factory=list)
+    final_scores: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class HeadlessGame:
+    """Runs one game between non-interactive agents with a seeded rng."""
+
+    def __init__(self, agents, deck, seed=None, rng=None, hand_size=6, target_score=30, on_round=None):
+        self.agents = agents
+        self.seed = seed
+        self.rng = rng or random.Random(seed)
+        self.deck = list(deck)
+        self.rng.shuffle(self.deck)
+        self.hand_size = hand_size
+        self.target_score = target_score
+        # called with every RoundResult as soon as the round is scored
+        self.on_round = on_round
+        deal_cards(self.agents, self.deck, hand_size)
+
+    def play_round(self, round_index, storyteller):
+        storyteller_card, clue = storyteller.storyteller_turn()
+        table, played_cards = collect_cards(self.agents, storyteller_card, storyteller, clue=clue, rng=self.rng)
+
+        voters = [agent for agent in self.agents if agent != storyteller]
+        votes = [agent.vote(table, clue) for agent in voters]
+
+        before = {agent.id: agent.score for agent in self.agents}
+        score_round(self.agents, storyteller, storyteller_card, table, votes)
+
+        result = RoundResult(
+            round_index=round_index,
+            storyteller_id=storyteller.id,
+            clue=clue,
+            storyteller_card=storyteller_card,
+            table=table,
+            votes={agent.id: vote for agent, vote in zip(voters, votes)},
+            score_deltas={agent.id: agent.score - before[agent.id] for agent in self.agents},
+            scores={agent.id: agent.score for agent in self.agents},
+            played_cards=played_cards,
+            timings=storyteller_timings(storyteller),
+        )
+        if self.on_round is not None:
+            self.on_round(result)
+        return result
+
+    def play(self, max_rounds=None):
+        """Play until someone reaches the target score, hands can't be refilled, or max_rounds is hit."""
+        result = GameResult(seed=self.seed)
+        round_index = 0
+        while max_rounds is None or round_index < max_rounds:
+            storyteller = self.agents[round_index % len(self.agents)]
+            result.rounds.append(self.play_round(round_index, storyteller))
+            round_index += 1
+            if any(agent.score >= self.target_score for agent in self.agents):
+                break
+            if len(self.deck) < len(self.agents):
+                break
+            deal_cards(self.agents, self.deck, self.hand_size)
+        result.final_scores = {agent.id: agent.score for agent in self.agents}
+        return result
+
+
+def run_game(agent_factory, deck, seed, max_rounds=None, **game_kwargs):
+    """Build agents with ``agent_factory(rng)`` and play one seeded game."""
+    rng = random.Random(seed)
+    game = HeadlessGame(agent_factory(rng), deck, seed=seed, rng=rng, **game_kwargs)
+    return game.play(max_rounds=max_rounds)
+
+
+def _run_seeded_game(seed, agent_factory, deck, max_rounds, game_kwargs):
+    return run_game(agent_factory, deck, seed, max_rounds=max_rounds, **game_kwargs)
+
+
+def run_games(agent_factory, deck, num_games, seed=0, processes=None, max_rounds=None, **game_kwargs):
+    """Play num_games games with seeds seed..seed+num_games-1, in a process pool when processes > 1.
+
+    ``agent_factory`` must be picklable (a module-level function or functools.partial of one).
+    Results are returned in seed order.
+    """
+    seeds = range(seed, seed + num_games)
+    play = functools.partial(_run_seeded_game, agent_factory=agent_factory, deck=list(deck),
+                             max_rounds=max_rounds, game_kwargs=game_kwargs)
+    if processes == 1:
+        return [play(game_seed) for game_seed in seeds]
+    with Pool(processes) as pool:
+        return pool.map(play, seeds, chunksize=max(1, num_games // (4 * (processes or 1))))
+
+
+if __name__ == "__main__":
+    from game_logic.randomAgent import random_agents
+
+    parser = argparse.ArgumentParser(description="Benchmark headless self-play in games per second.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--deck-size", type=int, default=98)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--event-log", help="append every round to this event log")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_games(functools.partial(random_agents, args.players), range(args.deck_size), args.games,
+                        seed=args.seed, processes=args.processes)
+    elapsed = time.perf_counter() - start
+    rounds = sum(len(result.rounds) for result in results)
+    print(f"{args.games} games, {rounds} rounds in {elapsed:.2f}s: "
+          f"{args.games / elapsed:.1f} games/s, {rounds / elapsed:.1f} rounds/s")
+
+    if args.event_log:
+        from game_logic.event_log import EventLogWriter
+
+        # rounds come back from the worker processes, so the log is written here in seed order
+        start = time.perf_counter()
+        with EventLogWriter(args.event_log) as event_log:
+            for game_seed, result in enumerate(results, start=args.seed):
+                for round_result in result.rounds:
+                    event_log.write_result(round_result, game_id=game_seed)
+        print(f"logged {rounds} rounds in {time.perf_counter() - start:.2f}s to {args.event_log}")
@@ -1,58 +1,75 @@
-import os
 import random
-import open_clip
-import torch
-from PIL import Image
 
-device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+from deck_loader import load_image, load_images_from_directory
+from execution_policy import ExecutionPolicy
+from image_captioning.caption_store import CaptionStore
 
-model, _, transform = open_clip.create_model_and_transforms(
-    model_name="coca_ViT-L-14",
-    pretrained="mscoco_finetuned_laion2B-s13B-b90k"
-)
-model.to(device)
+MODEL_NAME = "coca_ViT-L-14"
+PRETRAINED = "mscoco_finetuned_laion2B-s13B-b90k"
+MODEL_VERSION = f"{MODEL_NAME}/{PRETRAINED}"
 
+_policy = None
 
-# makes the images (deck) array
-def load_images_from_directory(directory):
-    initial_deck = []
-    for filename in os.listdir(directory):
-        if filename.endswith(('.png', '.jpg', '.jpeg')):
-            name = os.path.join(directory, filename)
-            initial_deck.append(name)
-    return initial_deck
+
+def get_policy():
+    """Return the execution policy captions are generated with, created on first use."""
+    global _policy
+    if _policy is None:
+        _policy = ExecutionPolicy()
+    return _policy
+
+def get_model():
+    """Return the shared CoCa model and transform, loading them on first use."""
+    return get_policy().get_model(MODEL_NAME, PRETRAINED)
 
 def generate_description(imagePath):
-    im = Image.open(imagePath).convert("RGB")
-    im = transform(im).unsqueeze(0)
+    from image_captioning.generate_image_caption import decode_tokens
+
+    policy = get_policy()
+    model, transform = get_model()
+    im = policy.to_device(load_image(imagePath, transform).unsqueeze(0))
     # query openclip with Image itself
-    with torch.no_grad(), torch.cuda.amp.autocast():
-            generated = model.generate(im)
-    description = (open_clip.decode(generated[0]).split("<end_of_text>")[0].replace("<start_of_text>", ""))
+    with policy.context():
+        generated = model.generate(im)
+    return decode_tokens(generated)[0]
+
+def get_description(imagePath, caption_store):
+    """Read the precomputed caption for a card, generating and storing it only on a miss."""
+    description = caption_store.caption_for(imagePath, MODEL_VERSION)
+    if description is None:
+        description = generate_description(imagePath)
+        caption_store.store_for(imagePath, MODEL_VERSION, description)
     return description
 
+def choose_clue(card, candidate_clues, search_index, similarity):
+    """Pick the candidate clue (e.g. several Abstractor outputs) whose ambiguity over the deck suits the card best."""
+    from similarity.card_search import score_clue_ambiguity
+
+    return score_clue_ambiguity(search_index, similarity, candidate_clues, card)[0]["clue"]
+
 def main():
     # Directory where the images are saved
     image_directory = './cards'
     # Initialize all card storage, load images from the directory
     all_cards = {}
+    caption_store = CaptionStore()
     deck = load_images_from_directory(image_directory)
     hand = []
-    deck = random.shuffle(deck)
+    random.shuffle(deck)
 
     # Initialize hand with size of 6 
     for x in range(6):
         hand.append(deck.pop())
     
-    while (deck.length != 0):
+    while deck:
         # Select a card to play the role of the storyteller
-        hand = random.shuffle(hand)
+        random.shuffle(hand)
         current_card = hand.pop()
         if current_card in all_cards:
             current_description = all_cards[current_card]
 
         else: 
-            current_description = generate_description(current_card)
+            current_description = get_description(current_card, caption_store)
             all_cards[current_card] = current_description
 
         print(f"Storyteller selected the following description for {current_card}:")
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+
+import torch
+
+import instrumentation
+
+
+def expected_storyteller_points(scores, num_voters, sharpness=50.0, decoy_scores=None):
+    """Expected storyteller points for every (clue, card) pair of a K x N score matrix.
+
+    Voters see the card on a table with ``num_voters`` decoys. Each voter picks a card with
+    probability proportional to exp(sharpness * score), independently of the others, and a
+    decoy is weighted like the average of ``decoy_scores`` (K x M, the clues scored against a
+    sample of cards the other players might hold) or, without them, of the other N - 1 cards.
+    The storyteller scores 3 unless none or all of the voters find the card, so the
+    expectation is 3 * (1 - (1 - p)^V - p^V).
+    """
+    top = scores.max(dim=1, keepdim=True).values
+    if decoy_scores is not None:
+        top = torch.maximum(top, decoy_scores.max(dim=1, keepdim=True).values)
+    weights = torch.exp(sharpness * (scores - top))
+    if decoy_scores is not None:
+        decoy = torch.exp(sharpness * (decoy_scores - top)).mean(dim=1, keepdim=True)
+    else:
+        decoy = (weights.sum(dim=1, keepdim=True) - weights) / max(scores.shape[1] - 1, 1)
+    p = weights / (weights + num_voters * decoy)
+    return 3 * (1 - (1 - p) ** num_voters - p ** num_voters)
+
+
+class StorytellerPipeline:
+    """Chooses the storyteller's card and clue from a whole hand.
+
+    Stages, each timed in the returned report:
+      captions     several CoCa captions per hand card (beam search + top-p samples)
+      abstract     Abstractor clues for every caption (skipped once over the time budget)
+      postprocess  cleanup and leak/banned filtering of those clues, with a postprocessor
+      score        all (clue, hand card) pairs in one batched similarity call
+      choose       the pair with the best expected storyteller score; with a ``search_index`` over
+                   the deck, the clue among that card's ``deck_candidates`` best is then picked by
+                   its ambiguity over the whole deck (storyteller.choose_clue)
+    Async abstractors (those with ``generate_many``, e.g. AsyncAbstractor or a CachedAbstractor
+    around one) run on an event loop thread owned by the pipeline; ``close`` stops it.
+    """
+
+    def __init__(self, captioner, similarity, abstractor=None, num_captions=3, num_voters=3, sharpness=50.0,
+                 time_budget=None, postprocessor=None, decoys=None, search_index=None, deck_candidates=5):
+        self.captioner = captioner
+        self.similarity = similarity
+        self.abstractor = abstractor
+        self.num_captions = num_captions
+        self.num_voters = num_voters
+        self.sharpness = sharpness
+        # seconds per turn, abstraction is skipped when captioning already used it up
+        self.time_budget = time_budget
+        # a CluePostProcessor that cleans abstract clues and drops those leaking their caption's nouns
+        self.postprocessor = postprocessor
+        # cards standing in for the other players' (e.g. a deck sample), scored in the same call as the hand
+        self.decoys = list(decoys or [])
+        # a CardSearchIndex over the deck, for the final whole-deck ambiguity check of the clue
+        self.search_index = search_index
+        self.deck_candidates = deck_candidates
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+
+    def _event_loop(self):
+        """The pipeline's event loop, running on a daemon thread so async clients outlive a turn."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, name="storyteller-pipeline-loop",
+                                                     daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def _abstract(self, captions):
+        generate_many = getattr(self.abstractor, "generate_many", None)
+        if generate_many is not None:
+            return asyncio.run_coroutine_threadsafe(generate_many(captions), self._event_loop()).result()
+        return [self.abstractor.generate_creative_abstract(caption) for caption in captions]
+
+    def close(self):
+        """Stop the event loop thread, closing the async abstractor's connections first."""
+        with self._loop_lock:
+            loop, thread, self._loop, self._loop_thread = self._loop, self._loop_thread, None, None
+        if loop is None:
+            return
+        aclose = getattr(self.abstractor, "aclose", None)
+        if aclose is not None:
+            asyncio.run_coroutine_threadsafe(aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    def candidate_clues(self, hand, timings):
+        """Return the deduplicated candidate clues for a hand, recording stage timings."""
+        start = time.perf_counter()
+        captions = [caption for card_captions in self.captioner.generate_candidate_captions(hand, self.num_captions)
+                    for caption in card_captions]
+        timings["captions"] = time.perf_counter() - start
+
+        clues = list(captions)
+        if self.abstractor is not None:
+            if self.time_budget is not None and timings["captions"] >= self.time_budget:
+                timings["abstract"] = None
+            else:
+                start = time.perf_counter()
+                abstracts = self._abstract(captions)
+                timings["abstract"] = time.perf_counter() - start
+                if self.postprocessor is not None:
+                    start = time.perf_counter()
+                    sources = [caption for caption, clue in zip(captions, abstracts) if clue]
+                    abstracts = self.postprocessor.process([clue for clue in abstracts if clue], sources)
+                    timings["postprocess"] = time.perf_counter() - start
+                clues += [clue for clue in abstracts if clue]
+        return list(dict.fromkeys(clues))
+
+    def choose(self, hand):
+        """Return (card, clue, report) for the best card/clue pair in the hand."""
+        timings = {}
+        clues = self.candidate_clues(hand, timings)
+
+        start = time.perf_counter()
+        scores = self.similarity.score_cards(clues, list(hand) + self.decoys).float()
+        timings["score"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        decoy_scores = scores[:, len(hand):] if self.decoys else None
+        expected = expected_storyteller_points(scores[:, :len(hand)], self.num_voters, self.sharpness, decoy_scores)
+        best = int(expected.argmax().item())
+        clue_index, card_index = divmod(best, len(hand))
+        if self.search_index is not None and hand[card_index] in self.search_index:
+            from game_logic.storyteller import choose_clue
+
+            column = expected[:, card_index]
+            candidates = [clues[i] for i in column.argsort(descending=True)[:self.deck_candidates].tolist()]
+            clue_index = clues.index(choose_clue(hand[card_index], candidates, self.search_index, self.similarity))
+        timings["choose"] = time.perf_counter() - start
+
+        for stage, seconds in timings.items():
+            if seconds is not None:
+                instrumentation.observe(f"storyteller.{stage}.seconds", seconds)
+        instrumentation.observe("storyteller.num_clues", len(clues))
+
+        report = {
+            "timings": timings,
+            "total": sum(seconds for seconds in timings.values() if seconds),
+            "num_clues": len(clues),
+            "expected_points": float(expected[clue_index, card_index]),
+        }
+        return hand[card_index], clues[clue_index], report
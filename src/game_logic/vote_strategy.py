@@ -0,0 +1,104 @@
+import argparse
+import threading
+import time
+from collections import OrderedDict
+
+
+class VoteStrategy:
+    """Card choice and voting for non-storyteller bots from cached clue x card similarities.
+
+    Card embeddings are encoded once (normalized, as one N x D matrix) and each clue is scored
+    against all of them with a single matrix-vector product the first time it is seen. Every
+    bot at the table then reads its decision out of that cached row, so after the first call
+    of a round a decision is a handful of list lookups. Share one strategy between bots, also
+    across threads: the first bot to ask about a clue encodes it while the others wait for its row.
+    """
+
+    def __init__(self, similarity, cards=(), max_clues=64):
+        self.similarity = similarity
+        self.max_clues = max_clues
+        self._positions = {}
+        self._features = None
+        # clue -> similarity of the clue to every known card, by position
+        self._rows = OrderedDict()
+        self._lock = threading.RLock()
+        self.add_cards(cards)
+
+    def add_cards(self, cards):
+        """Encode cards (paths or deck ids) that are not known yet, e.g. the whole deck up front."""
+        with self._lock:
+            self._add_cards(cards)
+
+    def _add_cards(self, cards):
+        import torch
+
+        new = [card for card in dict.fromkeys(cards) if card not in self._positions]
+        if not new:
+            return
+        features = torch.nn.functional.normalize(self.similarity.encode_cards(new).float(), dim=-1)
+        self._features = features if self._features is None else torch.cat([self._features, features])
+        for card in new:
+            self._positions[card] = len(self._positions)
+        # cached rows no longer cover every card
+        self._rows.clear()
+
+    def _row(self, clue):
+        row = self._rows.get(clue)
+        if row is None:
+            import torch
+            text = torch.nn.functional.normalize(self.similarity.encode_texts([clue]).float(), dim=-1)[0]
+            row = self._rows[clue] = (self._features @ text.to(self._features.device)).tolist()
+            if len(self._rows) > self.max_clues:
+                self._rows.popitem(last=False)
+        else:
+            self._rows.move_to_end(clue)
+        return row
+
+    def scores(self, clue, cards):
+        """Cosine similarity of the clue to each card."""
+        with self._lock:
+            if any(card not in self._positions for card in cards):
+                self._add_cards(cards)
+            row = self._row(clue)
+            return [row[self._positions[card]] for card in cards]
+
+    def choose_card(self, clue, hand):
+        """Index of the hand card most likely to draw votes: the one closest to the clue."""
+        scores = self.scores(clue, hand)
+        return max(range(len(hand)), key=scores.__getitem__)
+
+    def vote(self, clue, table, own_id):
+        """Index of the table card most likely to be the storyteller's, never the voter's own."""
+        scores = self.scores(clue, [card for _, card in table])
+        return max((i for i, (player_id, _) in enumerate(table) if player_id != own_id), key=scores.__getitem__)
+
+
+if __name__ == "__main__":
+    import random
+
+    from deck_loader import Deck
+    from similarity.similarity import ImageTextSimilarity
+
+    parser = argparse.ArgumentParser(description="Measure warm per-decision latency of the vote strategy.")
+    parser.add_argument("--cards", default="data/cards")
+    parser.add_argument("--pretrained", default="laion2b_e16", help="'none' for random weights")
+    parser.add_argument("--decisions", type=int, default=10_000)
+    args = parser.parse_args()
+
+    deck = Deck(args.cards)
+    similarity = ImageTextSimilarity(pretrained=None if args.pretrained == "none" else args.pretrained, deck=deck)
+    strategy = VoteStrategy(similarity, deck.card_ids())
+    rng = random.Random(0)
+    clues = ["a long journey", "the moon", "hidden in plain sight", "music"]
+    for clue in clues:
+        strategy.scores(clue, deck.card_ids()[:1])  # warm the clue rows
+
+    start = time.perf_counter()
+    for i in range(args.decisions):
+        cards = rng.sample(deck.card_ids(), 6)
+        if i % 2:
+            strategy.choose_card(clues[i % len(clues)], cards)
+        else:
+            strategy.vote(clues[i % len(clues)], list(enumerate(cards)), own_id=0)
+    elapsed = time.perf_counter() - start
+    print(f"{args.decisions} decisions: {elapsed * 1e6 / args.decisions:.1f}us per decision")
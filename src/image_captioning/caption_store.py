@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import threading
+
+from content_hash import HashCache
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "captions.sqlite")
+
+
+class CaptionStore:
+    """Durable caption cache keyed by image content hash and captioning model version."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._hash_cache = HashCache()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS captions ("
+            "content_hash TEXT NOT NULL, model_version TEXT NOT NULL, caption TEXT NOT NULL, "
+            "PRIMARY KEY (content_hash, model_version))"
+        )
+        self._conn.commit()
+
+    def get(self, content_hash, model_version):
+        """Return the stored caption or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT caption FROM captions WHERE content_hash = ? AND model_version = ?",
+                (content_hash, model_version),
+            ).fetchone()
+        return row[0] if row else None
+
+    def known_hashes(self, model_version):
+        """Return the set of content hashes that already have a caption for a model version."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT content_hash FROM captions WHERE model_version = ?", (model_version,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def put_many(self, items, model_version):
+        """Store (content_hash, caption) pairs in a single transaction."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO captions (content_hash, model_version, caption) VALUES (?, ?, ?)",
+                [(content_hash, model_version, caption) for content_hash, caption in items],
+            )
+
+    def put(self, content_hash, model_version, caption):
+        self.put_many([(content_hash, caption)], model_version)
+
+    def caption_for(self, image_path, model_version):
+        """Look up the caption of an image file by its content hash."""
+        return self.get(self._hash_cache.get(image_path), model_version)
+
+    def store_for(self, image_path, model_version, caption):
+        """Store the caption of an image file under its content hash."""
+        self.put(self._hash_cache.get(image_path), model_version, caption)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,27 +1,96 @@
 import warnings
 import open_clip
-import torch
-from PIL import Image
+
+import instrumentation
+from deck_loader import load_image, preprocess_images
+from execution_policy import ExecutionPolicy
 
 warnings.filterwarnings("ignore", category=FutureWarning, message=".*weights_only=False.*")
 
+def decode_tokens(generated):
+    """Decode a batch of CoCa token ids, keeping only the text between <start_of_text> and <end_of_text>."""
+    tokenizer = open_clip.tokenizer._tokenizer
+    generated = generated.cpu()
+    before_end = (generated == tokenizer.eot_token_id).cumsum(dim=1) == 0
+    keep = before_end & (generated != tokenizer.sot_token_id)
+    return [open_clip.decode(tokens[mask]) for tokens, mask in zip(generated, keep)]
+
 class ImageCaptionGenerator:
-    def __init__(self, model_name="coca_ViT-L-14", pretrained="mscoco_finetuned_laion2B-s13B-b90k", device=None):
-        self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    def __init__(self, model_name="coca_ViT-L-14", pretrained="mscoco_finetuned_laion2B-s13B-b90k", device=None, precision=None, policy=None):
+        # device, precision (None picks one for the device) and grad/autocast mode for generation
+        self.policy = policy or ExecutionPolicy(device, precision)
+        self.device = self.policy.device
+        # identifies the captions this generator produces, e.g. for the caption store; like the
+        # embedding stores, fp32 eager keeps the bare name so captions stored before stay valid
+        self.model_version = f"{model_name}/{pretrained}"
+        if (self.policy.precision, self.policy.amp) != ("fp32", None):
+            self.model_version += f"/{self.policy.precision}-eager"
+            if self.policy.amp is not None:
+                self.model_version += f"-amp-{self.policy.amp}"
+        self.model_name, self.pretrained = model_name, pretrained
         
-        self.model, _, self.transform = open_clip.create_model_and_transforms(model_name, pretrained=pretrained)
-        self.model = self.model.to(self.device)
+        # weights are shared with every other user of the same model in this process
+        _, self.transform = self.policy.get_model(model_name, pretrained)
+
+    @property
+    def model(self):
+        # borrowed on every use, so a model unloaded by the memory budget is reloaded instead of pinned here
+        return self.policy.get_model(self.model_name, self.pretrained)[0]
+
+    def _decode_batch(self, generated):
+        """Decode a batch of generated token ids into stripped captions."""
+        with instrumentation.span("caption.decode"):
+            return [caption.strip() for caption in decode_tokens(generated)]
 
     def generate_caption(self, image_path):
         """Generate a caption for the given image."""
-        image = Image.open(image_path).convert("RGB")
-        image_tensor = self.transform(image).unsqueeze(0).to(self.device)
+        image_tensor = self.policy.to_device(load_image(image_path, self.transform).unsqueeze(0))
         
-        with torch.no_grad(), torch.autocast(device_type=self.device.type):
+        instrumentation.observe("caption.batch_size", 1)
+        with instrumentation.span("caption.generate"), self.policy.context():
             generated = self.model.generate(image_tensor)
         
-        caption = open_clip.decode(generated[0]).split("<end_of_text>")[0].replace("<start_of_text>", "")
-        return caption
+        return self._decode_batch(generated)[0]
+
+    def generate_captions(self, image_paths, batch_size=8, workers=4):
+        """Generate captions for many images, running generation on batches of stacked images.
+
+        Captions are returned in the same order as ``image_paths``.
+        """
+        captions = []
+        for start in range(0, len(image_paths), batch_size):
+            batch = image_paths[start:start + batch_size]
+            captions.extend(self.generate_captions_from_tensors(preprocess_images(batch, self.transform, workers)))
+        return captions
+
+    def generate_candidate_captions(self, image_paths, num_candidates=4, top_p=0.9, temperature=1.0, workers=4):
+        """Generate up to num_candidates distinct captions per image: the beam-search caption plus top-p samples.
+
+        Returns one list of captions per image, in input order, beam-search caption first.
+        """
+        image_tensor = self.policy.to_device(preprocess_images(image_paths, self.transform, workers))
+        instrumentation.observe("caption.batch_size", len(image_paths) * num_candidates)
+        with instrumentation.span("caption.generate"), self.policy.context():
+            beams = self.model.generate(image_tensor)
+            if num_candidates > 1:
+                # every image repeated, so all samples come out of one batched decode loop
+                repeated = image_tensor.repeat_interleave(num_candidates - 1, dim=0)
+                samples = self.model.generate(repeated, generation_type="top_p", top_p=top_p, temperature=temperature)
+
+        candidates = [[caption] for caption in self._decode_batch(beams)]
+        if num_candidates > 1:
+            for i, caption in enumerate(self._decode_batch(samples)):
+                if caption and caption not in candidates[i // (num_candidates - 1)]:
+                    candidates[i // (num_candidates - 1)].append(caption)
+        return candidates
+
+    def generate_captions_from_tensors(self, image_tensor):
+        """Generate captions for an already preprocessed N x C x H x W batch, e.g. from Deck.batches."""
+        instrumentation.observe("caption.batch_size", len(image_tensor))
+        with instrumentation.span("caption.generate"), self.policy.context():
+            generated = self.model.generate(self.policy.to_device(image_tensor))
+
+        return self._decode_batch(generated)
 
 if __name__ == "__main__":
     image_path = "data/image.png"
@@ -0,0 +1,69 @@
+import argparse
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from content_hash import hash_file
+from deck_loader import load_images_from_directory
+from image_captioning.caption_store import DEFAULT_STORE_PATH, CaptionStore
+
+
+def precompute_captions(directory, store, caption_generator, workers=2, batch_size=8):
+    """Caption every card in a directory that the store does not know yet.
+
+    Batches are captioned by a bounded pool of worker threads sharing one model, and each
+    batch is committed as soon as it finishes, so an interrupted run resumes where it
+    stopped. Returns the number of newly stored captions.
+    """
+    model_version = caption_generator.model_version
+    known = store.known_hashes(model_version)
+
+    pending = {}
+    for image_path in load_images_from_directory(directory):
+        content_hash = hash_file(image_path)
+        if content_hash not in known:
+            pending.setdefault(content_hash, image_path)
+    pending = list(pending.items())
+    batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+    print(f"{len(pending)} cards to caption in {len(batches)} batches ({len(known)} already stored)")
+
+    def caption_batch(batch):
+        captions = caption_generator.generate_captions([path for _, path in batch], batch_size=batch_size)
+        store.put_many([(content_hash, caption) for (content_hash, _), caption in zip(batch, captions)],
+                       model_version)
+        return len(batch)
+
+    done = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for batch in batches:
+            # keep at most one queued batch per worker so memory stays bounded
+            if len(in_flight) >= 2 * workers:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                done += sum(future.result() for future in finished)
+                print(f"captioned {done}/{len(pending)} cards ({time.perf_counter() - start:.1f}s)")
+            in_flight.add(executor.submit(caption_batch, batch))
+        for future in in_flight:
+            done += future.result()
+    print(f"captioned {done}/{len(pending)} cards ({time.perf_counter() - start:.1f}s)")
+    return done
+
+
+if __name__ == "__main__":
+    from image_captioning.generate_image_caption import ImageCaptionGenerator
+
+    parser = argparse.ArgumentParser(description="Precompute captions for every card in a directory.")
+    parser.add_argument("--cards", default="../data/cards")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--model", default="coca_ViT-L-14")
+    parser.add_argument("--pretrained", default="mscoco_finetuned_laion2B-s13B-b90k")
+    args = parser.parse_args()
+
+    caption_generator = ImageCaptionGenerator(model_name=args.model, pretrained=args.pretrained)
+    store = CaptionStore(args.store)
+    try:
+        precompute_captions(args.cards, store, caption_generator, workers=args.workers, batch_size=args.batch_size)
+    finally:
+        store.close()
@@ -0,0 +1,195 @@
+import asyncio
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import instrumentation
+
+# Dynamic micro-batching for the shared models. Threads and coroutines submit single items
+# (an image path, a clue, an (image, clue) pair); a worker thread groups whatever is queued
+# into one call of the batched function, so concurrent callers share forward passes.
+
+
+class _Request:
+    __slots__ = ("item", "future", "enqueued", "deadline")
+
+    def __init__(self, item, deadline):
+        self.item = item
+        self.future = Future()
+        self.enqueued = time.monotonic()
+        self.deadline = deadline
+
+
+_STOP = object()
+
+
+class InferenceBroker:
+    """Queue single-item requests and run them through ``function`` in batches.
+
+    ``function`` takes a list of items and returns a sequence with one result per item, e.g.
+    ``ImageTextSimilarity.encode_texts``, ``ImageTextSimilarity.compare_batch`` or
+    ``ImageCaptionGenerator.generate_captions``. A batch is run as soon as ``max_batch_size``
+    requests are queued or the oldest has waited ``max_wait_ms``.
+
+    At most ``max_queue_size`` requests wait at once: further submits block (or raise
+    queue.Full with ``block=False``). Requests still queued past their deadline fail with
+    TimeoutError instead of being run, and cancelled futures are skipped.
+    """
+
+    def __init__(self, function, max_batch_size=32, max_wait_ms=5.0, max_queue_size=1024, name="inference"):
+        self.function = function
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue = queue.Queue(max_queue_size)
+        self._lock = threading.Lock()
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "expired": 0, "cancelled": 0, "rejected": 0,
+                        "batches": 0}
+        self._batch_sizes = deque(maxlen=10_000)
+        self._queue_waits = deque(maxlen=10_000)
+        self._thread = threading.Thread(target=self._run, name=f"{name}-broker", daemon=True)
+        self._thread.start()
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._counts[key] += amount
+
+    def _enqueue(self, item, timeout, block):
+        request = _Request(item, time.monotonic() + timeout if timeout is not None else None)
+        self._queue.put(request, block=block, timeout=timeout)
+        self._count("submitted")
+        return request.future
+
+    def submit(self, item, timeout=None, block=True):
+        """Queue one item and return a concurrent.futures.Future for its result.
+
+        ``timeout`` (seconds) is the request's deadline; it also bounds how long a full
+        queue may block the caller.
+        """
+        try:
+            return self._enqueue(item, timeout, block)
+        except queue.Full:
+            self._count("rejected")
+            raise
+
+    async def asubmit(self, item, timeout=None):
+        """Coroutine variant of submit: waits for the result without blocking the event loop.
+
+        A full queue is waited out with asyncio sleeps (no helper threads), bounded by
+        ``timeout``; past it the request is rejected with queue.Full.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        delay = 0.001
+        while True:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            try:
+                future = self._enqueue(item, remaining, block=False)
+                break
+            except queue.Full:
+                if remaining is not None and remaining <= delay:
+                    self._count("rejected")
+                    raise
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        return await asyncio.wrap_future(future)
+
+    def map(self, items, timeout=None):
+        """Submit every item and block until all results are available, in input order."""
+        futures = [self.submit(item, timeout=timeout) for item in items]
+        return [future.result() for future in futures]
+
+    async def amap(self, items, timeout=None):
+        return list(await asyncio.gather(*(self.asubmit(item, timeout=timeout) for item in items)))
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is _STOP:
+                return
+            batch = [request]
+            stop = False
+            batch_deadline = request.enqueued + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = batch_deadline - time.monotonic()
+                try:
+                    request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stop = True
+                    break
+                batch.append(request)
+            self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch):
+        now = time.monotonic()
+        live = []
+        for request in batch:
+            if not request.future.set_running_or_notify_cancel():
+                self._count("cancelled")
+            elif request.deadline is not None and now > request.deadline:
+                request.future.set_exception(TimeoutError(f"{self.name} request expired after "
+                                                          f"{now - request.enqueued:.3f}s in the queue"))
+                self._count("expired")
+            else:
+                live.append(request)
+        if not live:
+            return
+
+        waits = [now - request.enqueued for request in live]
+        with self._lock:
+            self._counts["batches"] += 1
+            self._batch_sizes.append(len(live))
+            self._queue_waits.extend(waits)
+        instrumentation.observe(f"broker.{self.name}.batch_size", len(live))
+        for wait in waits:
+            instrumentation.observe(f"broker.{self.name}.queue_wait.seconds", wait)
+
+        try:
+            with instrumentation.span(f"broker.{self.name}.batch"):
+                results = self.function([request.item for request in live])
+            if len(results) != len(live):
+                raise ValueError(f"{self.name} returned {len(results)} results for {len(live)} items")
+        except Exception as error:
+            for request in live:
+                request.future.set_exception(error)
+            self._count("failed", len(live))
+            return
+        for request, result in zip(live, results):
+            request.future.set_result(result)
+        self._count("completed", len(live))
+
+    def stats(self):
+        """Request counts, achieved batch sizes and queueing latency (over the last 10k samples)."""
+        with self._lock:
+            stats = dict(self._counts)
+            batch_sizes = list(self._batch_sizes)
+            waits = sorted(self._queue_waits)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["mean_batch_size"] = statistics.mean(batch_sizes) if batch_sizes else 0.0
+        stats["max_batch_size"] = max(batch_sizes, default=0)
+        if waits:
+            stats["queue_wait_ms"] = {
+                "mean": statistics.mean(waits) * 1000,
+                "p50": waits[len(waits) // 2] * 1000,
+                "p99": waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000,
+                "max": waits[-1] * 1000,
+            }
+        return stats
+
+    def close(self, wait=True):
+        """Stop the worker once the requests already queued have run."""
+        self._queue.put(_STOP)
+        if wait:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,208 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Lightweight metrics for the bot pipeline: named spans (timed into histograms), counters and
+# value histograms, aggregated in-process and exported as JSON or Prometheus text.
+#
+# Off by default; enable with DIXIT_METRICS=1 or instrumentation.enable(). While disabled every
+# call is a global flag check, and span() returns a shared no-op context manager.
+
+_enabled = os.getenv("DIXIT_METRICS", "") not in ("", "0")
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+# upper bounds shared by every histogram, wide enough for both seconds and batch sizes
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250)
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+class Histogram:
+    __slots__ = ("count", "total", "min", "max", "bucket_counts")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.bucket_counts[bisect.bisect_left(BUCKETS, value)] += 1
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max if self.count else 0.0,
+            "buckets": dict(zip([str(bound) for bound in BUCKETS] + ["+Inf"], self.bucket_counts)),
+        }
+
+
+def incr(name, value=1):
+    """Add to a counter, e.g. cache hits or retries."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name, value):
+    """Record a value (batch size, queue depth, ...) in a histogram."""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(value)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name + ".seconds", time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """Context manager timing a block into the ``<name>.seconds`` histogram."""
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name)
+
+
+def snapshot():
+    """Return a copy of all counters and histogram summaries."""
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "histograms": {name: histogram.to_dict() for name, histogram in _histograms.items()},
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None where the resource module is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _prometheus_name(name):
+    return "dixit_" + "".join(char if char.isalnum() else "_" for char in name)
+
+
+def to_prometheus():
+    """Render the current metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name, value in sorted(_counters.items()):
+            metric = _prometheus_name(name) + "_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, histogram in sorted(_histograms.items()):
+            metric = _prometheus_name(name)
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip([str(bound) for bound in BUCKETS] + ["+Inf"], histogram.bucket_counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f"{metric}_sum {histogram.total}", f"{metric}_count {histogram.count}"]
+    return "\n".join(lines) + "\n"
+
+
+def export(path):
+    """Write the current metrics to ``path``, as Prometheus text for .prom/.txt files and JSON otherwise."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        if path.endswith((".prom", ".txt")):
+            f.write(to_prometheus())
+        else:
+            json.dump(snapshot(), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def profile(path):
+    """Profile one block (e.g. a single bot turn) and write the report to ``path``.
+
+    Uses the pyinstrument sampling profiler when installed, otherwise cProfile stats. Works
+    whether or not metrics are enabled.
+    """
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path, "w") as f:
+                f.write(profiler.output_html() if path.endswith(".html") else profiler.output_text())
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
@@ -1,8 +1,268 @@
-import torch
-import open_clip
+import gc
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# torch and open_clip are imported inside the functions that need them, so importing
+# this module (and everything that borrows models from it) stays cheap until a model is used.
+
+# process-wide registry of loaded open_clip models, keyed by (model_name, pretrained, device, precision),
+# plus "channels_last" for copies in that layout, least recently used first
+_models = OrderedDict()
+_model_bytes = {}
+_last_used = {}
+_tokenizers = {}
+_registry_lock = threading.Lock()
+_load_locks = {}
+# bytes of weight copies made outside the registry (e.g. TorchScript-traced towers), by label;
+# they cannot be shared or unloaded, but count towards the byte budget and memory_report
+_derived_bytes = {}
+
+# memory budget: once more models (or more weight bytes) than this are loaded, the least
+# recently used ones are unloaded. None means no limit. Until set_memory_budget is called,
+# DIXIT_MAX_MODELS and DIXIT_MODEL_MEMORY_MB set it for a whole bot host, read on every check.
+_budget = {}
+
+
+def _budget_limits():
+    """(max_models, max_bytes) from set_memory_budget, else from the environment."""
+    if _budget:
+        return _budget["max_models"], _budget["max_bytes"]
+    max_models = os.environ.get("DIXIT_MAX_MODELS")
+    max_mb = os.environ.get("DIXIT_MODEL_MEMORY_MB")
+    return int(max_models) if max_models else None, int(float(max_mb) * 2**20) if max_mb else None
+
+
+def default_device():
+    import torch
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def _normalize_device(device):
+    import torch
+    device = torch.device(device) if device is not None else default_device()
+    if device.type == "cuda" and device.index is None:
+        # "cuda" and "cuda:0" are the same weights
+        device = torch.device("cuda", torch.cuda.current_device())
+    return device
+
+
+def _quantize_int8(model, device):
+    """Dynamically quantize a model's Linear layers to int8 (CPU only)."""
+    import torch
+    if device.type != "cpu":
+        raise ValueError("int8 dynamic quantization is only supported on CPU")
+    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    for module in model.modules():
+        if isinstance(module, torch.ao.nn.quantized.dynamic.Linear):
+            # open_clip asks its first MLP layer for the activation dtype, this is where it looks for int8 layers
+            module.int8_original_dtype = torch.float32
+    return model
+
+
+def get_model(model_name, pretrained, device=None, precision="fp32", channels_last=False):
+    """Return (model, transform) for the given weights, loading them at most once per process.
+
+    ``precision`` is any open_clip precision ("fp32", "fp16", "bf16", ...) or "int8" for a
+    dynamically quantized CPU copy of the fp32 weights. ``channels_last`` loads a separate
+    copy in channels-last memory layout, so borrowers of the default layout are unaffected.
+
+    Loads of different models can run concurrently; callers asking for a model that is
+    already being loaded wait for that load instead of starting their own. The returned
+    model is shared, so callers must not move it or change its dtype. Under a memory budget
+    the model may be unloaded once it is the least recently used one, so long-lived callers
+    should borrow it again for each use rather than keep it.
+    """
+    device = _normalize_device(device)
+    key = (model_name, pretrained, str(device), precision) + (("channels_last",) if channels_last else ())
+    with _registry_lock:
+        if key in _models:
+            return _touch(key)
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    with load_lock:
+        with _registry_lock:
+            if key in _models:
+                return _touch(key)
+            # make room first, so the old and the new weights are never resident together
+            evicted = _evict_over_budget(reserve=1)
+        _release(evicted)
+        import open_clip
+        if precision == "int8":
+            model, _, transform = open_clip.create_model_and_transforms(
+                model_name, pretrained=pretrained, precision="fp32", device=device
+            )
+            model = _quantize_int8(model, device)
+        else:
+            model, _, transform = open_clip.create_model_and_transforms(
+                model_name, pretrained=pretrained, precision=precision, device=device
+            )
+        if channels_last:
+            import torch
+            model.to(memory_format=torch.channels_last)
+        model.eval()
+        with _registry_lock:
+            _models[key] = (model, transform)
+            _model_bytes[key] = model_bytes(model)
+            _last_used[key] = time.monotonic()
+            _load_locks.pop(key, None)
+            evicted = _evict_over_budget(keep=key)
+        _release(evicted)
+    return model, transform
+
+
+def _touch(key):
+    # caller holds _registry_lock
+    _models.move_to_end(key)
+    _last_used[key] = time.monotonic()
+    return _models[key]
+
+
+def model_bytes(model):
+    """Approximate memory held by a model's parameters and buffers, in bytes."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+def _evict_over_budget(keep=None, reserve=0):
+    """Drop least recently used models until the registry (plus ``reserve`` models) fits the budget.
+
+    Caller holds _registry_lock.
+    """
+    max_models, max_bytes = _budget_limits()
+    evicted = []
+    for key in list(_models):
+        over_count = max_models is not None and len(_models) + reserve > max_models
+        over_bytes = max_bytes is not None and sum(_model_bytes.values()) + sum(_derived_bytes.values()) > max_bytes
+        if not (over_count or over_bytes):
+            break
+        if key != keep:
+            evicted.append(_pop(key))
+    return evicted
+
+
+def track_derived(module, nbytes, label):
+    """Account for ``module`` holding its own ``nbytes`` copy of registry weights until it is freed.
+
+    The copy counts towards the byte budget, so registry models are unloaded to make room
+    for it, and shows up in memory_report under ``label``.
+    """
+    key = f"{label}@{id(module):x}"
+    with _registry_lock:
+        _derived_bytes[key] = nbytes
+        evicted = _evict_over_budget()
+    weakref.finalize(module, _derived_bytes.pop, key, None)
+    _release(evicted)
+
+
+def _pop(key):
+    _model_bytes.pop(key, None)
+    _last_used.pop(key, None)
+    return key, _models.pop(key)
+
+
+def _release(evicted):
+    """Free the memory of unloaded models (once no caller still holds them)."""
+    if not evicted:
+        return
+    del evicted[:]
+    gc.collect()
+    import torch
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    try:
+        import ctypes
+        # glibc keeps freed weight buffers in its heap otherwise, so RSS would not go down
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def set_memory_budget(max_models=None, max_bytes=None):
+    """Limit how many models, or how many bytes of weights, stay loaded; None lifts a limit.
+
+    Models over the budget are unloaded least recently used first, right away and after
+    every later load. The model just loaded is never unloaded, even if it alone is over.
+    """
+    with _registry_lock:
+        _budget.update(max_models=max_models, max_bytes=max_bytes)
+        evicted = _evict_over_budget()
+    _release(evicted)
+
+
+def unload_idle(idle_seconds=0.0):
+    """Unload every model not borrowed in the last ``idle_seconds`` (all of them for 0); return their keys."""
+    now = time.monotonic()
+    with _registry_lock:
+        evicted = [_pop(key) for key in list(_models) if now - _last_used[key] >= idle_seconds]
+    keys = [key for key, _ in evicted]
+    _release(evicted)
+    return keys
+
+
+def memory_report():
+    """Weight bytes of each loaded model and this process's peak RSS, e.g. to log per configuration."""
+    import instrumentation
+    with _registry_lock:
+        models = {"/".join(map(str, key)): size for key, size in _model_bytes.items()}
+        models.update(_derived_bytes)
+    return {"models": models, "model_bytes": sum(models.values()), "peak_rss_bytes": instrumentation.peak_rss_bytes()}
+
+
+def freeze_for_fork():
+    """Prepare a process that loaded its models to fork workers that share them copy-on-write.
+
+    Moves everything allocated so far out of the garbage collector's generations, so the
+    children's collections do not write to (and so copy) the pages of the parent's objects.
+    Tensor storage is never touched by the GC and stays shared as long as nobody writes it.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def fork_workers(count, target, *args):
+    """Fork ``count`` worker processes running ``target(worker_index, *args)`` after the models are loaded.
+
+    Call this after the parent has borrowed every model its workers use: each worker then
+    reads the parent's weights instead of loading its own copy. Returns the started
+    multiprocessing.Process objects. Fork only exists on POSIX.
+    """
+    import multiprocessing
+
+    freeze_for_fork()
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_run_worker, args=(target, index, args), daemon=True) for index in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def _run_worker(target, index, args):
+    import torch
+    # the parent's intra-op thread pool does not survive fork, and N workers each using
+    # every core would oversubscribe the box anyway
+    torch.set_num_threads(1)
+    target(index, *args)
+
+
+def get_tokenizer(model_name):
+    """Return the shared tokenizer for a model architecture."""
+    with _registry_lock:
+        if model_name not in _tokenizers:
+            import open_clip
+            _tokenizers[model_name] = open_clip.get_tokenizer(model_name)
+        return _tokenizers[model_name]
+
+
+def loaded_models():
+    """Return the registry keys of every model currently loaded."""
+    with _registry_lock:
+        return list(_models)
+
 
 def initialize_model():
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model, _, transform = open_clip.create_model_and_transforms("coca_ViT-L-14", pretrained="mscoco_finetuned_laion2B-s13B-b90k")
-    model = model.to(device)
-    return model, transform, device
\ No newline at end of file
+    device = default_device()
+    model, transform = get_model("coca_ViT-L-14", "mscoco_finetuned_laion2B-s13B-b90k", device)
+    return model, transform, device
@@ -0,0 +1,456 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+from deck_loader import load_images_from_directory
+from game_logic.bot import Bot
+from game_logic.dixit import deal_cards, score_round
+from game_logic.humanAgent import Human
+from game_logic.simulation import GameResult, RoundResult, storyteller_timings
+
+# Asyncio game server hosting many independent Dixit tables in one process.
+#
+# Players connect over TCP and speak newline-delimited JSON. The first message joins a table:
+#   {"type": "join", "table": "t1", "name": "alice", "players": 4, "bots": 2}
+# (players/bots are only read from whoever opens the table). Once every human seat is taken the
+# table starts, bots filling the rest. The server then sends requests carrying an "id", which
+# the client answers with a message carrying the same "id":
+#   {"type": "storyteller", "id": 1, "hand": [...]}           -> {"id": 1, "card": 0, "clue": "..."}
+#   {"type": "choose_card", "id": 2, "hand": [...], "clue": ..} -> {"id": 2, "card": 3}
+#   {"type": "vote", "id": 3, "table": [...], "clue": ...}      -> {"id": 3, "vote": 1}
+# and notifications: "joined", "round" (clue, table, votes and scores) and "game_over".
+# Seats follow the Human/Bot turn protocol, with async methods and the clue passed along:
+#   storyteller_turn() -> (card, clue), choose_card(clue) -> card, vote(table, clue) -> index
+
+
+def _new_player_id():
+    # shared with Human and Bot so mixed tables never reuse an id
+    player_id = Human._id_counter
+    Human._id_counter += 1
+    return player_id
+
+
+class Connection:
+    """One client socket: writes JSON lines and matches replies to pending requests by id."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self.closed = asyncio.Event()
+        self._reader_task = None
+
+    async def receive(self):
+        """Read one message, before the reader task takes over (e.g. the join request)."""
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("client disconnected")
+        return json.loads(line)
+
+    def start(self):
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                future = self._pending.pop(message.get("id"), None) if isinstance(message, dict) else None
+                if future is not None and not future.done():
+                    future.set_result(message)
+        except ConnectionError:
+            pass
+        finally:
+            self.closed.set()
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("client disconnected"))
+            self._pending.clear()
+
+    async def send(self, message):
+        if self.closed.is_set():
+            return
+        try:
+            self.writer.write(json.dumps(message).encode() + b"\n")
+            await self.writer.drain()
+        except ConnectionError:
+            self.closed.set()
+
+    async def request(self, message):
+        """Send a request and wait for the reply with the same id."""
+        if self.closed.is_set():
+            raise ConnectionError("client disconnected")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self.send({**message, "id": request_id})
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class RemotePlayer:
+    """A human seat played over a Connection. Invalid replies raise ValueError."""
+
+    def __init__(self, name, connection):
+        self.id = _new_player_id()
+        self.name = name
+        self.hand = []
+        self.score = 0
+        self.connection = connection
+
+    def _card_index(self, reply, key="card"):
+        index = reply.get(key)
+        if not isinstance(index, int) or not 0 <= index < len(self.hand):
+            raise ValueError(f"invalid {key} {index!r}")
+        return index
+
+    async def storyteller_turn(self):
+        reply = await self.connection.request({"type": "storyteller", "hand": self.hand})
+        index = self._card_index(reply)
+        clue = reply.get("clue")
+        if not isinstance(clue, str) or not clue.strip():
+            raise ValueError("missing clue")
+        return self.hand.pop(index), clue.strip()
+
+    async def choose_card(self, clue):
+        reply = await self.connection.request({"type": "choose_card", "hand": self.hand, "clue": clue})
+        return self.hand.pop(self._card_index(reply))
+
+    async def vote(self, table, clue):
+        reply = await self.connection.request({"type": "vote", "table": [card for _, card in table], "clue": clue})
+        vote = reply.get("vote")
+        if not isinstance(vote, int) or not 0 <= vote < len(table) or table[vote][0] == self.id:
+            raise ValueError(f"invalid vote {vote!r}")
+        return vote
+
+    async def notify(self, message):
+        await self.connection.send(message)
+
+
+class ServerBot(Bot):
+    """A Bot seat for the server: the same StorytellerPipeline and VoteStrategy decisions, made async.
+
+    Bot's decisions block on models (through the server's InferencePool clients), so they run
+    on ``executor`` threads and only the move itself is applied on the event loop. A turn that
+    times out therefore never changes the hand behind the fallback move's back. Without a
+    pipeline or strategy the bot plays at random, like Bot.
+    """
+
+    def __init__(self, pipeline=None, strategy=None, executor=None, rng=None, name=None):
+        super().__init__(name, pipeline, strategy=strategy, rng=rng)
+        self.executor = executor
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def storyteller_turn(self):
+        card, clue = await self._run(self.pick_story, list(self.hand))
+        self.hand.remove(card)
+        return card, clue
+
+    async def choose_card(self, clue):
+        return self.hand.pop(await self._run(self.pick_card, list(self.hand), clue))
+
+    async def vote(self, table, clue):
+        return await self._run(super().vote, table, clue)
+
+
+class GameSession:
+    """One table: plays rounds with every seat's choices and votes collected concurrently.
+
+    A seat that does not answer within ``turn_timeout`` seconds (or disconnects, or answers
+    with an invalid move) gets a random legal move instead, so one slow player never stalls
+    the table.
+    """
+
+    def __init__(self, table_id, seats, deck, rng=None, hand_size=6, target_score=30, max_rounds=None,
+                 turn_timeout=60.0, on_round=None):
+        self.table_id = table_id
+        self.seats = seats
+        self.rng = rng or random.Random()
+        self.deck = list(deck)
+        self.rng.shuffle(self.deck)
+        self.hand_size = hand_size
+        self.target_score = target_score
+        self.max_rounds = max_rounds
+        self.turn_timeout = turn_timeout
+        # called with every RoundResult, like HeadlessGame's on_round
+        self.on_round = on_round
+        self.timeouts = 0
+
+    async def _ask(self, seat, action, fallback):
+        try:
+            return await asyncio.wait_for(action, self.turn_timeout)
+        except (asyncio.TimeoutError, ConnectionError, ValueError) as error:
+            self.timeouts += 1
+            instrumentation.incr("server.turn_fallbacks")
+            await self._notify(seat, {"type": "error", "message": f"turn skipped: {type(error).__name__}"})
+            return fallback()
+
+    async def _notify(self, seat, message):
+        notify = getattr(seat, "notify", None)
+        if notify is not None:
+            await notify({**message, "table_id": self.table_id})
+
+    async def broadcast(self, message):
+        await asyncio.gather(*(self._notify(seat, message) for seat in self.seats))
+
+    def _random_card(self, seat):
+        return seat.hand.pop(self.rng.randrange(len(seat.hand)))
+
+    def _random_vote(self, seat, table):
+        return self.rng.choice([i for i, (player_id, _) in enumerate(table) if player_id != seat.id])
+
+    async def play_round(self, round_index, storyteller):
+        with instrumentation.span("server.round"):
+            storyteller_card, clue = await self._ask(
+                storyteller, storyteller.storyteller_turn(), lambda: (self._random_card(storyteller), "..."))
+
+            # same table layout as dixit.collect_cards, but every seat picks its card at once
+            voters = [seat for seat in self.seats if seat != storyteller]
+            chosen = await asyncio.gather(*(
+                self._ask(seat, seat.choose_card(clue), lambda seat=seat: self._random_card(seat)) for seat in voters))
+            played_cards = [(storyteller.id, storyteller_card)] + [(seat.id, card) for seat, card in zip(voters, chosen)]
+            table = list(played_cards)
+            self.rng.shuffle(table)
+
+            votes = list(await asyncio.gather(*(
+                self._ask(seat, seat.vote(table, clue), lambda seat=seat: self._random_vote(seat, table))
+                for seat in voters)))
+
+            before = {seat.id: seat.score for seat in self.seats}
+            score_round(self.seats, storyteller, storyteller_card, table, votes)
+
+        result = RoundResult(
+            round_index=round_index,
+            storyteller_id=storyteller.id,
+            clue=clue,
+            storyteller_card=storyteller_card,
+            table=table,
+            votes={seat.id: vote for seat, vote in zip(voters, votes)},
+            score_deltas={seat.id: seat.score - before[seat.id] for seat in self.seats},
+            scores={seat.id: seat.score for seat in self.seats},
+            played_cards=played_cards,
+            timings=storyteller_timings(storyteller),
+        )
+        if self.on_round is not None:
+            self.on_round(result)
+        await self.broadcast({"type": "round", "round": round_index, "storyteller": storyteller.id, "clue": clue,
+                              "table": table, "votes": result.votes, "scores": result.scores})
+        return result
+
+    async def play(self):
+        """Play until someone reaches the target score, hands can't be refilled, or max_rounds is hit."""
+        result = GameResult(seed=None)
+        deal_cards(self.seats, self.deck, self.hand_size)
+        round_index = 0
+        while self.max_rounds is None or round_index < self.max_rounds:
+            storyteller = self.seats[round_index % len(self.seats)]
+            result.rounds.append(await self.play_round(round_index, storyteller))
+            round_index += 1
+            if any(seat.score >= self.target_score for seat in self.seats):
+                break
+            if len(self.deck) < len(self.seats):
+                break
+            deal_cards(self.seats, self.deck, self.hand_size)
+        result.final_scores = {seat.id: seat.score for seat in self.seats}
+        await self.broadcast({"type": "game_over", "scores": result.final_scores})
+        return result
+
+
+class GameServer:
+    """Accepts players over TCP, groups them into tables and runs every table as its own task.
+
+    Bot seats are ServerBots sharing one StorytellerPipeline (when ``pool`` has a captioner and
+    a similarity model) and one VoteStrategy (with a similarity model), both served by the
+    pool; their decisions run on ``bot_workers`` threads.
+    """
+
+    def __init__(self, deck, pool=None, abstractor=None, host="127.0.0.1", port=0, turn_timeout=60.0,
+                 hand_size=6, target_score=30, max_rounds=None, seed=None, on_round=None, bot_workers=8,
+                 num_captions=3):
+        self.deck = list(deck)
+        self.pool = pool
+        self.abstractor = abstractor
+        self.bot_workers = bot_workers
+        self.num_captions = num_captions
+        self.pipeline = None
+        self.strategy = None
+        self._executor = None
+        self.host = host
+        self.port = port
+        self.turn_timeout = turn_timeout
+        self.hand_size = hand_size
+        self.target_score = target_score
+        self.max_rounds = max_rounds
+        self.rng = random.Random(seed)
+        self.on_round = on_round
+        self.results = {}
+        self._lobbies = {}
+        self._sessions = {}
+        self._server = None
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self):
+        if self.pool is not None:
+            await self.pool.start()
+            similarity, captioner = self.pool.similarity_client, self.pool.captioner_client
+            if similarity is not None:
+                from game_logic.vote_strategy import VoteStrategy
+                self.strategy = VoteStrategy(similarity)
+                if captioner is not None:
+                    from game_logic.storyteller_pipeline import StorytellerPipeline
+                    self.pipeline = StorytellerPipeline(captioner, similarity, self.abstractor,
+                                                        num_captions=self.num_captions)
+        self._executor = ThreadPoolExecutor(self.bot_workers, thread_name_prefix="server-bot")
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        return self
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        for task in self._sessions.values():
+            task.cancel()
+        await asyncio.gather(*self._sessions.values(), return_exceptions=True)
+        # bot decisions still running need the pool's brokers to finish, so they go first
+        await asyncio.to_thread(self._executor.shutdown)
+        if self.pipeline is not None:
+            await asyncio.to_thread(self.pipeline.close)
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def wait_for_tables(self):
+        """Wait for every table started so far to finish."""
+        await asyncio.gather(*self._sessions.values(), return_exceptions=True)
+
+    async def _handle_client(self, reader, writer):
+        connection = Connection(reader, writer)
+        try:
+            join = await connection.receive()
+            if join.get("type") != "join" or not join.get("table"):
+                await connection.send({"type": "error", "message": "first message must be a join"})
+                return
+            table_id = str(join["table"])
+            if table_id in self._sessions:
+                await connection.send({"type": "error", "message": f"table {table_id} has already started"})
+                return
+            lobby = self._lobbies.get(table_id)
+            if lobby is None:
+                players, bots = join.get("players", 4), join.get("bots", 0)
+                counts = (players, bots)
+                if (not all(isinstance(count, int) and not isinstance(count, bool) for count in counts)
+                        or not 0 <= bots < max(3, players)):
+                    await connection.send({"type": "error", "message": "players and bots must be integers, "
+                                                                       "with fewer bots than players"})
+                    return
+                lobby = self._lobbies[table_id] = {"players": max(3, players), "bots": bots, "seats": []}
+            player = RemotePlayer(join.get("name") or f"Player {len(lobby['seats']) + 1}", connection)
+            lobby["seats"].append(player)
+            connection.start()
+            waiting = lobby["players"] - lobby["bots"] - len(lobby["seats"])
+            await connection.send({"type": "joined", "table_id": table_id, "player_id": player.id,
+                                   "waiting_for": max(0, waiting)})
+            if waiting <= 0:
+                self._start_table(table_id, self._lobbies.pop(table_id))
+            await connection.closed.wait()
+            self._leave_lobby(table_id, lobby, player)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            await connection.close()
+
+    def _leave_lobby(self, table_id, lobby, player):
+        """Give up a disconnected player's seat at a table that has not started yet."""
+        if self._lobbies.get(table_id) is not lobby or player not in lobby["seats"]:
+            return
+        lobby["seats"].remove(player)
+        if not lobby["seats"]:
+            del self._lobbies[table_id]
+
+    def _start_table(self, table_id, lobby):
+        bots = [ServerBot(self.pipeline, self.strategy, self._executor, random.Random(self.rng.random()))
+                for _ in range(lobby["players"] - len(lobby["seats"]))]
+        session = GameSession(table_id, lobby["seats"] + bots, self.deck, rng=random.Random(self.rng.random()),
+                              hand_size=self.hand_size, target_score=self.target_score, max_rounds=self.max_rounds,
+                              turn_timeout=self.turn_timeout, on_round=self.on_round)
+        self._sessions[table_id] = asyncio.create_task(self._run_table(table_id, session))
+
+    async def _run_table(self, table_id, session):
+        instrumentation.incr("server.tables_started")
+        result = await session.play()
+        self.results[table_id] = result
+        # hang up once the game is over so clients see EOF
+        for seat in session.seats:
+            if isinstance(seat, RemotePlayer):
+                seat.connection.writer.close()
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host many concurrent Dixit tables over newline-delimited JSON/TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cards", default="data/cards")
+    parser.add_argument("--turn-timeout", type=float, default=60.0)
+    parser.add_argument("--no-models", action="store_true", help="bots play at random instead of loading models")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--share-towers", action="store_true",
+                        help="score clues with the captioning model's towers instead of loading a second CLIP")
+    parser.add_argument("--max-models", type=int, default=None, help="unload least recently used models beyond this many")
+    parser.add_argument("--bot-workers", type=int, default=8, help="threads running bot decisions")
+    args = parser.parse_args()
+
+    pool = None
+    if not args.no_models:
+        import model_manager
+        from image_captioning.generate_image_caption import ImageCaptionGenerator
+        from server.inference_pool import InferencePool
+        from similarity.similarity import ImageTextSimilarity
+        if args.max_models is not None:
+            model_manager.set_memory_budget(max_models=args.max_models)
+        captioner = ImageCaptionGenerator()
+        similarity = ImageTextSimilarity.from_captioner(captioner) if args.share_towers else ImageTextSimilarity()
+        pool = InferencePool(similarity, captioner, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    async def main():
+        server = await GameServer(load_images_from_directory(args.cards), pool, host=args.host, port=args.port,
+                                  turn_timeout=args.turn_timeout, bot_workers=args.bot_workers).start()
+        print(f"Dixit server listening on {server.address[0]}:{server.address[1]}")
+        await server.serve_forever()
+
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+import asyncio
+
+from inference_broker import InferenceBroker
+
+
+class InferencePool:
+    """Shared model workers for every table on a game server.
+
+    Each operation has its own InferenceBroker, so single clues, cards and captions
+    requested by bots at many tables are merged into one forward pass (up to
+    ``max_batch_size`` items, waiting at most ``max_wait_ms`` for more). Either model may be
+    None; its operations are then unavailable.
+
+    Coroutines use the async methods. Code that calls models synchronously, like Bot's
+    StorytellerPipeline and VoteStrategy, gets ``similarity_client`` and ``captioner_client``:
+    stand-ins with the model wrappers' methods whose calls block a worker thread (never the
+    event loop) on the same brokers.
+    """
+
+    def __init__(self, similarity=None, captioner=None, max_batch_size=32, max_wait_ms=5.0, max_queue_size=1024,
+                 timeout=None):
+        self.similarity = similarity
+        self.captioner = captioner
+        self.policy = {"max_batch_size": max_batch_size, "max_wait_ms": max_wait_ms, "max_queue_size": max_queue_size}
+        # per-request deadline in seconds, requests still queued after it fail with TimeoutError
+        self.timeout = timeout
+        self._operations = {}
+        if similarity is not None:
+            self._operations["encode_texts"] = lambda texts: similarity.encode_texts(texts).float().cpu()
+            self._operations["encode_cards"] = lambda cards: similarity.encode_cards(cards).float().cpu()
+        if captioner is not None:
+            self._operations["generate_captions"] = lambda paths: captioner.generate_captions(
+                paths, batch_size=len(paths))
+            self._operations["generate_candidate_captions"] = self._candidate_captions
+        self.similarity_client = PooledSimilarity(self) if similarity is not None else None
+        self.captioner_client = PooledCaptioner(self) if captioner is not None else None
+        self.brokers = {}
+
+    def supports(self, operation):
+        return operation in self._operations
+
+    def _candidate_captions(self, items):
+        # items are (path, num_candidates); requests asking for the same number share one call
+        results = [None] * len(items)
+        groups = {}
+        for i, (_, num_candidates) in enumerate(items):
+            groups.setdefault(num_candidates, []).append(i)
+        for num_candidates, indices in groups.items():
+            paths = [items[i][0] for i in indices]
+            for i, captions in zip(indices, self.captioner.generate_candidate_captions(paths, num_candidates)):
+                results[i] = captions
+        return results
+
+    async def start(self):
+        """Start one broker per operation; calling it again while started does nothing."""
+        if self.brokers:
+            return
+        for operation, function in self._operations.items():
+            self.brokers[operation] = InferenceBroker(function, name=operation, **self.policy)
+
+    async def close(self):
+        brokers, self.brokers = self.brokers, {}
+        await asyncio.gather(*(asyncio.to_thread(broker.close) for broker in brokers.values()))
+
+    def stats(self):
+        """Batch size and queueing stats of every operation's broker."""
+        return {operation: broker.stats() for operation, broker in self.brokers.items()}
+
+    def _broker(self, operation):
+        if operation not in self.brokers:
+            raise RuntimeError(f"InferencePool has no {operation!r} worker (missing model or not started)")
+        return self.brokers[operation]
+
+    async def _submit(self, operation, items):
+        return await self._broker(operation).amap(items, timeout=self.timeout)
+
+    def map(self, operation, items):
+        """Blocking variant of the async methods, for worker threads: one result per item."""
+        return self._broker(operation).map(items, timeout=self.timeout)
+
+    async def encode_texts(self, texts):
+        """Return the text embeddings (a K x D CPU tensor) for a list of clues."""
+        import torch
+        return torch.stack(await self._submit("encode_texts", texts))
+
+    async def encode_cards(self, cards):
+        """Return the image embeddings (an N x D CPU tensor) for cards given as paths or deck ids."""
+        import torch
+        return torch.stack(await self._submit("encode_cards", cards))
+
+    async def generate_captions(self, paths):
+        """Return one caption per image path."""
+        return await self._submit("generate_captions", paths)
+
+
+class PooledSimilarity:
+    """ImageTextSimilarity's scoring methods, served by an InferencePool. Blocks; call from a worker thread."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def encode_texts(self, texts):
+        import torch
+        return torch.stack(self.pool.map("encode_texts", list(texts)))
+
+    def encode_cards(self, cards):
+        import torch
+        return torch.stack(self.pool.map("encode_cards", list(cards)))
+
+    def score_cards(self, clues, cards):
+        """K x N cosine similarities, like ImageTextSimilarity.score_cards (both encoders return normalized rows)."""
+        if isinstance(clues, str):
+            clues = [clues]
+        return self.encode_texts(clues) @ self.encode_cards(cards).T
+
+
+class PooledCaptioner:
+    """ImageCaptionGenerator's captioning methods, served by an InferencePool. Blocks; call from a worker thread."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def generate_captions(self, image_paths):
+        return self.pool.map("generate_captions", list(image_paths))
+
+    def generate_candidate_captions(self, image_paths, num_candidates=4):
+        return self.pool.map("generate_candidate_captions", [(path, num_candidates) for path in image_paths])
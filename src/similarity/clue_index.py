@@ -0,0 +1,112 @@
+import argparse
+import json
+import threading
+from collections import OrderedDict
+
+import instrumentation
+from similarity.embedding_index import EmbeddingStore
+
+
+def normalize_clue(text):
+    """Lowercase and collapse whitespace, the same cleanup the CLIP tokenizer applies."""
+    return " ".join(text.lower().split())
+
+
+class TextEmbeddingCache:
+    """Thread-safe LRU of text embeddings keyed by normalized clue text."""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._embeddings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._embeddings)
+
+    def get(self, key):
+        with self._lock:
+            embedding = self._embeddings.get(key)
+            if embedding is None:
+                self.misses += 1
+                instrumentation.incr("text_cache.misses")
+                return None
+            self._embeddings.move_to_end(key)
+            self.hits += 1
+            instrumentation.incr("text_cache.hits")
+            return embedding
+
+    def put(self, key, embedding):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._embeddings[key] = embedding
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > self.maxsize:
+                self._embeddings.popitem(last=False)
+
+
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+
+def shared_text_cache(model_key, maxsize=4096):
+    """Return the process-wide text embedding cache for a model, so instances sharing weights share it too."""
+    with _shared_caches_lock:
+        if model_key not in _shared_caches:
+            _shared_caches[model_key] = TextEmbeddingCache(maxsize)
+        return _shared_caches[model_key]
+
+
+class ClueEmbeddingIndex(EmbeddingStore):
+    """Precomputed text embeddings for a clue vocabulary, keyed by normalized clue text."""
+
+    matrix_name = "clues.f16"
+    manifest_name = "clues.json"
+
+    def __contains__(self, text):
+        return normalize_clue(text) in self.rows
+
+    def get(self, text):
+        """Return the stored float16 embedding of a clue, or None."""
+        row = self.rows.get(normalize_clue(text))
+        return None if row is None else self._matrix[row]
+
+    def build(self, clues, encode_texts, batch_size=256):
+        """Encode and append every clue not in the index yet.
+
+        ``encode_texts`` takes a list of strings and returns an N x D array or tensor.
+        """
+        missing = list(dict.fromkeys(key for key in map(normalize_clue, clues) if key and key not in self.rows))
+        added = 0
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            embeddings = encode_texts(batch)
+            if hasattr(embeddings, "detach"):
+                embeddings = embeddings.detach().float().cpu().numpy()
+            added += self.add_keys(batch, embeddings)
+        return added
+
+
+def load_clue_vocabulary(path):
+    """Read clues from a CachedAbstractor JSON file or from a text file with one clue per line."""
+    with open(path) as f:
+        if path.endswith(".json"):
+            return [clue for entry in json.load(f).values() for clue in entry["clues"]]
+        return [line.strip() for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    from similarity.similarity import ImageTextSimilarity
+
+    parser = argparse.ArgumentParser(description="Build or extend the clue embedding index.")
+    parser.add_argument("vocabulary", nargs="+", help="clue cache JSON files or text files, one clue per line")
+    parser.add_argument("--index-dir", default="../data/embeddings")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    similarity_checker = ImageTextSimilarity(index_dir=args.index_dir)
+    clues = [clue for path in args.vocabulary for clue in load_clue_vocabulary(path)]
+    added = similarity_checker.clue_index.build(clues, similarity_checker.encode_texts, batch_size=args.batch_size)
+    print(f"Added {added} clues, index now holds {len(similarity_checker.clue_index)} clues.")
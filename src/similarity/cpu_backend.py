@@ -0,0 +1,70 @@
+import logging
+
+import torch
+
+import model_manager
+
+# CPU inference helpers for ImageTextSimilarity: thread settings and TorchScript-traced encoders.
+# int8 dynamic quantization is provided by model_manager.get_model(..., precision="int8").
+#
+# Both non-eager backends are opt-in. Their ranking agreement with fp32 eager mode has only been
+# checked with random weights, so run benchmarks/cpu_backend.py with the pretrained checkpoint
+# (it fails below --min-spearman) before switching a deployment to them.
+
+BACKENDS = ("eager", "int8", "torchscript")
+
+logger = logging.getLogger(__name__)
+
+
+def configure_threads(num_threads=None, interop_threads=None):
+    """Set torch's intra-op and inter-op thread counts.
+
+    The inter-op pool can only be sized before it is first used, later calls keep the
+    current size and log a notice.
+    """
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    if interop_threads is not None and interop_threads != torch.get_num_interop_threads():
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            logger.info("Inter-op threads already started, keeping %d", torch.get_num_interop_threads())
+
+
+class _ImageTower(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, image):
+        return self.model.encode_image(image)
+
+
+class _TextTower(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, text):
+        return self.model.encode_text(text)
+
+
+def trace_encoders(model, tokenizer, image_size=224, device="cpu"):
+    """Trace and freeze a CLIP model's image and text towers.
+
+    Returns (encode_image, encode_text) callables with the same signatures as the model's
+    methods. The traced graphs accept any batch size. Freezing bakes the weights into the
+    graphs, so they are a second copy the model registry cannot share or unload; it is
+    reported to model_manager.track_derived so the byte budget still counts it.
+    """
+    with torch.no_grad():
+        example_image = torch.zeros(2, 3, image_size, image_size, device=device)
+        example_text = tokenizer(["a photo", "a drawing of a cat"]).to(device)
+        image_tower = torch.jit.trace(_ImageTower(model).eval(), example_image, check_trace=False)
+        text_tower = torch.jit.trace(_TextTower(model).eval(), example_text, check_trace=False)
+        image_tower = torch.jit.optimize_for_inference(torch.jit.freeze(image_tower))
+        text_tower = torch.jit.optimize_for_inference(torch.jit.freeze(text_tower))
+    image_bytes = model_manager.model_bytes(model.visual)
+    model_manager.track_derived(image_tower, image_bytes, "torchscript/image")
+    model_manager.track_derived(text_tower, model_manager.model_bytes(model) - image_bytes, "torchscript/text")
+    return image_tower, text_tower
@@ -0,0 +1,212 @@
+import argparse
+import json
+import logging
+import os
+import numpy as np
+
+from content_hash import HashCache
+from deck_loader import load_images_from_directory
+
+FORMAT_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingStore:
+    """Append-only float16 embedding matrix on disk with a JSON manifest of row keys.
+
+    Each (model_name, pretrained, precision, backend) combination gets its own directory under
+    ``root`` holding a raw float16 matrix (one normalized row per key) that is memory-mapped for
+    reads, and a manifest listing the key of every row. Rows are never rewritten, new keys are
+    appended. fp16 or int8 towers produce slightly different rows than fp32 eager ones, so their
+    embeddings are never mixed into one store.
+    """
+
+    matrix_name = "embeddings.f16"
+    manifest_name = "manifest.json"
+
+    def __init__(self, root, model_name, pretrained, precision="fp32", backend="eager"):
+        self.model_name = model_name
+        self.pretrained = pretrained
+        self.precision = precision
+        self.backend = backend
+        name = f"{model_name}__{pretrained}"
+        if (precision, backend) != ("fp32", "eager"):
+            # fp32 eager keeps the original directory name, so existing indexes stay valid
+            name += f"__{precision}-{backend}"
+        self.path = os.path.join(root, name.replace("/", "-"))
+        self.matrix_path = os.path.join(self.path, self.matrix_name)
+        self.manifest_path = os.path.join(self.path, self.manifest_name)
+
+        self.dim = None
+        self.keys = []
+        self.rows = {}
+        self._matrix = None
+        self._load()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") == 1:
+            # version 1 listed card hashes under "hashes" and predates precision and backend keys
+            manifest["keys"] = manifest.pop("hashes", [])
+            manifest["format_version"] = FORMAT_VERSION
+            migrated = True
+        else:
+            migrated = False
+        expected_size = len(manifest.get("keys", [])) * (manifest.get("dim") or 0) * 2
+        if (manifest.get("format_version") != FORMAT_VERSION
+                or manifest.get("model_name") != self.model_name
+                or manifest.get("pretrained") != self.pretrained
+                or manifest.get("precision", "fp32") != self.precision
+                or manifest.get("backend", "eager") != self.backend
+                or not os.path.exists(self.matrix_path)
+                or os.path.getsize(self.matrix_path) < expected_size):
+            # stale, foreign or truncated index, start over rather than mixing embedding spaces
+            logger.warning("Ignoring incompatible embedding index at %s, it will be rebuilt.", self.manifest_path)
+            os.remove(self.manifest_path)
+            if os.path.exists(self.matrix_path):
+                os.remove(self.matrix_path)
+            return
+
+        self.dim = manifest["dim"]
+        self.keys = list(manifest["keys"])
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        # rows appended after the last manifest write (interrupted build) are dropped
+        if os.path.getsize(self.matrix_path) > expected_size:
+            os.truncate(self.matrix_path, expected_size)
+        if migrated:
+            self._write_manifest()
+        self._open_matrix()
+
+    def _open_matrix(self):
+        if self.keys:
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float16, mode="r",
+                                     shape=(len(self.keys), self.dim))
+
+    def _write_manifest(self):
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "model_name": self.model_name,
+            "pretrained": self.pretrained,
+            "precision": self.precision,
+            "backend": self.backend,
+            "dim": self.dim,
+            "keys": self.keys,
+        }
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def row(self, key):
+        """Return the row stored for a key, or None."""
+        return self.rows.get(key)
+
+    def vectors(self, rows):
+        """Return the embeddings for a row or list of rows as float16."""
+        return self._matrix[rows]
+
+    @property
+    def matrix(self):
+        """The whole N x D float16 matrix (memory-mapped)."""
+        return self._matrix
+
+    def add_keys(self, keys, embeddings):
+        """Normalize and append embeddings for keys that are not stored yet. Returns the number added."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected embeddings of size {self.dim}, got {embeddings.shape[1]}")
+
+        new_keys, new_rows = [], []
+        for key, embedding in zip(keys, embeddings):
+            if key in self.rows:
+                continue
+            self.rows[key] = len(self.keys) + len(new_keys)
+            new_keys.append(key)
+            new_rows.append(embedding)
+        if not new_keys:
+            return 0
+
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.matrix_path, "ab") as f:
+            f.write(np.stack(new_rows).astype("<f2").tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self.keys.extend(new_keys)
+        self._write_manifest()
+        self._open_matrix()
+        return len(new_keys)
+
+
+class CardEmbeddingIndex(EmbeddingStore):
+    """Image embeddings of card files, keyed by file content hash so renamed or copied cards are reused."""
+
+    def __init__(self, root, model_name, pretrained, precision="fp32", backend="eager"):
+        self._hash_cache = HashCache()
+        super().__init__(root, model_name, pretrained, precision, backend)
+
+    def __contains__(self, image_path):
+        return self.lookup(image_path) is not None
+
+    @property
+    def hashes(self):
+        return self.keys
+
+    def lookup(self, image_path):
+        """Return the row of an image in the index, or None if it has not been encoded."""
+        return self.rows.get(self._hash_cache.get(image_path))
+
+    def get(self, image_path):
+        """Return the stored float16 embedding for an image, or None on a miss."""
+        row = self.lookup(image_path)
+        if row is None:
+            return None
+        return self._matrix[row]
+
+    def add(self, image_paths, embeddings):
+        """Normalize and append embeddings for images that are not yet indexed."""
+        return self.add_keys([self._hash_cache.get(path) for path in image_paths], embeddings)
+
+    def update(self, directory, encode_batch, batch_size=32):
+        """Encode and append every card in a directory that is missing from the index.
+
+        ``encode_batch`` takes a list of image paths and returns an N x D array or tensor.
+        """
+        missing = {}
+        for image_path in load_images_from_directory(directory):
+            digest = self._hash_cache.get(image_path)
+            if digest not in self.rows:
+                missing.setdefault(digest, image_path)
+        missing = list(missing.values())
+
+        added = 0
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            embeddings = encode_batch(batch)
+            if hasattr(embeddings, "detach"):
+                embeddings = embeddings.detach().float().cpu().numpy()
+            added += self.add(batch, embeddings)
+        return added
+
+
+if __name__ == "__main__":
+    from similarity.similarity import ImageTextSimilarity
+
+    parser = argparse.ArgumentParser(description="Build or update the card embedding index.")
+    parser.add_argument("--cards", default="../data/cards")
+    parser.add_argument("--index-dir", default="../data/embeddings")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    similarity_checker = ImageTextSimilarity(index_dir=args.index_dir)
+    added = similarity_checker.build_index(args.cards, batch_size=args.batch_size)
+    print(f"Added {added} cards, index now holds {len(similarity_checker.index)} embeddings.")
@@ -1,37 +1,204 @@
+import numbers
 import warnings
-import open_clip
-from PIL import Image
 import torch
 
+import instrumentation
+import model_manager
+from deck_loader import load_image, preprocess_images
+from execution_policy import ExecutionPolicy
+from similarity.cpu_backend import BACKENDS, trace_encoders
+from similarity.clue_index import ClueEmbeddingIndex, TextEmbeddingCache, normalize_clue, shared_text_cache
+from similarity.embedding_index import CardEmbeddingIndex
+
 warnings.filterwarnings("ignore", category=FutureWarning, message=".*weights_only=False.*")
 
+
+def _normalize(features):
+    return torch.nn.functional.normalize(features.float(), dim=-1)
+
+
 class ImageTextSimilarity:
-    def __init__(self, model_name='ViT-B-32', pretrained='laion2b_e16', device=None):
-        self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        
-        self.model, _, self.preprocess = open_clip.create_model_and_transforms(model_name, pretrained=pretrained)
-        self.tokenizer = open_clip.get_tokenizer(model_name)
-        
-        self.model.to(self.device)
+    def __init__(self, model_name='ViT-B-32', pretrained='laion2b_e16', device=None, index_dir=None, precision=None, deck=None,
+                 backend="eager", num_threads=None, interop_threads=None, text_cache_size=4096, policy=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+        if backend == "int8":
+            precision = "int8"
+        # device, precision (None picks one for the device), threads and grad mode for every forward pass
+        self.policy = policy or ExecutionPolicy(device, precision, num_threads=num_threads, interop_threads=interop_threads)
+        self.device = self.policy.device
+        self.model_name, self.pretrained = model_name, pretrained
+
+        # weights are shared with every other user of the same model in this process
+        model, self.preprocess = self.policy.get_model(model_name, pretrained)
+        self.tokenizer = model_manager.get_tokenizer(model_name)
+
+        # traced copies of the towers for the torchscript backend; they hold their own weights (counted by the memory budget)
+        self._traced = None
+        if backend == "torchscript":
+            image_size = model.visual.image_size
+            image_size = image_size[0] if isinstance(image_size, (tuple, list)) else image_size
+            self._traced = trace_encoders(model, self.tokenizer, image_size, self.device)
+
+        # precomputed card embeddings, so known cards skip the image tower entirely
+        index_key = (model_name, pretrained, self.policy.precision, backend)
+        self.index = CardEmbeddingIndex(index_dir, *index_key) if index_dir else None
+        # and precomputed clue embeddings, plus an LRU of every clue encoded by this model in the process
+        self.clue_index = ClueEmbeddingIndex(index_dir, *index_key) if index_dir else None
+        self.text_cache = (shared_text_cache((model_name, pretrained, str(self.device), self.policy.precision, backend), text_cache_size)
+                           if text_cache_size else TextEmbeddingCache(0))
+        # a deck_loader.Deck lets callers refer to cards by integer card id
+        self.deck = deck
+
+    @classmethod
+    def from_captioner(cls, captioner, **kwargs):
+        """Similarity served by the captioner's own CoCa image/text towers, sharing its weights.
+
+        Saves loading a second CLIP model when memory matters more than the ViT-B-32
+        similarity quality (e.g. on bot hosts). Clue and card indexes are per model, so an
+        ``index_dir`` built for ViT-B-32 is not reused.
+        """
+        return cls(captioner.model_name, captioner.pretrained, policy=captioner.policy, **kwargs)
+
+    @property
+    def model(self):
+        # borrowed on every use, so a model unloaded by the memory budget is reloaded instead of pinned here
+        return self.policy.get_model(self.model_name, self.pretrained)[0]
+
+    @property
+    def image_encoder(self):
+        return self._traced[0] if self._traced else self.model.encode_image
+
+    @property
+    def text_encoder(self):
+        return self._traced[1] if self._traced else self.model.encode_text
 
     def encode_image(self, image_path):
-        """Encode an image into a feature vector."""
-        image = Image.open(image_path)
-        image_input = self.preprocess(image).unsqueeze(0).to(self.device)
+        """Encode an image into a normalized feature vector, reading it from the embedding index when possible."""
+        if self.index is not None:
+            cached = self.index.get(image_path)
+            if cached is not None:
+                instrumentation.incr("similarity.card_index.hits")
+                return _normalize(torch.from_numpy(cached.astype("float32")).unsqueeze(0).to(self.device))
+            instrumentation.incr("similarity.card_index.misses")
+
+        image_input = self.policy.to_device(load_image(image_path, self.preprocess).unsqueeze(0))
         
-        with torch.no_grad():
-            image_features = self.model.encode_image(image_input)
+        with instrumentation.span("similarity.encode_image"), self.policy.context():
+            image_features = self.image_encoder(image_input)
         
-        return image_features
+        return _normalize(image_features)
+
+    def encode_image_batch(self, image_paths, workers=4):
+        """Encode a list of images into normalized rows in a single forward pass, decoding them on a thread pool."""
+        return self.encode_image_tensors(preprocess_images(image_paths, self.preprocess, workers))
+
+    def encode_image_tensors(self, image_input):
+        """Encode an already preprocessed N x C x H x W batch, e.g. from Deck.batches, into normalized rows."""
+        instrumentation.observe("similarity.image_batch_size", len(image_input))
+        with instrumentation.span("similarity.encode_image"), self.policy.context():
+            image_features = self.image_encoder(self.policy.to_device(image_input))
+
+        return _normalize(image_features)
+
+    def build_index(self, directory, batch_size=32):
+        """Encode every card in a directory that the embedding index does not hold yet."""
+        if self.index is None:
+            raise ValueError("ImageTextSimilarity was created without an index_dir")
+        return self.index.update(directory, self.encode_image_batch, batch_size=batch_size)
 
     def encode_text(self, text):
         """Encode a text description into a feature vector."""
-        text_input = self.tokenizer([text]).to(self.device)
-        
-        with torch.no_grad():
-            text_features = self.model.encode_text(text_input)
-        
-        return text_features
+        return self.encode_texts([text])
+
+    def encode_texts(self, texts):
+        """Encode a list of text descriptions into a K x D matrix of normalized rows.
+
+        Clues are read from the text cache or the clue index when possible; the rest are
+        encoded with a single tokenizer call and forward pass.
+        """
+        keys = [normalize_clue(text) for text in texts]
+        features = [self.text_cache.get(key) for key in keys]
+        for i, key in enumerate(keys):
+            if features[i] is None and self.clue_index is not None:
+                stored = self.clue_index.get(key)
+                if stored is not None:
+                    features[i] = torch.from_numpy(stored.astype("float32")).to(self.device)
+                    self.text_cache.put(key, features[i])
+                    instrumentation.incr("similarity.clue_index.hits")
+
+        missing = list(dict.fromkeys(key for key, feature in zip(keys, features) if feature is None))
+        if missing:
+            instrumentation.incr("similarity.text_encoded", len(missing))
+            instrumentation.observe("similarity.text_batch_size", len(missing))
+            with instrumentation.span("similarity.tokenize"):
+                text_input = self.policy.to_device(self.tokenizer(missing))
+
+            with instrumentation.span("similarity.encode_text"), self.policy.context():
+                encoded = dict(zip(missing, self.text_encoder(text_input).float()))
+
+            for key, feature in encoded.items():
+                self.text_cache.put(key, feature)
+            features = [encoded[key] if feature is None else feature for key, feature in zip(keys, features)]
+
+        # index rows are stored normalized (in float16), encoder rows are not: same scale for both
+        return _normalize(torch.stack(features))
+
+    def encode_cards(self, cards):
+        """Encode cards given as image paths or deck card ids into an N x D matrix of normalized rows.
+
+        Indexed cards are read from the embedding index, the rest go through the image
+        tower together in one batch.
+        """
+        # card ids may be numpy integers, e.g. from GameState
+        cards = [self.deck[int(card)] if isinstance(card, numbers.Integral) else card for card in cards]
+        indexed, indexed_rows, missing = [], [], []
+        for i, card in enumerate(cards):
+            row = self.index.lookup(card) if self.index is not None else None
+            if row is None:
+                missing.append(i)
+            else:
+                indexed.append(i)
+                indexed_rows.append(row)
+
+        instrumentation.incr("similarity.card_index.hits", len(indexed))
+        instrumentation.incr("similarity.card_index.misses", len(missing))
+        if not missing:
+            return _normalize(torch.from_numpy(self.index.vectors(indexed_rows).astype("float32")).to(self.device))
+
+        encoded = self.encode_image_batch([cards[i] for i in missing])
+        if not indexed:
+            return encoded
+        features = torch.empty(len(cards), encoded.shape[1], device=self.device)
+        features[missing] = encoded
+        features[indexed] = _normalize(torch.from_numpy(self.index.vectors(indexed_rows).astype("float32")).to(self.device))
+        return features
+
+    def score_cards(self, clues, cards):
+        """Score K clues against N cards, returning a K x N matrix of cosine similarities.
+
+        ``clues`` may be a single string (K = 1). The result stays on the model's device.
+        """
+        if isinstance(clues, str):
+            clues = [clues]
+        return self.encode_texts(clues).float() @ self.encode_cards(cards).T
+
+    def rank_cards(self, clues, cards):
+        """Return the K x N score matrix and, per clue, the card positions ordered best first."""
+        scores = self.score_cards(clues, cards)
+        return scores, scores.argsort(dim=1, descending=True)
+
+    def vote_on_table(self, clue, table, exclude_player_id=None):
+        """Pick the table position whose card best matches the clue.
+
+        ``table`` is the list of (player_id, card) built by ``collect_cards``; the card
+        owned by ``exclude_player_id`` (usually the voter's own) is never chosen.
+        """
+        scores = self.score_cards(clue, [card for _, card in table])[0]
+        if exclude_player_id is not None:
+            own = torch.tensor([player_id == exclude_player_id for player_id, _ in table], device=scores.device)
+            scores = scores.masked_fill(own, float("-inf"))
+        return int(scores.argmax().item())
 
     def compute_similarity(self, image_features, text_features):
         """Compute the cosine similarity between image and text feature vectors."""
@@ -44,7 +211,13 @@ class ImageTextSimilarity:
         text_features = self.encode_text(text_description)
         similarity_score = self.compute_similarity(image_features, text_features)
         return similarity_score.item()
-    
+
+    def compare_batch(self, pairs):
+        """Batched compare_image_and_text over a list of (image, text) pairs, e.g. for an InferenceBroker."""
+        image_features = self.encode_cards([image for image, _ in pairs])
+        text_features = self.encode_texts([text for _, text in pairs])
+        return self.compute_similarity(image_features, text_features).tolist()
+
 if __name__ == "__main__":
     similarity_checker = ImageTextSimilarity()
 
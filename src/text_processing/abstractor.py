@@ -1,12 +1,28 @@
-import openai
 import os
 import time
 
+import instrumentation
+
+# bump when the prompt wording changes, so cached clues from the old prompt are not reused
+PROMPT_VERSION = 1
+SAMPLING_PARAMS = {"max_tokens": 20, "temperature": 0.9, "top_p": 0.8}
+BANNED_CLUES = ("whispers of grace",)
+
+def build_prompt(description):
+    """Build the clue-generation prompt shared by the sync and async abstractors."""
+    return (
+        f"You are a storyteller in a creative and abstract game called Dixit. Your goal is to give a clue for "
+        f"the following image description: '{description}'. The clue should be poetic, abstract, and evocative, "
+        f"yet concise and complete. Please avoid using the phrase 'Whispers of Grace' or any similar phrases. "
+        f"Generate a unique phrase or word (1-3 words) that captures the essence of your card while making it challenging for others to guess correctly. "
+        f"Avoid using common phrases or too obvious clues. Think creatively to strike a balance between clarity and mystery."
+        )
+
 class Abstractor:
-    def __init__(self, api_key=None, model_name="gpt-4o-mini"):
+    def __init__(self, api_key=None, model_name="gpt-4o-mini", sampling_params=None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        openai.api_key = self.api_key
         self.model_name = model_name
+        self.sampling_params = {**SAMPLING_PARAMS, **(sampling_params or {})}
 
     def generate_creative_abstract(self, description, other_cards=None):
         other_cards = [
@@ -20,33 +36,32 @@ class Abstractor:
 ]
         other_cards_description = " | ".join(other_cards) if other_cards else ""
         
-        prompt = (
-            f"You are a storyteller in a creative and abstract game called Dixit. Your goal is to give a clue for "
-            f"the following image description: '{description}'. The clue should be poetic, abstract, and evocative, "
-            f"yet concise and complete. Please avoid using the phrase 'Whispers of Grace' or any similar phrases. "
-            f"Generate a unique phrase or word (1-3 words) that captures the essence of your card while making it challenging for others to guess correctly. "
-            f"Avoid using common phrases or too obvious clues. Think creatively to strike a balance between clarity and mystery."
-            )
+        prompt = build_prompt(description)
+
+        # openai is slow to import, so only pay for it once a clue is actually requested
+        import openai
+        openai.api_key = self.api_key
 
-        
         retries = 3
         for attempt in range(retries):
             try:
-                response = openai.ChatCompletion.create(
-                    model=self.model_name,
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=20,
-                    temperature=0.9,
-                    top_p=0.8,
-                )
+                instrumentation.incr("abstractor.requests")
+                with instrumentation.span("abstractor.request"):
+                    response = openai.ChatCompletion.create(
+                        model=self.model_name,
+                        messages=[
+                            {"role": "user", "content": prompt}
+                        ],
+                        **self.sampling_params,
+                    )
                 generated_clue = response.choices[0].message['content'].strip()
                 
-                if generated_clue.lower() != "whispers of grace":
+                if generated_clue.lower() not in BANNED_CLUES:
                     return generated_clue
+                instrumentation.incr("abstractor.banned")
             except openai.error.RateLimitError:
                 if attempt < retries - 1:
+                    instrumentation.incr("abstractor.retries")
                     print(f"Rate limit exceeded. Retrying in {2 ** attempt} seconds...")
                     time.sleep(2 ** attempt)
                 else:
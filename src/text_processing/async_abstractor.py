@@ -0,0 +1,218 @@
+import asyncio
+import os
+import random
+import time
+
+import instrumentation
+from text_processing.abstractor import BANNED_CLUES, SAMPLING_PARAMS, build_prompt
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``per_minute`` tokens per minute."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+        self._lock_loop = None
+
+    def _get_lock(self):
+        # asyncio locks belong to the loop they are first used on; make a new one for a new loop
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        return self._lock
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        """Wait until ``amount`` tokens are available and take them."""
+        amount = min(amount, self.capacity)
+        # the lock keeps waiters first-come first-served
+        async with self._get_lock():
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class RateLimiter:
+    """Keeps requests within both a requests-per-minute and a tokens-per-minute budget."""
+
+    def __init__(self, requests_per_minute=500, tokens_per_minute=200_000):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    async def acquire(self, tokens):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+
+def estimate_tokens(prompt, max_tokens):
+    """Rough token count of a request (about 4 characters per token) plus its completion budget."""
+    return len(prompt) // 4 + max_tokens
+
+
+class AsyncAbstractor:
+    """Asyncio counterpart of Abstractor for generating many clues concurrently.
+
+    Requests share one pooled HTTP connection pool, pass through an RPM/TPM rate limiter and
+    are retried with jittered exponential backoff on rate limits, server errors and connection
+    failures. ``base_url`` can point at any OpenAI-compatible endpoint, e.g. a local stub server.
+
+    The HTTP client is bound to the event loop it was created on. It is recreated when the
+    abstractor is used from a different loop (e.g. one ``asyncio.run`` per call), so reuse
+    across loops works but only keeps connections alive within one loop. The old client is
+    closed on its own loop: right away if that loop is still running, otherwise when the loop
+    shut down (asyncio.run finalizes async generators before closing the loop).
+    """
+
+    def __init__(self, api_key=None, model_name="gpt-4o-mini", base_url=None, requests_per_minute=500,
+                 tokens_per_minute=200_000, max_connections=20, max_retries=6, timeout=30.0, sampling_params=None):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.model_name = model_name
+        self.sampling_params = {**SAMPLING_PARAMS, **(sampling_params or {})}
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL", DEFAULT_BASE_URL)
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.retries = 0
+        self._client = None
+        self._client_loop = None
+        self._client_closer = None
+
+    async def _get_client(self):
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._client_loop is not loop:
+            # its connections belong to another loop and can only be closed there
+            if self._client_loop.is_running():
+                asyncio.run_coroutine_threadsafe(self._client_closer.aclose(), self._client_loop)
+            self._client = self._client_loop = self._client_closer = None
+        if self._client is None:
+            import httpx
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=self.timeout,
+            )
+            self._client, self._client_loop = client, loop
+            self._client_closer = self._close_with_loop(client)
+            await self._client_closer.__anext__()
+        return self._client
+
+    @staticmethod
+    async def _close_with_loop(client):
+        # parked at the yield on the client's loop, which finalizes it (closing the client) on shutdown
+        try:
+            yield
+        finally:
+            await client.aclose()
+
+    async def aclose(self):
+        if self._client is not None and self._client_loop is asyncio.get_running_loop():
+            await self._client_closer.aclose()
+        self._client = self._client_loop = self._client_closer = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+        delay = random.uniform(0, min(60.0, 0.5 * 2 ** attempt))
+        if retry_after is not None:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    async def _complete(self, prompt):
+        import httpx
+
+        client = await self._get_client()
+        payload = {
+            "model": self.model_name,
+            "messages": [{"role": "user", "content": prompt}],
+            **self.sampling_params,
+        }
+        for attempt in range(self.max_retries + 1):
+            with instrumentation.span("abstractor.rate_limit_wait"):
+                await self.limiter.acquire(estimate_tokens(prompt, self.sampling_params["max_tokens"]))
+            instrumentation.incr("abstractor.requests")
+            try:
+                with instrumentation.span("abstractor.request"):
+                    response = await client.post("/chat/completions", json=payload)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                instrumentation.incr("abstractor.retries")
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+                self.retries += 1
+                instrumentation.incr("abstractor.retries")
+                await asyncio.sleep(self._backoff(attempt, response.headers.get("retry-after")))
+                continue
+
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"].strip()
+
+    async def generate_creative_abstract(self, description, attempts=3):
+        """Generate one clue for a description, resampling banned clues up to ``attempts`` times.
+
+        If every sample is banned the last one is returned anyway (clue post-processing drops it).
+        """
+        prompt = build_prompt(description)
+        for _ in range(attempts):
+            generated_clue = await self._complete(prompt)
+            if generated_clue.lower() not in BANNED_CLUES:
+                return generated_clue
+            instrumentation.incr("abstractor.banned")
+        return generated_clue
+
+    async def generate_many(self, descriptions, concurrency=None):
+        """Generate clues for many descriptions concurrently, returned in input order."""
+        semaphore = asyncio.Semaphore(concurrency or self.max_connections)
+
+        async def generate(description):
+            async with semaphore:
+                return await self.generate_creative_abstract(description)
+
+        return await asyncio.gather(*(generate(description) for description in descriptions))
+
+
+if __name__ == "__main__":
+    descriptions = [
+        "A pair of pink ballet shoes on a wooden floor.",
+        "A lighthouse on a cliff during a storm.",
+        "A child reading a book under a tree.",
+    ]
+
+    async def main():
+        async with AsyncAbstractor() as abstractor:
+            start = time.perf_counter()
+            clues = await abstractor.generate_many(descriptions)
+            elapsed = time.perf_counter() - start
+        for description, clue in zip(descriptions, clues):
+            print(f"{description} -> {clue}")
+        print(f"{len(descriptions)} clues in {elapsed:.2f}s ({abstractor.retries} retries)")
+
+    asyncio.run(main())
@@ -0,0 +1,223 @@
+import asyncio
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import instrumentation
+from text_processing.abstractor import PROMPT_VERSION, SAMPLING_PARAMS
+
+
+def normalize_description(description):
+    """Lowercase, collapse whitespace and drop trailing punctuation so trivial variants share a key."""
+    return " ".join(description.lower().split()).rstrip(" .!")
+
+
+class CachedAbstractor:
+    """Caching front for an Abstractor or AsyncAbstractor.
+
+    Clues are keyed on (normalized description, model name, prompt version, the wrapped
+    abstractor's sampling params) and kept in an LRU of ``maxsize`` entries that expire ``ttl``
+    seconds after they were first generated. Concurrent requests for the same key share one
+    upstream call, whether they come from threads, coroutines or both, on any event loop.
+
+    With ``pool_size`` > 1 each key holds up to that many clues: requests keep going to the
+    LLM until the pool is full, after which a random pooled clue is returned, so repeated
+    cards still get varied clues. With ``path`` the cache is loaded from a JSON file and
+    written back after every ``save_every`` new clues and on ``close``.
+
+    ``generate_creative_abstract`` needs a sync abstractor; ``agenerate_creative_abstract``
+    and ``generate_many`` take either kind, running a sync one on a worker thread.
+    """
+
+    def __init__(self, abstractor, maxsize=1024, ttl=None, path=None, pool_size=1, rng=None, clock=time.time,
+                 save_every=32):
+        self.abstractor = abstractor
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.pool_size = pool_size
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self.save_every = save_every
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        # key -> concurrent.futures.Future of the upstream call; not tied to a thread or event loop
+        self._in_flight = {}
+        if path and os.path.exists(path):
+            self._load()
+
+    @property
+    def model_name(self):
+        return self.abstractor.model_name
+
+    @property
+    def sampling_params(self):
+        return getattr(self.abstractor, "sampling_params", SAMPLING_PARAMS)
+
+    def cache_key(self, description):
+        sampling = ",".join(f"{name}={value}" for name, value in sorted(self.sampling_params.items()))
+        return "|".join([normalize_description(description), self.model_name, f"v{PROMPT_VERSION}", sampling])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, entry):
+        return self.ttl is not None and self.clock() - entry["created"] > self.ttl
+
+    def _lookup(self, key):
+        """Return a cached clue if the key's pool is full and fresh, else None. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        if len(entry["clues"]) < self.pool_size:
+            return None
+        return self.rng.choice(entry["clues"])
+
+    def _store(self, key, clue):
+        """Add a freshly generated clue to the key's pool, returning True when a save is due. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None or self._expired(entry):
+            entry = self._entries[key] = {"created": self.clock(), "clues": []}
+        if clue not in entry["clues"]:
+            entry["clues"].append(clue)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        if not self.path:
+            return False
+        self._unsaved += 1
+        return self._unsaved >= self.save_every
+
+    def _claim(self, key):
+        """Return (cached clue, None) on a hit, else (None, (future, owner)). Only the owner calls upstream."""
+        with self._lock:
+            clue = self._lookup(key)
+            if clue is not None:
+                self.hits += 1
+                instrumentation.incr("clue_cache.hits")
+                return clue, None
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+                self.misses += 1
+                instrumentation.incr("clue_cache.misses")
+            else:
+                self.coalesced += 1
+                instrumentation.incr("clue_cache.coalesced")
+            return None, (future, owner)
+
+    def _fail(self, key, future, error):
+        with self._lock:
+            del self._in_flight[key]
+        future.set_exception(error)
+
+    def _finish(self, key, future, clue):
+        """Store the owner's clue and wake the coalesced callers, returning True when a save is due."""
+        save = False
+        with self._lock:
+            if clue is not None:
+                save = self._store(key, clue)
+            del self._in_flight[key]
+        future.set_result(clue)
+        return save
+
+    def generate_creative_abstract(self, description):
+        """Return a clue for a description, calling the wrapped abstractor only on a miss."""
+        if inspect.iscoroutinefunction(self.abstractor.generate_creative_abstract):
+            raise TypeError("CachedAbstractor wraps an async abstractor, use agenerate_creative_abstract or generate_many")
+        key = self.cache_key(description)
+        clue, claim = self._claim(key)
+        if claim is None:
+            return clue
+        future, owner = claim
+        if not owner:
+            return future.result()
+
+        try:
+            clue = self.abstractor.generate_creative_abstract(description)
+            if inspect.isawaitable(clue):
+                # e.g. an abstractor whose method returns a coroutine without being declared async
+                if inspect.iscoroutine(clue):
+                    clue.close()
+                raise TypeError("the wrapped abstractor is async, use agenerate_creative_abstract or generate_many")
+        except BaseException as error:
+            self._fail(key, future, error)
+            raise
+        if self._finish(key, future, clue):
+            self.flush()
+        return clue
+
+    async def agenerate_creative_abstract(self, description):
+        """Async variant of generate_creative_abstract, for an AsyncAbstractor or a sync abstractor."""
+        key = self.cache_key(description)
+        clue, claim = self._claim(key)
+        if claim is None:
+            return clue
+        future, owner = claim
+        if not owner:
+            # shielded, so a cancelled waiter never cancels the call other callers share
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            if inspect.iscoroutinefunction(self.abstractor.generate_creative_abstract):
+                clue = await self.abstractor.generate_creative_abstract(description)
+            else:
+                clue = await asyncio.to_thread(self.abstractor.generate_creative_abstract, description)
+        except BaseException as error:
+            self._fail(key, future, error)
+            raise
+        if self._finish(key, future, clue):
+            # file I/O off the event loop
+            await asyncio.to_thread(self.flush)
+        return clue
+
+    async def generate_many(self, descriptions):
+        return await asyncio.gather(*(self.agenerate_creative_abstract(description) for description in descriptions))
+
+    def _load(self):
+        with open(self.path) as f:
+            entries = json.load(f)
+        for key, entry in entries.items():
+            if not self._expired(entry):
+                self._entries[key] = entry
+
+    def flush(self):
+        """Write unsaved clues to ``path``, atomically through a temp file and rename."""
+        if not self.path:
+            return
+        # one writer at a time, each writing a snapshot at least as new as the previous one
+        with self._save_lock:
+            with self._lock:
+                if not self._unsaved:
+                    return
+                snapshot = {key: {"created": entry["created"], "clues": list(entry["clues"])}
+                            for key, entry in self._entries.items()}
+                self._unsaved = 0
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,223 @@
+import argparse
+import logging
+import re
+import threading
+import time
+
+import instrumentation
+from text_processing.abstractor import BANNED_CLUES
+
+# One spaCy pipeline per process, loaded with only the components clue post-processing uses:
+# the tagger (POS for the caption-noun check) and the lemmatizer with what it depends on.
+# Without the model installed it falls back to a blank English tokenizer and suffix stripping.
+DEFAULT_MODEL = "en_core_web_sm"
+EXCLUDED_COMPONENTS = ["parser", "ner", "senter", "textcat", "entity_ruler", "entity_linker"]
+
+logger = logging.getLogger(__name__)
+
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def shared_nlp(model=DEFAULT_MODEL):
+    """Return this process's spaCy pipeline for ``model``, loading it on first use."""
+    with _pipelines_lock:
+        nlp = _pipelines.get(model)
+        if nlp is None:
+            with instrumentation.span("text.spacy_load"):
+                import spacy
+                try:
+                    nlp = spacy.load(model, exclude=EXCLUDED_COMPONENTS)
+                except OSError:
+                    # model package not installed: tokenizer only, lemmas come from light_lemma
+                    logger.warning("spaCy model %r is not installed, falling back to a blank English "
+                                   "tokenizer: leak checks compare every word instead of nouns and lemmas "
+                                   "are approximated by suffix stripping (python -m spacy download %s)",
+                                   model, model)
+                    nlp = spacy.blank("en")
+            _pipelines[model] = nlp
+        return nlp
+
+
+def light_lemma(word):
+    """Crude English lemma for pipelines without a lemmatizer: strips plural and verb suffixes.
+
+    It only needs to map inflections of a word to the same key, not to a real lemma
+    ("dancing" becomes "danc").
+    """
+    word = word.lower()
+    if word.endswith("ss"):
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("ing") and len(word) > 5:
+        return word[:-3]
+    if word.endswith("ed") and len(word) > 4:
+        return word[:-2]
+    if word.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return word[:-2]
+    if word.endswith("s") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Lowercase, collapse whitespace and trim surrounding punctuation, the key used for deduplication."""
+    return _WHITESPACE.sub(" ", text.lower()).strip(" .,;:!?\"'")
+
+
+def remove_repetitions(phrase):
+    """Drop words that repeat an earlier word of the phrase up to case, punctuation and inflection.
+
+    Plain string work, so it never loads spaCy.
+    """
+    seen = set()
+    kept = []
+    for word in phrase.split():
+        key = light_lemma(normalize(word))
+        if key in seen:
+            continue
+        if key:
+            seen.add(key)
+        kept.append(word)
+    return " ".join(kept)
+
+
+class CluePostProcessor:
+    """Clean and filter a batch of generated clues with one ``nlp.pipe`` pass.
+
+    ``process`` removes repeated words (by lemma, so "star stars" becomes "star") and rejects
+    clues that are empty, duplicates of an earlier clue, banned phrases such as "Whispers of
+    Grace" (also their inflections), or that leak a noun of the caption they were written for.
+    """
+
+    def __init__(self, nlp=None, model=DEFAULT_MODEL, banned=BANNED_CLUES, batch_size=256):
+        self._nlp = nlp
+        self.model = model
+        self.banned = banned
+        self.batch_size = batch_size
+        self._banned_lemmas = None
+        self.rejected = {"empty": 0, "duplicate": 0, "banned": 0, "leak": 0}
+
+    @property
+    def nlp(self):
+        if self._nlp is None:
+            self._nlp = shared_nlp(self.model)
+        return self._nlp
+
+    def _has_lemmatizer(self):
+        return "lemmatizer" in self.nlp.pipe_names
+
+    def _lemma(self, token):
+        if self._has_lemmatizer() and token.lemma_:
+            return token.lemma_.lower()
+        return light_lemma(token.text)
+
+    def _content_lemmas(self, doc, nouns_only):
+        """Lemmas of the nouns in a doc, or of every non-stopword if the pipeline has no tagger."""
+        tagged = "tagger" in self.nlp.pipe_names
+        return {
+            self._lemma(token) for token in doc
+            if token.is_alpha and not token.is_stop
+            and (not nouns_only or not tagged or token.pos_ in ("NOUN", "PROPN"))
+        }
+
+    def _dedupe_tokens(self, doc):
+        seen = set()
+        kept = []
+        for token in doc:
+            if token.is_alpha:
+                lemma = self._lemma(token)
+                if lemma in seen:
+                    continue
+                seen.add(lemma)
+            kept.append(token.text_with_ws)
+        return "".join(kept).strip()
+
+    def remove_repetitions(self, clue):
+        """Drop repeated words from one clue without loading spaCy, see remove_repetitions."""
+        return remove_repetitions(clue)
+
+    def _banned(self, lemmas):
+        if self._banned_lemmas is None:
+            self._banned_lemmas = [" ".join(self._lemma(token) for token in doc if not token.is_punct)
+                                   for doc in self.nlp.pipe([phrase for phrase in self.banned])]
+        joined = " ".join(lemmas)
+        return any(phrase and (joined == phrase or f" {phrase} " in f" {joined} ") for phrase in self._banned_lemmas)
+
+    def process(self, clues, captions=None):
+        """Clean a batch of clues, returning one entry per clue: the cleaned text or None if rejected.
+
+        ``captions`` is one caption for every clue, or a list with the caption each clue was
+        generated from; clues sharing a noun lemma with their caption are rejected.
+        """
+        if isinstance(captions, str):
+            captions = [captions] * len(clues)
+        caption_nouns = {}
+        if captions is not None:
+            unique_captions = list(dict.fromkeys(captions))
+            for caption, doc in zip(unique_captions, self.nlp.pipe(unique_captions, batch_size=self.batch_size)):
+                caption_nouns[caption] = self._content_lemmas(doc, nouns_only=True)
+
+        instrumentation.observe("text.postprocess.batch_size", len(clues))
+        results = []
+        seen = set()
+        for i, doc in enumerate(self.nlp.pipe(clues, batch_size=self.batch_size)):
+            cleaned = self._dedupe_tokens(doc)
+            key = normalize(cleaned)
+            lemmas = [self._lemma(token) for token in doc if not token.is_punct and not token.is_space]
+            if not key:
+                reason = "empty"
+            elif key in seen:
+                reason = "duplicate"
+            elif self._banned(lemmas):
+                reason = "banned"
+            elif captions is not None and self._content_lemmas(doc, nouns_only=False) & caption_nouns[captions[i]]:
+                reason = "leak"
+            else:
+                reason = None
+            if reason is None:
+                seen.add(key)
+                results.append(cleaned)
+            else:
+                self.rejected[reason] += 1
+                instrumentation.incr(f"text.postprocess.rejected.{reason}")
+                results.append(None)
+        return results
+
+    def filter(self, clues, captions=None):
+        """The clues that survive ``process``, cleaned, in input order."""
+        return [clue for clue in self.process(clues, captions) if clue is not None]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure clue post-processing throughput.")
+    parser.add_argument("--clues", type=int, default=10_000)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    postprocessor = CluePostProcessor(model=args.model)
+    postprocessor.nlp
+    load = time.perf_counter() - start
+    print(f"pipeline {postprocessor.nlp.pipe_names or ['tokenizer']} loaded in {load * 1000:.0f}ms")
+
+    words = ["moon", "moons", "silent", "journey", "dreams", "dream", "falling", "light", "shadows", "garden"]
+    scenery = ["lake", "forest", "city", "desert", "moon"]
+    clues = [f"{words[i % 10]} {words[(i * 7) % 10]} {words[(i * 3) % 10]} {i}" for i in range(args.clues)]
+    captions = [f"a {scenery[i % 5]} at night" for i in range(args.clues)]
+
+    start = time.perf_counter()
+    for clue, caption in zip(clues[:1000], captions):
+        postprocessor.process([clue], [caption])
+    one_by_one = (time.perf_counter() - start) / 1000
+
+    postprocessor.rejected = dict.fromkeys(postprocessor.rejected, 0)
+    start = time.perf_counter()
+    kept = postprocessor.filter(clues, captions)
+    batched = (time.perf_counter() - start) / len(clues)
+    print(f"one clue per call: {1 / one_by_one:.0f} clues/s, one batch: {1 / batched:.0f} clues/s "
+          f"({len(kept)} kept, rejected {postprocessor.rejected})")
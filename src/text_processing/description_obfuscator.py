@@ -2,8 +2,9 @@ from text_processing.abstractor import Abstractor
 from text_processing.text_processor import TextProcessor
 
 class DescriptionObfuscator:
-    def __init__(self, api_key=None, model_name="gpt-4o-mini"):
-        self.abstractor = Abstractor(api_key=api_key, model_name=model_name)
+    def __init__(self, api_key=None, model_name="gpt-4o-mini", abstractor=None):
+        # pass an abstractor to share one (e.g. a CachedAbstractor) between obfuscators
+        self.abstractor = abstractor or Abstractor(api_key=api_key, model_name=model_name)
         self.text_processor = TextProcessor()
     
     def obfuscate(self, description):
@@ -0,0 +1,109 @@
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMServer:
+    """Local OpenAI-compatible chat completions endpoint for tests and benchmarks.
+
+    Replies "Echo of <description>" for the quoted description in the prompt after
+    ``latency`` seconds. With ``rate_limit_every=n`` every n-th request gets a 429
+    with ``Retry-After: 0``, to exercise client retries.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, rate_limit_every=0):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body are written separately, so Nagle + delayed ACK would add ~40ms per reply
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body, headers=()):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if not self.path.endswith("/chat/completions"):
+                    self._reply(404, {"error": {"message": f"unknown path {self.path}"}})
+                    return
+                with stub._lock:
+                    stub.requests += 1
+                    limited = stub.rate_limit_every and stub.requests % stub.rate_limit_every == 0
+                    if limited:
+                        stub.rate_limited += 1
+                if limited:
+                    self._reply(429, {"error": {"message": "rate limited"}}, [("Retry-After", "0")])
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                prompt = request["messages"][-1]["content"]
+                match = re.search(r"'(.*?)'\.", prompt)
+                content = f"Echo of {match.group(1) if match else prompt[:20]}"
+                self._reply(200, {
+                    "object": "chat.completion",
+                    "model": request.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                })
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stub OpenAI chat completions server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StubLLMServer(port=args.port, latency=args.latency, rate_limit_every=args.rate_limit_every)
+    print(f"Serving stub LLM at {server.base_url}")
+    server.start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,24 +1,38 @@
-import spacy
+import instrumentation
+from text_processing.clue_postprocessor import CluePostProcessor, remove_repetitions
+
 
 class TextProcessor:
-    def __init__(self):
-        self.nlp = spacy.load('en_core_web_sm')
+    def __init__(self, postprocessor=None):
+        # the spaCy pipeline behind it is shared by every processor in the process
+        self.postprocessor = postprocessor or CluePostProcessor()
+
+    @property
+    def nlp(self):
+        """The process-wide spaCy pipeline, loaded the first time any processor needs it."""
+        return self.postprocessor.nlp
+
+    def postprocess(self, clues, captions=None):
+        """Clean and filter a batch of clues, see CluePostProcessor.process."""
+        return self.postprocessor.process(clues, captions)
     
     def remove_repetitions(self, phrase):
         """Remove repeated words within a phrase."""
-        words = phrase.split()
-        seen = set()
-        result = []
-        for word in words:
-            if word.lower() not in seen:
-                seen.add(word.lower())
-                result.append(word)
-        return ' '.join(result)
+        with instrumentation.span("text.remove_repetitions"):
+            return remove_repetitions(phrase)
     
-    def obfuscate_description(self, description, abstractor):
-        """Obfuscate a text description by generating a single creative abstraction for the entire description."""
-        abstracted_phrase = abstractor.generate_creative_abstract(description)
-        
-        processed_phrase = self.remove_repetitions(abstracted_phrase)
+    def obfuscate_description(self, description, abstractor, attempts=3):
+        """Obfuscate a text description by generating a single creative abstraction for the entire description.
+
+        Abstractions go through the same post-processing as batched clues. One that is rejected
+        (empty, banned, or leaking a noun of the description) is regenerated up to ``attempts``
+        times; if every one is rejected the last is returned with its repetitions removed.
+        """
+        for _ in range(attempts):
+            abstracted_phrase = abstractor.generate_creative_abstract(description)
+            processed_phrase = self.postprocess([abstracted_phrase], [description])[0]
+            if processed_phrase is not None:
+                return processed_phrase
+            instrumentation.incr("text.obfuscate.rejected")
         
-        return processed_phrase
\ No newline at end of file
+        return self.remove_repetitions(abstracted_phrase or "")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# modules under src import each other as top-level packages (e.g. game_logic.dixit)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from text_processing.async_abstractor import AsyncAbstractor, TokenBucket
+from text_processing.stub_llm_server import StubLLMServer
+
+
+def test_generate_many_against_stub_server_retries_rate_limits():
+    descriptions = [f"card number {i}" for i in range(20)]
+
+    async def run(base_url):
+        async with AsyncAbstractor(api_key="test", base_url=base_url) as abstractor:
+            return await abstractor.generate_many(descriptions, concurrency=5), abstractor.retries
+
+    with StubLLMServer(latency=0.01, rate_limit_every=4) as server:
+        clues, retries = asyncio.run(run(server.base_url))
+
+    assert clues == [f"Echo of {description}" for description in descriptions]
+    assert server.rate_limited > 0
+    assert retries == server.rate_limited
+
+
+def test_token_bucket_limits_rate():
+    async def run():
+        bucket = TokenBucket(per_minute=600, capacity=1)
+        start = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # one token up front, then one every 0.1s
+    assert asyncio.run(run()) >= 0.25
+
+
+def test_abstractor_can_be_reused_across_event_loops():
+    with StubLLMServer(latency=0.0) as server:
+        abstractor = AsyncAbstractor(api_key="test", base_url=server.base_url)
+        first = asyncio.run(abstractor.generate_creative_abstract("a lighthouse"))
+        first_client = abstractor._client
+        second = asyncio.run(abstractor.generate_creative_abstract("a ballet shoe"))
+        second_client = abstractor._client
+
+    assert (first, second) == ("Echo of a lighthouse", "Echo of a ballet shoe")
+    # each loop's client was closed on that loop as it shut down
+    assert first_client is not second_client
+    assert first_client.is_closed and second_client.is_closed
+
+
+def test_all_banned_samples_still_return_a_clue(monkeypatch):
+    abstractor = AsyncAbstractor(api_key="test")
+
+    async def complete(prompt):
+        return "Whispers of Grace"
+
+    monkeypatch.setattr(abstractor, "_complete", complete)
+    assert asyncio.run(abstractor.generate_creative_abstract("a church")) == "Whispers of Grace"
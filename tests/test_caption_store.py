@@ -0,0 +1,54 @@
+from game_logic import storyteller
+from image_captioning.caption_store import CaptionStore
+from image_captioning.precompute_captions import precompute_captions
+
+
+class FakeCaptioner:
+    model_version = "fake/v1"
+
+    def __init__(self):
+        self.captioned = []
+
+    def generate_captions(self, paths, batch_size=8):
+        self.captioned += paths
+        return [f"caption of {path.rsplit('/', 1)[-1]}" for path in paths]
+
+
+def write_cards(directory, contents):
+    paths = []
+    for i, content in enumerate(contents):
+        path = directory / f"card_{i:05d}.png"
+        path.write_bytes(content)
+        paths.append(str(path))
+    return paths
+
+
+def test_hit_skips_the_model_and_miss_falls_back_to_it(tmp_path, monkeypatch):
+    hit, miss = write_cards(tmp_path, [b"first card", b"second card"])
+    store = CaptionStore(str(tmp_path / "captions.sqlite"))
+    store.store_for(hit, storyteller.MODEL_VERSION, "a stored caption")
+    generated = []
+    monkeypatch.setattr(storyteller, "generate_description", lambda path: generated.append(path) or "a new caption")
+
+    assert storyteller.get_description(hit, store) == "a stored caption"
+    assert storyteller.get_description(miss, store) == "a new caption"
+    assert storyteller.get_description(miss, store) == "a new caption"
+    assert generated == [miss]
+    # captions belong to the model version that wrote them
+    assert store.caption_for(hit, "other/model") is None
+
+
+def test_precomputed_captions_persist_and_resume(tmp_path):
+    paths = write_cards(tmp_path, [b"one", b"two", b"three", b"one"])
+    store_path = str(tmp_path / "captions.sqlite")
+    store = CaptionStore(store_path)
+    captioner = FakeCaptioner()
+    # the fourth card has the same content as the first and shares its caption
+    assert precompute_captions(str(tmp_path), store, captioner, workers=1, batch_size=2) == 3
+    store.close()
+
+    reopened = CaptionStore(store_path)
+    assert reopened.caption_for(paths[3], "fake/v1") == reopened.caption_for(paths[0], "fake/v1")
+    assert reopened.caption_for(paths[1], "fake/v1") == "caption of card_00001.png"
+    assert precompute_captions(str(tmp_path), reopened, FakeCaptioner(), workers=1) == 0
+    reopened.close()
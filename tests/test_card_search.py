@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from similarity.card_search import CardSearchIndex, faiss, score_clue_ambiguity
+
+BACKENDS = [False] + ([True] if faiss is not None else [])
+
+
+def embeddings(count, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+
+@pytest.mark.parametrize("use_faiss", BACKENDS)
+def test_incremental_insert_skips_known_cards(use_faiss):
+    vectors = embeddings(6)
+    index = CardSearchIndex(8, use_faiss=use_faiss)
+    assert index.add(["a", "b", "c"], vectors[:3]) == 3
+    # "c" is already indexed and keeps its first embedding
+    assert index.add(["c", "d", "e", "f"], vectors[2:]) == 3
+    assert len(index) == 6 and index.card_ids == list("abcdef")
+    _, found = index.top_k(vectors, k=1, exact=True)
+    assert list(found[:, 0]) == list("abcdef")
+
+
+@pytest.mark.parametrize("use_faiss", BACKENDS)
+def test_save_and_load_round_trip(tmp_path, use_faiss):
+    vectors = embeddings(50)
+    index = CardSearchIndex(8, use_faiss=use_faiss)
+    index.add(list(range(50)), vectors)
+    index.save(str(tmp_path))
+
+    loaded = CardSearchIndex.load(str(tmp_path), use_faiss=use_faiss)
+    assert loaded.card_ids == index.card_ids
+    queries = embeddings(5, seed=1)
+    # rows are stored as float16, so only the neighbours are compared exactly
+    assert (loaded.top_k(queries, k=3)[1] == index.top_k(queries, k=3)[1]).all()
+    assert loaded.add([50], embeddings(1, seed=2)) == 1 and len(loaded) == 51
+
+
+def test_empty_index_and_zero_k_return_no_results():
+    index = CardSearchIndex(8, use_faiss=False)
+    scores, found = index.top_k(embeddings(2), k=5)
+    assert scores.shape == found.shape == (2, 0)
+    index.add(["a"], embeddings(1))
+    assert index.top_k(embeddings(2), k=0)[1].shape == (2, 0)
+
+
+class OneHotSimilarity:
+    def encode_texts(self, clues):
+        import torch
+        return torch.tensor([[float(c) for c in clue] for clue in clues])
+
+
+def test_ambiguity_prefers_a_clue_with_a_few_rivals():
+    pytest.importorskip("torch")
+    index = CardSearchIndex(3, use_faiss=False)
+    index.add(["own", "close", "far"], np.array([[1, 0, 0], [0.99, 0.14, 0], [0, 0, 1]], dtype=np.float32))
+    # "100" finds the card with one close rival, "001" points at another card
+    ranked = score_clue_ambiguity(index, OneHotSimilarity(), ["001", "100"], "own")
+    assert [r["clue"] for r in ranked] == ["100", "001"]
+    assert (ranked[0]["rank"], ranked[0]["rivals"]) == (1, 1)
+
+
+def test_ambiguity_over_the_nearest_candidates_matches_the_full_scan():
+    pytest.importorskip("torch")
+    index = CardSearchIndex(3, use_faiss=False)
+    index.add(["own", "close", "far"], np.array([[1, 0, 0], [0.99, 0.14, 0], [0, 0, 1]], dtype=np.float32))
+    exact = score_clue_ambiguity(index, OneHotSimilarity(), ["001", "100", "110"], "own", exact=True)
+    assert score_clue_ambiguity(index, OneHotSimilarity(), ["001", "100", "110"], "own") == exact
+    # "001" only finds "far", which outscores the card, among its single nearest card
+    ranked = score_clue_ambiguity(index, OneHotSimilarity(), ["001"], "own", candidates=1)
+    assert (ranked[0]["rank"], ranked[0]["rivals"]) == (None, 1)
+
+
+def test_padded_hnsw_results_are_dropped():
+    class PaddingGraph:
+        def search(self, queries, k):
+            scores = np.array([[0.9, 0.5, -3.4e38], [0.8, -3.4e38, -3.4e38]], dtype=np.float32)
+            return scores[:, :k], np.array([[1, 0, -1], [2, -1, -1]])[:, :k]
+
+    index = CardSearchIndex(8, use_faiss=False)
+    index.add(["a", "b", "c"], embeddings(3))
+    index._hnsw = PaddingGraph()
+    scores, found = index.top_k(embeddings(2, seed=1), k=3)
+    assert found.tolist() == [["b", "a"], ["c", None]]
+    assert scores[1, 1] == -np.inf
+    assert index.rank_of(embeddings(2, seed=1), "c", max_rank=3) == [None, 1]
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from text_processing.clue_cache import CachedAbstractor
+
+
+class CountingAbstractor:
+    model_name = "fake-model"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_creative_abstract(self, description):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.delay)
+        return f"{description} #{call}"
+
+
+class AsyncCountingAbstractor(CountingAbstractor):
+    async def generate_creative_abstract(self, description):
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(self.delay)
+        return f"{description} #{call}"
+
+
+def test_hits_ignore_case_whitespace_and_trailing_period():
+    abstractor = CountingAbstractor()
+    cache = CachedAbstractor(abstractor)
+    first = cache.generate_creative_abstract("A cat by the fire.")
+    assert cache.generate_creative_abstract("a  cat by the FIRE") == first
+    assert abstractor.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_ttl_and_lru_eviction():
+    now = [0.0]
+    abstractor = CountingAbstractor()
+    cache = CachedAbstractor(abstractor, maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.generate_creative_abstract("a")
+    cache.generate_creative_abstract("b")
+    cache.generate_creative_abstract("a")
+    cache.generate_creative_abstract("c")  # evicts b, the least recently used
+    assert len(cache) == 2
+    cache.generate_creative_abstract("a")
+    assert abstractor.calls == 3
+    cache.generate_creative_abstract("b")
+    assert abstractor.calls == 4
+    now[0] = 11
+    cache.generate_creative_abstract("a")
+    assert abstractor.calls == 5
+
+
+def test_concurrent_identical_requests_share_one_call():
+    abstractor = CountingAbstractor(delay=0.2)
+    cache = CachedAbstractor(abstractor)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.generate_creative_abstract("owl")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert abstractor.calls == 1
+    assert results == ["owl #1"] * 8
+    assert cache.coalesced == 7
+
+
+def test_async_requests_are_coalesced():
+    abstractor = AsyncCountingAbstractor(delay=0.05)
+    cache = CachedAbstractor(abstractor)
+    clues = asyncio.run(cache.generate_many(["owl", "owl", "moon", "owl"]))
+    assert clues == ["owl #1", "owl #1", "moon #2", "owl #1"]
+    assert abstractor.calls == 2
+
+
+def test_pool_keeps_several_clues_per_card():
+    abstractor = CountingAbstractor()
+    cache = CachedAbstractor(abstractor, pool_size=3, rng=random.Random(0))
+    clues = {cache.generate_creative_abstract("owl") for _ in range(20)}
+    assert abstractor.calls == 3
+    assert clues == {"owl #1", "owl #2", "owl #3"}
+
+
+def test_persists_to_disk(tmp_path):
+    path = str(tmp_path / "clues.json")
+    with CachedAbstractor(CountingAbstractor(), path=path) as cache:
+        clue = cache.generate_creative_abstract("owl")
+
+    abstractor = CountingAbstractor()
+    reloaded = CachedAbstractor(abstractor, path=path)
+    assert reloaded.generate_creative_abstract("owl") == clue
+    assert abstractor.calls == 0
+
+
+def test_writes_are_batched(tmp_path):
+    path = str(tmp_path / "clues.json")
+    cache = CachedAbstractor(CountingAbstractor(), path=path, save_every=3)
+    cache.generate_creative_abstract("owl")
+    cache.generate_creative_abstract("moon")
+    assert not os.path.exists(path)
+    cache.generate_creative_abstract("fire")
+    assert len(CachedAbstractor(CountingAbstractor(), path=path)) == 3
+
+
+def test_sync_call_on_async_abstractor_is_rejected_and_not_cached(tmp_path):
+    path = str(tmp_path / "clues.json")
+    cache = CachedAbstractor(AsyncCountingAbstractor(), path=path, save_every=1)
+    with pytest.raises(TypeError):
+        cache.generate_creative_abstract("owl")
+    assert len(cache) == 0 and not os.path.exists(path)
+    assert asyncio.run(cache.agenerate_creative_abstract("owl")) == "owl #1"
+
+
+def test_sync_and_async_callers_share_one_call():
+    abstractor = CountingAbstractor(delay=0.2)
+    cache = CachedAbstractor(abstractor)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(cache.generate_creative_abstract("owl")))
+    thread.start()
+    time.sleep(0.05)
+    results.append(asyncio.run(cache.agenerate_creative_abstract("owl")))
+    thread.join()
+    assert results == ["owl #1", "owl #1"]
+    assert abstractor.calls == 1 and cache.coalesced == 1
+
+
+def test_waiters_on_another_event_loop_get_the_result():
+    abstractor = AsyncCountingAbstractor(delay=0.2)
+    cache = CachedAbstractor(abstractor)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(asyncio.run(cache.agenerate_creative_abstract("owl"))))
+    thread.start()
+    time.sleep(0.05)
+    results.append(asyncio.run(cache.agenerate_creative_abstract("owl")))
+    thread.join()
+    assert results == ["owl #1", "owl #1"]
+    assert abstractor.calls == 1
+
+
+def test_key_follows_the_abstractors_sampling_params():
+    hot, cold = CountingAbstractor(), CountingAbstractor()
+    hot.sampling_params = {"temperature": 1.2}
+    cold.sampling_params = {"temperature": 0.2}
+    assert CachedAbstractor(hot).cache_key("owl") != CachedAbstractor(cold).cache_key("owl")
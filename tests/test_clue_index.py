@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+
+from similarity.clue_index import (ClueEmbeddingIndex, TextEmbeddingCache, load_clue_vocabulary, normalize_clue,
+                                   shared_text_cache)
+
+CLUES = ["The Moon", "a long journey", "music", "hidden  in plain sight", "fire", "balance"]
+
+
+def fake_encoder(seed=0):
+    vectors = {normalize_clue(clue): row for clue, row in
+               zip(CLUES, np.random.default_rng(seed).standard_normal((len(CLUES), 16)).astype(np.float32))}
+    calls = []
+
+    def encode_texts(batch):
+        calls.append(list(batch))
+        return np.stack([vectors[clue] for clue in batch])
+
+    return vectors, calls, encode_texts
+
+
+def test_text_cache_counts_hits_and_evicts_least_recently_used():
+    cache = TextEmbeddingCache(maxsize=2)
+    cache.put("moon", 1)
+    cache.put("fire", 2)
+    assert cache.get("moon") == 1
+    cache.put("music", 3)  # evicts fire
+    assert cache.get("fire") is None
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 2)
+    assert shared_text_cache(("model", "test")) is shared_text_cache(("model", "test"))
+
+
+def test_build_is_incremental_and_survives_reload(tmp_path):
+    _, calls, encode_texts = fake_encoder()
+    index = ClueEmbeddingIndex(str(tmp_path), "ViT-B-32", "laion2b_e16")
+    assert index.build(CLUES[:3] + ["the  moon"], encode_texts) == 3
+    assert index.build(CLUES, encode_texts) == 3
+    assert calls == [["the moon", "a long journey", "music"], ["hidden in plain sight", "fire", "balance"]]
+
+    reloaded = ClueEmbeddingIndex(str(tmp_path), "ViT-B-32", "laion2b_e16")
+    assert len(reloaded) == len(CLUES) and "THE moon" in reloaded and "rain" not in reloaded
+
+
+def test_nearest_clues_match_brute_force_scoring(tmp_path):
+    vectors, _, encode_texts = fake_encoder(seed=1)
+    index = ClueEmbeddingIndex(str(tmp_path), "ViT-B-32", "laion2b_e16")
+    index.build(CLUES, encode_texts)
+
+    keys = list(vectors)
+    exact = np.stack([vectors[key] / np.linalg.norm(vectors[key]) for key in keys])
+    stored = np.stack([index.get(key).astype(np.float32) for key in keys])
+    for query in np.random.default_rng(2).standard_normal((5, 16)).astype(np.float32):
+        assert list(np.argsort(-(stored @ query))[:3]) == list(np.argsort(-(exact @ query))[:3])
+
+
+def test_vocabulary_from_clue_cache_and_text_files(tmp_path):
+    cache_file = tmp_path / "clues.json"
+    cache_file.write_text(json.dumps({"owl": {"created": 0, "clues": ["wisdom", "night"]}}))
+    text_file = tmp_path / "clues.txt"
+    text_file.write_text("moon\n\n  fire \n")
+    assert load_clue_vocabulary(str(cache_file)) == ["wisdom", "night"]
+    assert load_clue_vocabulary(str(text_file)) == ["moon", "fire"]
@@ -0,0 +1,87 @@
+import logging
+
+import pytest
+
+spacy = pytest.importorskip("spacy")
+
+from text_processing import clue_postprocessor
+from text_processing.clue_postprocessor import CluePostProcessor, light_lemma, remove_repetitions, shared_nlp
+from text_processing.text_processor import TextProcessor
+
+
+def test_batch_cleans_dedupes_and_filters():
+    postprocessor = CluePostProcessor()
+    clues = ["Falling stars star", "falling stars", "Whispers of Grace.", "the tired dancer", "  ", "quiet harbor"]
+    captions = ["a night sky", "a night sky", "a church", "a dancer on stage", "a boat", "a boat in a harbor"]
+    assert postprocessor.process(clues, captions) == ["Falling stars", None, None, None, None, None]
+    assert postprocessor.rejected == {"empty": 1, "duplicate": 1, "banned": 1, "leak": 2}
+
+
+def test_pipeline_is_shared_per_process():
+    assert CluePostProcessor().nlp is CluePostProcessor().nlp is shared_nlp()
+
+
+requires_model = pytest.mark.skipif(not spacy.util.is_package(clue_postprocessor.DEFAULT_MODEL),
+                                    reason=f"{clue_postprocessor.DEFAULT_MODEL} is not installed")
+
+
+@requires_model
+def test_tagged_pipeline_lemmatizes_and_checks_only_caption_nouns():
+    postprocessor = CluePostProcessor()
+    assert {"tagger", "lemmatizer"} <= set(postprocessor.nlp.pipe_names)
+    clues = ["mice and a mouse", "the dancers danced", "dancing alone"]
+    captions = ["a cat", "a dancer on stage", "a girl is dancing"]
+    # "dancing" is only a verb in its caption, so the clue does not leak a noun
+    assert postprocessor.process(clues, captions) == ["mice and a", None, "dancing alone"]
+
+
+def test_missing_model_falls_back_with_a_warning(monkeypatch, caplog):
+    def missing(*args, **kwargs):
+        raise OSError("not installed")
+
+    monkeypatch.setattr(spacy, "load", missing)
+    monkeypatch.setattr(clue_postprocessor, "_pipelines", {})
+    with caplog.at_level(logging.WARNING, logger=clue_postprocessor.__name__):
+        nlp = shared_nlp("missing_model")
+    assert nlp.pipe_names == []
+    assert "missing_model" in caplog.text
+
+
+def test_remove_repetitions_does_not_load_spacy(monkeypatch):
+    monkeypatch.setattr(clue_postprocessor, "shared_nlp", None)
+    assert CluePostProcessor().remove_repetitions("Falling stars, star falling") == "Falling stars,"
+    assert remove_repetitions("the moon the Moon.") == "the moon"
+
+
+def test_light_lemma():
+    assert [light_lemma(word) for word in ["stars", "Stories", "glass", "boxes", "moon"]] == \
+        ["star", "story", "glass", "box", "moon"]
+
+
+def test_obfuscate_description_matches_the_batched_path():
+    class FixedAbstractor:
+        def __init__(self, clue):
+            self.clue = clue
+
+        def generate_creative_abstract(self, description):
+            return self.clue
+
+    processor = TextProcessor()
+    for clue, caption in [("Falling stars star", "a night sky"), ("Tired dancer dancers", "a quiet lake")]:
+        expected = CluePostProcessor().process([clue], [caption])[0]
+        assert processor.obfuscate_description(caption, FixedAbstractor(clue)) == expected
+
+
+def test_obfuscate_description_retries_rejected_clues_then_falls_back():
+    class SequenceAbstractor:
+        def __init__(self, clues):
+            self.clues = iter(clues)
+
+        def generate_creative_abstract(self, description):
+            return next(self.clues)
+
+    processor = TextProcessor()
+    abstractor = SequenceAbstractor(["Whispers of Grace", "quiet harbor", "distant shore"])
+    assert processor.obfuscate_description("a boat in a harbor", abstractor) == "distant shore"
+    abstractor = SequenceAbstractor(["harbor harbors", "", "Whispers of Grace whispers"])
+    assert processor.obfuscate_description("a boat in a harbor", abstractor, attempts=3) == "Whispers of Grace"
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+Image = pytest.importorskip("PIL.Image")
+
+from deck_loader import Deck, TensorCache
+
+
+class Shade:
+    """A tiny stand-in for an open_clip transform: the image's mean value, scaled."""
+
+    def __init__(self, scale=1.0):
+        self.scale = scale
+
+    def __call__(self, image):
+        gray = image.convert("L").resize((2, 2))
+        return torch.tensor([[[gray.getpixel((x, y)) for x in range(2)] for y in range(2)]], dtype=torch.float32) * self.scale
+
+    def __repr__(self):
+        return f"Shade(scale={self.scale})"
+
+
+def make_deck(tmp_path, count=5):
+    for i in reversed(range(count)):
+        Image.new("RGB", (4, 4), (i * 10, i * 10, i * 10)).save(tmp_path / f"card_{i:05d}.png")
+    (tmp_path / "notes.txt").write_text("not a card")
+    return Deck(str(tmp_path))
+
+
+def test_deck_ids_follow_sorted_paths_and_batches_keep_order(tmp_path):
+    deck = make_deck(tmp_path)
+    assert len(deck) == 5 and deck.card_id(deck[3]) == 3
+    assert deck[0].endswith("card_00000.png")
+
+    batches = list(deck.batches(Shade(), batch_size=2, workers=2))
+    assert [ids for ids, _ in batches] == [[0, 1], [2, 3], [4]]
+    assert [tensor[0, 0, 0].item() for _, batch in batches for tensor in batch] == [0, 10, 20, 30, 40]
+
+
+def test_cache_skips_decoding_and_persists_across_instances(tmp_path):
+    (tmp_path / "cards").mkdir()
+    deck = make_deck(tmp_path / "cards")
+    path = str(tmp_path / "tensors.f16")
+    cache = TensorCache(maxsize=2, mmap_path=path, num_cards=5, shape=(1, 2, 2), transform=Shade())
+    first = [tensor for _, tensor in deck.stream_preprocessed(Shade(), workers=1, cache=cache)]
+    assert (cache.hits, cache.misses) == (0, 5)
+
+    reopened = TensorCache(mmap_path=path, num_cards=5, shape=(1, 2, 2), transform=Shade())
+    assert all(torch.equal(reopened.get(i), tensor) for i, tensor in enumerate(first))
+    assert reopened.hits == 5
+
+    # a different preprocess gets its own file instead of the cached tensors
+    other = TensorCache(mmap_path=path, num_cards=5, shape=(1, 2, 2), transform=Shade(scale=2.0))
+    assert other.mmap_path != reopened.mmap_path and other.get(0) is None
+
+
+def test_missing_sidecar_starts_the_cache_over(tmp_path):
+    path = str(tmp_path / "tensors.f16")
+    cache = TensorCache(mmap_path=path, num_cards=3, shape=(1, 2, 2))
+    cache.put(0, torch.ones(1, 2, 2))
+    del cache
+    os.remove(path + ".present")
+
+    reopened = TensorCache(mmap_path=path, num_cards=3, shape=(1, 2, 2))
+    assert reopened.get(0) is None
+    reopened.put(0, torch.full((1, 2, 2), 2.0))
+    assert TensorCache(mmap_path=path, num_cards=3, shape=(1, 2, 2)).get(0)[0, 0, 0].item() == 2.0
+
+
+def test_cache_is_keyed_by_the_deck_files(tmp_path):
+    (tmp_path / "cards").mkdir()
+    deck = make_deck(tmp_path / "cards", count=3)
+    path = str(tmp_path / "tensors.f16")
+    cache = TensorCache(mmap_path=path, shape=(1, 2, 2), transform=Shade(), deck=deck)
+    list(deck.stream_preprocessed(Shade(), workers=1, cache=cache))
+    assert TensorCache(mmap_path=path, shape=(1, 2, 2), transform=Shade(), deck=Deck(deck.directory)).get(2) is not None
+
+    # same card count, different artwork: the old tensors must not be served
+    Image.new("RGB", (4, 4), (200, 200, 200)).save(tmp_path / "cards" / "card_00002.png")
+    os.utime(tmp_path / "cards" / "card_00002.png", ns=(0, 0))
+    changed = Deck(deck.directory)
+    fresh = TensorCache(mmap_path=path, shape=(1, 2, 2), transform=Shade(), deck=changed)
+    assert len(changed) == 3 and fresh.mmap_path != cache.mmap_path and fresh.get(2) is None
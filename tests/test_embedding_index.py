@@ -0,0 +1,77 @@
+import json
+import os
+
+import numpy as np
+
+from similarity.embedding_index import CardEmbeddingIndex
+
+
+def write_cards(directory, count, start=0):
+    for i in range(start, start + count):
+        (directory / f"card_{i:05d}.png").write_bytes(f"card {i}".encode())
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, paths):
+        self.encoded += paths
+        return np.array([[float(len(path)), 1.0, 2.0] for path in paths])
+
+
+def test_update_only_encodes_new_cards_and_reloads_after_save(tmp_path):
+    cards, root = tmp_path / "cards", str(tmp_path / "index")
+    cards.mkdir()
+    write_cards(cards, 3)
+    encoder = CountingEncoder()
+    index = CardEmbeddingIndex(root, "ViT-B-32", "laion2b_e16")
+    assert index.update(str(cards), encoder) == 3
+
+    write_cards(cards, 2, start=3)
+    encoder = CountingEncoder()
+    reloaded = CardEmbeddingIndex(root, "ViT-B-32", "laion2b_e16")
+    assert reloaded.update(str(cards), encoder, batch_size=1) == 2
+    assert sorted(path.rsplit("/", 1)[-1] for path in encoder.encoded) == ["card_00003.png", "card_00004.png"]
+
+    final = CardEmbeddingIndex(root, "ViT-B-32", "laion2b_e16")
+    assert len(final) == 5
+    row = final.get(str(cards / "card_00000.png")).astype(np.float32)
+    assert abs(np.linalg.norm(row) - 1) < 1e-2
+
+
+def test_precision_and_backend_get_their_own_store(tmp_path):
+    cards, root = tmp_path / "cards", str(tmp_path / "index")
+    cards.mkdir()
+    write_cards(cards, 2)
+    CardEmbeddingIndex(root, "ViT-B-32", "laion2b_e16").update(str(cards), CountingEncoder())
+
+    quantized = CardEmbeddingIndex(root, "ViT-B-32", "laion2b_e16", precision="int8", backend="int8")
+    assert len(quantized) == 0
+    assert quantized.path != CardEmbeddingIndex(root, "ViT-B-32", "laion2b_e16").path
+    assert len(CardEmbeddingIndex(root, "ViT-B-32", "laion2b_e16")) == 2
+
+
+def test_version_1_index_is_migrated_and_missing_matrix_rebuilt(tmp_path):
+    cards, root = tmp_path / "cards", str(tmp_path / "index")
+    cards.mkdir()
+    write_cards(cards, 2)
+    index = CardEmbeddingIndex(root, "ViT-B-32", "laion2b_e16")
+    index.update(str(cards), CountingEncoder())
+    with open(index.manifest_path) as f:
+        manifest = json.load(f)
+    manifest.update(format_version=1, hashes=manifest.pop("keys"))
+    for key in ("precision", "backend"):
+        del manifest[key]
+    with open(index.manifest_path, "w") as f:
+        json.dump(manifest, f)
+
+    migrated = CardEmbeddingIndex(root, "ViT-B-32", "laion2b_e16")
+    assert len(migrated) == 2 and str(cards / "card_00001.png") in migrated
+    with open(index.manifest_path) as f:
+        assert json.load(f)["format_version"] == 2
+
+    os.remove(index.matrix_path)
+    rebuilt = CardEmbeddingIndex(root, "ViT-B-32", "laion2b_e16")
+    assert len(rebuilt) == 0
+    assert rebuilt.update(str(cards), CountingEncoder()) == 2
@@ -0,0 +1,102 @@
+import dataclasses
+import random
+
+import pytest
+
+from game_logic.event_log import EventLogWriter, analyze, read_rounds
+from game_logic.randomAgent import random_agents
+from game_logic.simulation import HeadlessGame
+
+
+def play(seed, on_round, deck=None):
+    agents = random_agents(4, random.Random(seed))
+    return HeadlessGame(agents, deck or [f"cards/card_{i:05d}.jpg" for i in range(98)], seed=seed,
+                        on_round=on_round).play()
+
+
+def test_round_trip_across_writer_sessions(tmp_path):
+    path = str(tmp_path / "rounds.log")
+    with EventLogWriter(path, flush_every=4) as event_log:
+        first = play(1, event_log)
+        timed = dataclasses.replace(first.rounds[0], timings={"captions": 0.5, "abstract": None})
+        event_log.write_result(timed, game_id=99)
+    # a second session appends to the same file with its own string table
+    with EventLogWriter(path) as event_log:
+        event_log.game_id = 2
+        second = play(2, event_log, deck=list(range(98)))
+
+    logged = list(read_rounds(path))
+    expected = [(0, r) for r in first.rounds] + [(99, timed)] + [(2, r) for r in second.rounds]
+    assert len(logged) == len(expected)
+    for entry, (game_id, result) in zip(logged, expected):
+        assert entry.game_id == game_id
+        assert entry.round_index == result.round_index
+        assert entry.storyteller_id == result.storyteller_id
+        assert entry.clue == result.clue
+        assert entry.table == result.table
+        assert entry.played_cards == result.played_cards
+        assert entry.votes == result.votes
+        assert entry.score_deltas == result.score_deltas
+        assert entry.timings == result.timings
+    assert isinstance(logged[-1].table[0][1], int)
+
+
+def test_truncated_tail_is_ignored_and_analytics_stream(tmp_path):
+    path = str(tmp_path / "rounds.log")
+    with EventLogWriter(path) as event_log:
+        result = play(3, event_log)
+    with open(path, "ab") as f:
+        f.write(b"\xff\x00\x00\x00partial")
+
+    assert len(list(read_rounds(path, chunk_size=64))) == len(result.rounds)
+    analytics = analyze(path)
+    assert analytics.rounds == len(result.rounds)
+    assert sum(told for told, _, _ in analytics.card_guesses.values()) == len(result.rounds)
+    assert sum(analytics.found_histogram) == len(result.rounds)
+    assert all(0.0 <= rate <= 1.0 for rate in analytics.guess_rates().values())
+    report = analytics.report()
+    assert report["rounds"] == len(result.rounds)
+
+
+def test_reopening_after_a_crash_drops_the_torn_record(tmp_path):
+    path = str(tmp_path / "rounds.log")
+    with EventLogWriter(path) as event_log:
+        first = play(4, event_log)
+    with open(path, "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x02torn")
+    with EventLogWriter(path) as event_log:
+        second = play(5, event_log)
+
+    assert len(list(read_rounds(path))) == len(first.rounds) + len(second.rounds)
+
+
+def test_string_table_is_capped_by_starting_new_segments(tmp_path):
+    path = str(tmp_path / "rounds.log")
+    with EventLogWriter(path, max_strings=16) as event_log:
+        result = play(6, event_log)
+        assert len(event_log._strings) < 16 + 8
+    logged = list(read_rounds(path))
+    assert [entry.clue for entry in logged] == [r.clue for r in result.rounds]
+    assert [entry.table for entry in logged] == [r.table for r in result.rounds]
+
+
+def test_numpy_ids_and_large_rounds_round_trip(tmp_path):
+    import numpy as np
+
+    path = str(tmp_path / "rounds.log")
+    table = [(player, np.int64(player)) for player in range(300)]
+    votes = {player: 299 for player in range(299)}
+    with EventLogWriter(path) as event_log:
+        event_log.write_round(0, 299, "owl", table, table[::-1], votes, {299: 3})
+    logged, = read_rounds(path)
+    assert logged.table == [(player, player) for player in range(300)]
+    assert type(logged.table[3][1]) is int
+    assert logged.played_cards == logged.table[::-1]
+    assert logged.votes == votes
+
+
+def test_older_log_version_is_reported(tmp_path):
+    path = tmp_path / "rounds.log"
+    path.write_bytes(b"DIXITLOG\x01")
+    with pytest.raises(ValueError, match="version 1"):
+        list(read_rounds(str(path)))
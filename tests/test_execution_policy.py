@@ -0,0 +1,45 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from execution_policy import ExecutionPolicy
+
+
+def test_cpu_defaults_to_fp32_inference_mode_without_autocast():
+    policy = ExecutionPolicy("cpu")
+    assert (policy.precision, policy.amp) == ("fp32", None)
+    with policy.context():
+        assert torch.is_inference_mode_enabled()
+        assert not torch.is_autocast_enabled("cpu")
+    with ExecutionPolicy("cpu", inference_mode=False).context():
+        assert not torch.is_inference_mode_enabled() and not torch.is_grad_enabled()
+
+
+def test_to_device_casts_float_inputs_and_keeps_token_ids():
+    policy = ExecutionPolicy("cpu", precision="bf16", channels_last=True)
+    images = policy.to_device(torch.zeros(2, 3, 8, 8))
+    assert images.dtype == torch.bfloat16
+    assert images.is_contiguous(memory_format=torch.channels_last)
+    assert policy.to_device(torch.zeros(2, 77, dtype=torch.long)).dtype == torch.long
+
+
+def test_rejects_unknown_precision_and_amp():
+    with pytest.raises(ValueError):
+        ExecutionPolicy("cpu", precision="fp8")
+    with pytest.raises(ValueError):
+        ExecutionPolicy("cpu", amp="fp32")
+
+
+def test_thread_counts_are_set_once_per_process(monkeypatch, caplog):
+    import execution_policy
+    from similarity import cpu_backend
+
+    calls = []
+    monkeypatch.setattr(execution_policy, "_threads", {})
+    monkeypatch.setattr(cpu_backend, "configure_threads", lambda *counts: calls.append(counts))
+    ExecutionPolicy("cpu", num_threads=2, interop_threads=1)
+    ExecutionPolicy("cpu", num_threads=2, interop_threads=1)
+    with caplog.at_level("INFO", logger="execution_policy"):
+        ExecutionPolicy("cpu", num_threads=4)
+    assert calls == [(2, 1)]
+    assert "already set" in caplog.text
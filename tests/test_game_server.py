@@ -0,0 +1,156 @@
+import asyncio
+import json
+import random
+import time
+
+import pytest
+
+from server.game_server import GameServer, GameSession, ServerBot
+
+
+async def play_client(address, table, name, answer=True, players=4, bots=2):
+    reader, writer = await asyncio.open_connection(*address)
+    writer.write(json.dumps({"type": "join", "table": table, "name": name, "players": players, "bots": bots}).encode() + b"\n")
+    player_id, messages = None, []
+    while line := await reader.readline():
+        message = json.loads(line)
+        messages.append(message)
+        if message["type"] == "joined":
+            player_id = message["player_id"]
+        if "id" not in message or not answer:
+            continue
+        if message["type"] == "storyteller":
+            reply = {"card": 0, "clue": f"clue from {name}"}
+        elif message["type"] == "choose_card":
+            reply = {"card": len(message["hand"]) - 1}
+        else:
+            reply = {"vote": 0}  # may be our own card, which the server replaces with a random vote
+        writer.write(json.dumps({"id": message["id"], **reply}).encode() + b"\n")
+        await writer.drain()
+    writer.close()
+    return player_id, messages
+
+
+def test_concurrent_tables_with_humans_bots_and_timeouts():
+    async def main():
+        async with GameServer(range(98), turn_timeout=0.05, max_rounds=3, seed=0) as server:
+            clients = await asyncio.gather(
+                play_client(server.address, "t1", "alice"),
+                play_client(server.address, "t1", "bob"),
+                # never answers, so every one of its turns falls back to a random move
+                play_client(server.address, "t2", "idle", answer=False, players=3, bots=2),
+            )
+            await server.wait_for_tables()
+            return server.results, clients
+
+    results, clients = asyncio.run(main())
+    assert set(results) == {"t1", "t2"}
+    for table_id, players in (("t1", 4), ("t2", 3)):
+        rounds = results[table_id].rounds
+        assert len(rounds) == 3
+        for round_result in rounds:
+            assert len(round_result.table) == players
+            assert round_result.storyteller_id not in round_result.votes
+            assert all(round_result.table[vote][0] != voter for voter, vote in round_result.votes.items())
+
+    (alice_id, alice_messages), _, (idle_id, idle_messages) = clients
+    assert results["t1"].rounds[0].storyteller_id == alice_id
+    assert results["t1"].rounds[0].clue == "clue from alice"
+    assert results["t2"].rounds[0].storyteller_id == idle_id
+    assert results["t2"].rounds[0].clue == "..."
+    assert alice_messages[-1]["type"] == "game_over"
+    assert idle_messages[-1]["type"] == "game_over"
+
+
+class SlowPipeline:
+    def choose(self, hand):
+        time.sleep(0.3)
+        return hand[0], "a caption", {}
+
+
+def test_timed_out_storyteller_turn_plays_exactly_one_card():
+    bot = ServerBot(SlowPipeline(), rng=random.Random(0))
+    bot.hand = list(range(6))
+    session = GameSession("t", [bot], [], rng=random.Random(0), turn_timeout=0.01)
+
+    async def turn():
+        return await session._ask(bot, bot.storyteller_turn(), lambda: (session._random_card(bot), "..."))
+
+    card, clue = asyncio.run(turn())
+    assert clue == "..."
+    assert card not in bot.hand and len(bot.hand) == 5
+
+
+class FakeSimilarity:
+    """Card i and the clue "clue i" share a one-hot embedding."""
+
+    def _one_hot(self, ids):
+        import torch
+        return torch.nn.functional.one_hot(torch.tensor(list(ids)), 98).float()
+
+    def encode_cards(self, cards):
+        return self._one_hot(cards)
+
+    def encode_texts(self, clues):
+        return self._one_hot(int(clue.split()[-1]) for clue in clues)
+
+
+class FakeCaptioner:
+    def generate_candidate_captions(self, cards, num_candidates):
+        return [[f"clue {card}"] for card in cards]
+
+
+def test_bots_play_through_bot_decisions_served_by_the_pool():
+    pytest.importorskip("torch")
+    from server.inference_pool import InferencePool
+
+    async def main():
+        pool = InferencePool(FakeSimilarity(), FakeCaptioner(), max_wait_ms=1)
+        async with GameServer(range(98), pool, turn_timeout=5, max_rounds=3, seed=0) as server:
+            await pool.start()  # a second start keeps the running brokers
+            brokers = dict(pool.brokers)
+            client = await play_client(server.address, "t", "alice", players=3, bots=2)
+            await server.wait_for_tables()
+            assert pool.brokers == brokers
+            return server.results["t"], client, pool.stats()
+
+    result, (alice_id, _), stats = asyncio.run(main())
+    bot_rounds = [r for r in result.rounds if r.storyteller_id != alice_id]
+    assert bot_rounds and all(r.clue == f"clue {r.storyteller_card}" for r in bot_rounds)
+    for round_result in bot_rounds:
+        storyteller_index = next(i for i, (player_id, _) in enumerate(round_result.table)
+                                 if player_id == round_result.storyteller_id)
+        bot_votes = [vote for voter, vote in round_result.votes.items() if voter != alice_id]
+        assert bot_votes and all(vote == storyteller_index for vote in bot_votes)
+    assert stats["encode_texts"]["completed"] > 0 and stats["generate_candidate_captions"]["completed"] > 0
+
+
+async def send_join(address, join):
+    reader, writer = await asyncio.open_connection(*address)
+    writer.write(json.dumps(join).encode() + b"\n")
+    await writer.drain()
+    return reader, writer
+
+
+def test_invalid_join_gets_an_error_and_disconnected_players_leave_the_lobby():
+    async def main():
+        async with GameServer(range(98), turn_timeout=0.05, max_rounds=1, seed=0) as server:
+            reader, writer = await send_join(server.address, {"type": "join", "table": "t", "players": None})
+            error = json.loads(await reader.readline())
+            writer.close()
+
+            reader, writer = await send_join(server.address, {"type": "join", "table": "t", "players": 3, "bots": 1})
+            assert json.loads(await reader.readline())["waiting_for"] == 1
+            writer.close()
+            while "t" in server._lobbies:
+                await asyncio.sleep(0.01)
+
+            # the table starts from scratch: two new humans fill it
+            clients = await asyncio.gather(play_client(server.address, "t", "bob", players=3, bots=1),
+                                           play_client(server.address, "t", "carol", players=3, bots=1))
+            await server.wait_for_tables()
+            return error, clients, server.results["t"]
+
+    error, clients, result = asyncio.run(main())
+    assert error["type"] == "error" and "players" in error["message"]
+    assert {player_id for player_id, _ in clients} <= set(result.final_scores)
@@ -0,0 +1,46 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from game_logic.dixit import score_round
+from game_logic.game_state import EMPTY, GameState, PlayerRecord, score_rounds
+
+
+def _score_round_deltas(storyteller, table_owners, votes):
+    players = [PlayerRecord(i) for i in range(len(table_owners))]
+    # card ids equal owner ids so the storyteller's card is easy to name
+    table = [(int(owner), int(owner)) for owner in table_owners]
+    voter_votes = [int(vote) for player, vote in enumerate(votes) if player != storyteller]
+    score_round(players, players[storyteller], int(storyteller), table, voter_votes)
+    return [player.score for player in players]
+
+
+@pytest.mark.parametrize("num_players", [3, 4, 6])
+def test_score_rounds_matches_score_round(num_players):
+    rng = np.random.default_rng(num_players)
+    num_rounds = 500
+    storytellers = rng.integers(num_players, size=num_rounds)
+    table_owners = np.argsort(rng.random((num_rounds, num_players)), axis=1)
+    votes = rng.integers(num_players, size=(num_rounds, num_players))
+    # make the all-correct case common enough to be exercised
+    all_correct = rng.random(num_rounds) < 0.2
+    storyteller_slot = np.argmax(table_owners == storytellers[:, None], axis=1)
+    votes[all_correct] = storyteller_slot[all_correct, None]
+
+    expected = [_score_round_deltas(*round_arrays) for round_arrays in zip(storytellers, table_owners, votes)]
+    assert score_rounds(storytellers, table_owners, votes).tolist() == expected
+
+
+def test_game_state_round():
+    state = GameState(num_players=4, num_cards=98, hand_size=6, seed=0)
+    assert (state.hands != EMPTY).all()
+    state.start_round(storyteller=2)
+    for player in range(4):
+        state.play_card(player, 0)
+    state.shuffle_table()
+    storyteller_slot = int(np.nonzero(state.table_owners == 2)[0][0])
+    for player in (0, 1, 3):
+        state.vote(player, storyteller_slot)
+    assert state.score().tolist() == [2, 2, 0, 2]
+    assert state.deal()
+    assert (state.hands != EMPTY).all()
@@ -0,0 +1,35 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("open_clip")
+
+import model_manager
+from image_captioning import generate_image_caption
+from image_captioning.generate_image_caption import ImageCaptionGenerator
+
+
+class FakeCoCa(torch.nn.Module):
+    def generate(self, images, **kwargs):
+        return torch.zeros(len(images), 3, dtype=torch.long)
+
+
+@pytest.fixture
+def captioner(monkeypatch, tmp_path):
+    from PIL import Image
+    monkeypatch.setattr(model_manager, "get_model",
+                        lambda *args, **kwargs: (FakeCoCa(), lambda image: torch.zeros(3, 4, 4)))
+    monkeypatch.setattr(generate_image_caption, "decode_tokens", lambda generated: [" a cat  "] * len(generated))
+    path = str(tmp_path / "card.png")
+    Image.new("RGB", (4, 4)).save(path)
+    return path
+
+
+def test_model_version_separates_precisions(captioner):
+    versions = {ImageCaptionGenerator("coca", "w", "cpu", precision).model_version for precision in ("fp32", "bf16")}
+    assert versions == {"coca/w", "coca/w/bf16-eager"}
+
+
+def test_single_and_candidate_captions_are_stripped(captioner):
+    generator = ImageCaptionGenerator("coca", "w", "cpu")
+    assert generator.generate_caption(captioner) == "a cat"
+    assert generator.generate_candidate_captions([captioner], num_candidates=2, workers=1) == [["a cat"]]
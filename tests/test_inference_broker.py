@@ -0,0 +1,105 @@
+import asyncio
+import queue
+import threading
+import time
+
+import pytest
+
+from inference_broker import InferenceBroker
+
+
+def squares(items, delay=0.0):
+    time.sleep(delay)
+    return [item * item for item in items]
+
+
+def test_concurrent_threads_share_batches():
+    with InferenceBroker(squares, max_batch_size=8, max_wait_ms=20) as broker:
+        results = {}
+
+        def worker(start):
+            results[start] = broker.map(range(start, start + 4))
+
+        threads = [threading.Thread(target=worker, args=(start,)) for start in range(0, 40, 4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = broker.stats()
+
+    assert results == {start: [i * i for i in range(start, start + 4)] for start in range(0, 40, 4)}
+    assert stats["completed"] == 40
+    assert stats["max_batch_size"] <= 8
+    assert stats["batches"] < 40
+
+
+def test_coroutines_get_results_in_order():
+    async def main():
+        with InferenceBroker(squares, max_batch_size=16, max_wait_ms=5) as broker:
+            return await asyncio.gather(*(broker.amap([i, i + 1]) for i in range(10))), broker.stats()
+
+    results, stats = asyncio.run(main())
+    assert results == [[i * i, (i + 1) * (i + 1)] for i in range(10)]
+    assert stats["mean_batch_size"] > 1
+
+
+def test_deadlines_and_backpressure():
+    release = threading.Event()
+
+    def blocked(items):
+        release.wait()
+        return items
+
+    broker = InferenceBroker(blocked, max_batch_size=1, max_wait_ms=0, max_queue_size=2)
+    running = broker.submit("running")
+    time.sleep(0.05)  # let the worker pick it up, so the next two fill the queue
+    expiring = broker.submit("expiring", timeout=0.01)
+    queued = broker.submit("queued")
+    with pytest.raises(queue.Full):
+        broker.submit("rejected", block=False)
+    time.sleep(0.05)
+    release.set()
+
+    assert running.result() == "running"
+    with pytest.raises(TimeoutError):
+        expiring.result()
+    assert queued.result() == "queued"
+    broker.close()
+    stats = broker.stats()
+    assert (stats["completed"], stats["expired"], stats["rejected"]) == (2, 1, 1)
+
+
+def test_errors_reach_every_request_in_the_batch():
+    def failing(items):
+        raise RuntimeError("model crashed")
+
+    with InferenceBroker(failing, max_wait_ms=20) as broker:
+        futures = [broker.submit(i) for i in range(3)]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+
+def test_async_backpressure_waits_in_the_loop_then_rejects():
+    release = threading.Event()
+
+    def blocked(items):
+        release.wait()
+        return items
+
+    async def main(broker):
+        threads = threading.active_count()
+        asyncio.get_running_loop().call_later(0.1, release.set)
+        waiting = asyncio.ensure_future(broker.asubmit("waiting", timeout=5))
+        with pytest.raises(queue.Full):
+            await broker.asubmit("rejected", timeout=0.02)
+        assert threading.active_count() == threads  # no executor threads parked on the queue
+        return await waiting
+
+    with InferenceBroker(blocked, max_batch_size=1, max_wait_ms=0, max_queue_size=1) as broker:
+        running = broker.submit("running")
+        time.sleep(0.05)
+        broker.submit("queued")
+        assert asyncio.run(main(broker)) == "waiting"
+        assert running.result() == "running"
+    assert broker.stats()["rejected"] == 1
@@ -0,0 +1,47 @@
+import json
+
+import instrumentation
+
+
+def test_disabled_records_nothing():
+    instrumentation.disable()
+    instrumentation.reset()
+    with instrumentation.span("stage"):
+        instrumentation.incr("hits")
+        instrumentation.observe("batch_size", 4)
+    assert instrumentation.snapshot() == {"counters": {}, "histograms": {}}
+
+
+def test_enabled_aggregates_and_exports(tmp_path):
+    instrumentation.enable()
+    instrumentation.reset()
+    try:
+        for _ in range(3):
+            with instrumentation.span("caption.generate"):
+                pass
+        instrumentation.incr("clue_cache.hits", 2)
+        instrumentation.observe("caption.batch_size", 8)
+
+        snapshot = instrumentation.snapshot()
+        assert snapshot["counters"] == {"clue_cache.hits": 2}
+        assert snapshot["histograms"]["caption.generate.seconds"]["count"] == 3
+        assert snapshot["histograms"]["caption.batch_size"]["buckets"]["10"] == 1
+
+        instrumentation.export(str(tmp_path / "metrics.json"))
+        assert json.loads((tmp_path / "metrics.json").read_text()) == snapshot
+
+        instrumentation.export(str(tmp_path / "metrics.prom"))
+        text = (tmp_path / "metrics.prom").read_text()
+        assert "dixit_clue_cache_hits_total 2" in text
+        assert 'dixit_caption_batch_size_bucket{le="+Inf"} 1' in text
+        assert "dixit_caption_generate_seconds_count 3" in text
+    finally:
+        instrumentation.disable()
+        instrumentation.reset()
+
+
+def test_profile_writes_report(tmp_path):
+    path = tmp_path / "turn.prof"
+    with instrumentation.profile(str(path)):
+        sum(range(1000))
+    assert path.stat().st_size > 0
@@ -0,0 +1,87 @@
+import sys
+import types
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import model_manager
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty model registry whose "models" are small Linear layers instead of open_clip loads."""
+    loads = []
+
+    def create_model_and_transforms(model_name, pretrained=None, precision="fp32", device=None):
+        loads.append(model_name)
+        return torch.nn.Linear(16, 16), None, "transform"
+
+    monkeypatch.setitem(sys.modules, "open_clip",
+                        types.SimpleNamespace(create_model_and_transforms=create_model_and_transforms))
+    for name, value in [("_models", model_manager.OrderedDict()), ("_model_bytes", {}), ("_last_used", {}),
+                        ("_load_locks", {}), ("_derived_bytes", {}), ("_budget", {"max_models": None, "max_bytes": None})]:
+        monkeypatch.setattr(model_manager, name, value)
+    return loads
+
+
+def names():
+    return [key[0] for key in model_manager.loaded_models()]
+
+
+def test_least_recently_used_model_is_unloaded_over_budget(registry):
+    model_manager.set_memory_budget(max_models=2)
+    model_manager.get_model("a", None, "cpu")
+    model_manager.get_model("b", None, "cpu")
+    model_manager.get_model("a", None, "cpu")
+    model_manager.get_model("c", None, "cpu")
+    assert names() == ["a", "c"]
+    # unloaded models are loaded again on their next use
+    model_manager.get_model("b", None, "cpu")
+    assert registry == ["a", "b", "c", "b"]
+    assert names() == ["c", "b"]
+
+
+def test_byte_budget_and_idle_unloading(registry):
+    model_manager.get_model("a", None, "cpu")
+    model_manager.get_model("b", None, "cpu")
+    report = model_manager.memory_report()
+    assert report["model_bytes"] == 2 * (16 * 16 + 16) * 4
+    model_manager.set_memory_budget(max_bytes=report["model_bytes"] - 1)
+    assert names() == ["b"]
+    assert model_manager.unload_idle(0) == [("b", None, "cpu", "fp32")]
+    assert names() == []
+
+
+def test_derived_copies_count_towards_the_byte_budget_until_freed(registry):
+    import gc
+
+    size = (16 * 16 + 16) * 4
+    model_manager.set_memory_budget(max_bytes=2 * size)
+    model_manager.get_model("a", None, "cpu")
+    traced = torch.nn.Identity()
+    model_manager.track_derived(traced, size + 1, "traced")
+    assert names() == [] and model_manager.memory_report()["model_bytes"] == size + 1
+    del traced
+    gc.collect()
+    assert model_manager.memory_report()["model_bytes"] == 0
+
+
+def test_channels_last_borrowers_get_their_own_copy(registry):
+    shared, _ = model_manager.get_model("a", None, "cpu")
+    converted, _ = model_manager.get_model("a", None, "cpu", channels_last=True)
+    assert converted is not shared and registry == ["a", "a"]
+    assert model_manager.get_model("a", None, "cpu")[0] is shared
+    assert ("a", None, "cpu", "fp32", "channels_last") in model_manager.loaded_models()
+
+
+def test_environment_budget_is_read_when_checked(registry, monkeypatch):
+    monkeypatch.setattr(model_manager, "_budget", {})
+    monkeypatch.setenv("DIXIT_MAX_MODELS", "1")
+    model_manager.get_model("a", None, "cpu")
+    model_manager.get_model("b", None, "cpu")
+    assert names() == ["b"]
+    # an explicit budget, even "no limit", overrides the environment
+    model_manager.set_memory_budget(max_models=None)
+    model_manager.get_model("a", None, "cpu")
+    assert names() == ["b", "a"]
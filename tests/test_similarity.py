@@ -0,0 +1,51 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import model_manager
+from similarity.similarity import ImageTextSimilarity
+
+
+class FakeClip(torch.nn.Module):
+    """Unnormalized "features": the mean colour of an image, and a clue's length."""
+
+    def encode_image(self, images):
+        return 10 * images.mean(dim=(2, 3))
+
+    def encode_text(self, tokens):
+        return tokens.float()
+
+
+def preprocess(image):
+    return torch.tensor(image.getpixel((0, 0)), dtype=torch.float32)[:, None, None].expand(3, 4, 4) / 255 + 0.01
+
+
+@pytest.fixture
+def similarity(monkeypatch):
+    monkeypatch.setattr(model_manager, "get_model", lambda *args, **kwargs: (FakeClip(), preprocess))
+    monkeypatch.setattr(model_manager, "get_tokenizer",
+                        lambda name: lambda texts: torch.tensor([[len(text), 1.0, 2.0] for text in texts]))
+    return ImageTextSimilarity("fake", None, device="cpu", text_cache_size=0)
+
+
+@pytest.fixture
+def cards(tmp_path):
+    from PIL import Image
+    paths = []
+    for i, colour in enumerate([(255, 0, 0), (0, 255, 0), (0, 0, 255)]):
+        paths.append(str(tmp_path / f"card_{i}.png"))
+        Image.new("RGB", (4, 4), colour).save(paths[-1])
+    return paths
+
+
+def test_every_image_encoder_returns_normalized_rows(similarity, cards):
+    for features in [similarity.encode_image(cards[0]), similarity.encode_image_batch(cards, workers=1),
+                     similarity.encode_cards(cards), similarity.encode_texts(["a", "moon"])]:
+        assert torch.allclose(features.norm(dim=-1), torch.ones(len(features)))
+    assert torch.allclose(similarity.encode_image_batch(cards[:1], workers=1), similarity.encode_image(cards[0]))
+
+
+def test_numpy_card_ids_are_looked_up_in_the_deck(similarity, cards):
+    np = pytest.importorskip("numpy")
+    similarity.deck = cards
+    assert torch.allclose(similarity.score_cards("x", [np.int64(0), cards[1]]), similarity.score_cards("x", cards[:2]))
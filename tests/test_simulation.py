@@ -0,0 +1,42 @@
+import functools
+import random
+
+from game_logic.dixit import score_round
+from game_logic.randomAgent import RandomAgent, random_agents
+from game_logic.simulation import HeadlessGame, run_games
+
+
+def test_score_round_credits_voters_when_storyteller_is_not_last():
+    players = [RandomAgent(i) for i in range(4)]
+    storyteller = players[0]
+    table = [(0, "a"), (1, "b"), (2, "c"), (3, "d")]
+    # players 1 and 2 find the storyteller's card, player 3 votes for player 1's card
+    score_round(players, storyteller, "a", table, [0, 0, 1])
+    assert [player.score for player in players] == [3, 4, 3, 0]
+
+
+def test_same_seed_replays_the_same_game():
+    first = run_games(functools.partial(random_agents, 4), range(98), 3, seed=7, processes=1)
+    second = run_games(functools.partial(random_agents, 4), range(98), 3, seed=7, processes=1)
+    assert [game.to_dict() for game in first] == [game.to_dict() for game in second]
+
+
+def test_process_pool_matches_serial_run():
+    serial = run_games(functools.partial(random_agents, 5), range(98), 4, seed=1, processes=1)
+    pooled = run_games(functools.partial(random_agents, 5), range(98), 4, seed=1, processes=2)
+    assert [game.to_dict() for game in serial] == [game.to_dict() for game in pooled]
+
+
+def test_rounds_are_reported_with_consistent_scores():
+    seen = []
+    agents = random_agents(4, random.Random(3))
+    result = HeadlessGame(agents, range(98), seed=3, on_round=seen.append).play()
+    assert seen == result.rounds
+    totals = {agent.id: 0 for agent in agents}
+    for round_result in result.rounds:
+        assert len(round_result.table) == 4
+        assert round_result.storyteller_id not in round_result.votes
+        for player_id, delta in round_result.score_deltas.items():
+            totals[player_id] += delta
+        assert totals == round_result.scores
+    assert totals == result.final_scores
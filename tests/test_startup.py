@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# generous enough for a cold interpreter on a slow machine, far below a model load
+FIRST_PROMPT_BUDGET_SECONDS = 2.0
+HEAVY_MODULES = ["torch", "open_clip", "spacy", "openai", "PIL"]
+
+
+def test_game_modules_do_not_import_heavy_dependencies():
+    code = (
+        "import sys\n"
+        "import game_logic.dixit, game_logic.storyteller, model_manager, execution_policy\n"
+        "import text_processing.description_obfuscator\n"
+        f"print([name for name in {HEAVY_MODULES!r} if name in sys.modules])\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=SRC, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_human_game_prompts_within_budget():
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-u", "-m", "game_logic.dixit"], cwd=SRC, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    output = ""
+    try:
+        while "Enter number of players:" not in output:
+            char = process.stdout.read(1)
+            assert char, f"game exited before prompting: {output!r}"
+            output += char
+        elapsed = time.perf_counter() - start
+    finally:
+        process.kill()
+        process.wait()
+    assert elapsed < FIRST_PROMPT_BUDGET_SECONDS
@@ -0,0 +1,104 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from game_logic.storyteller_pipeline import StorytellerPipeline, expected_storyteller_points
+from text_processing.clue_cache import CachedAbstractor
+
+
+class FakeCaptioner:
+    def generate_candidate_captions(self, hand, num_candidates):
+        return [[f"{card} caption {i}" for i in range(num_candidates)] for card in hand]
+
+
+class FakeSimilarity:
+    def __init__(self, scores):
+        self.scores = scores
+        self.calls = 0
+
+    def score_cards(self, clues, cards):
+        self.calls += 1
+        return torch.tensor([self.scores[clue] for clue in clues])
+
+
+def test_expected_points_penalize_obvious_and_hopeless_clues():
+    scores = torch.tensor([[0.40, 0.10, 0.10], [0.22, 0.21, 0.10], [0.20, 0.20, 0.20]])
+    expected = expected_storyteller_points(scores, num_voters=3)
+    # obvious: everyone finds the card, no points; a clue with one close rival beats both extremes
+    assert expected[0, 0] < 0.01
+    assert expected[1, 0] > expected[2, 0] > expected[0, 0]
+
+
+def test_pipeline_scores_every_pair_in_one_call_and_picks_the_best():
+    hand = ["a", "b", "c"]
+    scores = {
+        "a caption 0": [0.50, 0.10, 0.10], "a caption 1": [0.22, 0.21, 0.10],
+        "b caption 0": [0.10, 0.50, 0.10], "b caption 1": [0.30, 0.10, 0.10],
+        "c caption 0": [0.10, 0.10, 0.50], "c caption 1": [0.10, 0.10, 0.10],
+    }
+    similarity = FakeSimilarity(scores)
+    card, clue, report = StorytellerPipeline(FakeCaptioner(), similarity, num_captions=2).choose(hand)
+    assert (card, clue) == ("a", "a caption 1")
+    assert similarity.calls == 1
+    assert report["num_clues"] == 6
+    assert set(report["timings"]) == {"captions", "score", "choose"}
+
+
+def test_decoys_make_an_obvious_card_less_attractive():
+    scores = torch.tensor([[0.30, 0.10, 0.10]])
+    without = expected_storyteller_points(scores, num_voters=3)
+    # a table of decoys that match the clue about as well as the card
+    with_decoys = expected_storyteller_points(scores, num_voters=3, decoy_scores=torch.tensor([[0.29, 0.28]]))
+    assert with_decoys[0, 0] > without[0, 0]
+
+
+class HashSimilarity:
+    """Deterministic scores for any clue, so real abstractor output can be scored."""
+
+    def score_cards(self, clues, cards):
+        return torch.tensor([[(hash((clue, card)) % 100) / 100 for card in cards] for clue in clues])
+
+
+def test_cached_async_abstractor_runs_on_the_pipeline_loop_across_turns():
+    pytest.importorskip("httpx")
+    from text_processing.async_abstractor import AsyncAbstractor
+    from text_processing.stub_llm_server import StubLLMServer
+
+    with StubLLMServer(latency=0.0) as server:
+        abstractor = CachedAbstractor(AsyncAbstractor(api_key="test", base_url=server.base_url))
+        pipeline = StorytellerPipeline(FakeCaptioner(), HashSimilarity(), abstractor, num_captions=1)
+        try:
+            for hand in (["a", "b"], ["c", "d"]):
+                _, clue, _ = pipeline.choose(hand)
+                assert isinstance(clue, str)
+                assert pipeline.candidate_clues(hand, {}) == [f"{card} caption 0" for card in hand] + [
+                    f"Echo of {card} caption 0" for card in hand]
+        finally:
+            pipeline.close()
+    assert abstractor.misses == 4
+
+
+class DeckSimilarity(FakeSimilarity):
+    def __init__(self, scores, text_vectors):
+        super().__init__(scores)
+        self.text_vectors = text_vectors
+
+    def encode_texts(self, clues):
+        return torch.tensor([self.text_vectors[clue] for clue in clues])
+
+
+def test_search_index_picks_the_clue_by_whole_deck_ambiguity():
+    import numpy as np
+    from similarity.card_search import CardSearchIndex
+
+    index = CardSearchIndex(3, use_faiss=False)
+    index.add(["a", "b", "x", "y"], np.array([[1, 0, 0], [0, 1, 0], [0.99, 0.14, 0], [0, 0, 1]], dtype=np.float32))
+    scores = {"a caption 0": [0.50, 0.10], "a caption 1": [0.22, 0.21],
+              "b caption 0": [0.10, 0.50], "b caption 1": [0.10, 0.10]}
+    # on the hand alone "a caption 1" wins, but over the deck it has no rival while "a caption 0" has one
+    vectors = {"a caption 0": [1.0, 0.0, 0.0], "a caption 1": [1.0, -1.0, 0.0],
+               "b caption 0": [0.0, 1.0, 0.0], "b caption 1": [0.0, 1.0, 0.0]}
+    similarity = DeckSimilarity(scores, vectors)
+    assert StorytellerPipeline(FakeCaptioner(), similarity, num_captions=2).choose(["a", "b"])[:2] == ("a", "a caption 1")
+    pipeline = StorytellerPipeline(FakeCaptioner(), similarity, num_captions=2, search_index=index, deck_candidates=4)
+    assert pipeline.choose(["a", "b"])[:2] == ("a", "a caption 0")
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from game_logic.bot import Bot
+from game_logic.simulation import HeadlessGame
+from game_logic.vote_strategy import VoteStrategy
+
+
+class FakeSimilarity:
+    """Card i and clue "clue i" share a one-hot embedding, so each clue matches exactly one card."""
+
+    def __init__(self, num_cards):
+        self.num_cards = num_cards
+        self.text_calls = 0
+        self.card_calls = 0
+
+    def _one_hot(self, ids):
+        return torch.nn.functional.one_hot(torch.tensor(list(ids)), self.num_cards).float() + 0.01
+
+    def encode_cards(self, cards):
+        self.card_calls += 1
+        return self._one_hot(cards)
+
+    def encode_texts(self, clues):
+        self.text_calls += 1
+        return self._one_hot(int(clue.split()[-1]) for clue in clues)
+
+
+class StoryBot(Bot):
+    def storyteller_turn(self):
+        card = self.hand.pop(0)
+        return card, f"clue {card}"
+
+
+def test_choice_and_vote_follow_the_clue_and_skip_own_card():
+    similarity = FakeSimilarity(10)
+    strategy = VoteStrategy(similarity, range(10))
+    assert strategy.choose_card("clue 7", [1, 7, 3]) == 1
+    table = [(0, 2), (1, 7), (2, 5)]
+    assert strategy.vote("clue 7", table, own_id=0) == 1
+    # the best match is the voter's own card, so the vote goes elsewhere
+    assert strategy.vote("clue 7", table, own_id=1) != 1
+    # one text encoding per clue, shared by every decision
+    assert (similarity.text_calls, similarity.card_calls) == (1, 1)
+
+
+def test_strategy_bots_find_the_storyteller_card():
+    strategy = VoteStrategy(FakeSimilarity(98), range(98))
+    bots = [StoryBot(strategy=strategy, rng=random.Random(i)) for i in range(4)]
+    result = HeadlessGame(bots, range(98), seed=0, target_score=1000).play(max_rounds=8)
+    for round_result in result.rounds:
+        storyteller_index = next(i for i, (player_id, _) in enumerate(round_result.table)
+                                 if player_id == round_result.storyteller_id)
+        assert all(vote == storyteller_index for vote in round_result.votes.values())
+
+
+def test_bot_without_pipeline_or_strategy_plays_at_random(capsys):
+    bots = [Bot(rng=random.Random(i)) for i in range(3)]
+    result = HeadlessGame(bots, range(60), seed=0, target_score=1000).play(max_rounds=3)
+    assert len(result.rounds) == 3
+    assert capsys.readouterr().out == ""